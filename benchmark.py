@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This file is part of the python-chess library.
+# Copyright (C) 2012-2019 Niklas Fiekas <niklas.fiekas@backscattering.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Microbenchmarks for the hot paths of python-chess.
+
+Run from the root of the repository, so that the fixtures in data/ can be
+found. Memory benchmarks report the number of bytes allocated per unit
+(for example per game node), as measured with tracemalloc. Results can be
+saved as JSON and compared with a previous run:
+
+    ./benchmark.py --json baseline.json
+    ./benchmark.py --compare baseline.json --threshold 0.1
+
+Exits with a non-zero status if any benchmark regressed by more than the
+threshold.
+"""
+
+import argparse
+import collections
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+import chess
+import chess.pgn
+import chess.polyglot
+import chess.syzygy
+
+
+BENCHMARKS = collections.OrderedDict()
+
+MEMORY_BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. The decorated function gets the fixtures and
+    returns a callable that runs one iteration of the benchmark, or ``None``
+    if the benchmark is not available.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def memory_benchmark(name):
+    """
+    Registers a memory benchmark. The decorated function gets the fixtures and
+    returns a callable that allocates the objects to be measured and returns
+    them, together with the number of units to report the memory usage for.
+    """
+    def decorator(setup):
+        MEMORY_BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+class Fixtures:
+    """Lazily loaded inputs from the data/ directory."""
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self._games = None
+        self._positions = None
+
+    def path(self, *parts):
+        return os.path.join(self.data_dir, *parts)
+
+    def pgn_text(self, name="kasparov-deep-blue-1997.pgn"):
+        with open(self.path("pgn", name), encoding="utf-8-sig") as pgn:
+            return pgn.read()
+
+    @property
+    def games(self):
+        if self._games is None:
+            self._games = []
+            pgn = io.StringIO(self.pgn_text())
+            while True:
+                game = chess.pgn.read_game(pgn)
+                if game is None:
+                    break
+                self._games.append(game)
+        return self._games
+
+    @property
+    def positions(self):
+        """All mainline positions of the fixture games, without move stacks."""
+        if self._positions is None:
+            self._positions = []
+            for game in self.games:
+                board = game.board()
+                for move in game.mainline_moves():
+                    self._positions.append(board.copy(stack=False))
+                    board.push(move)
+        return self._positions
+
+
+@benchmark("push_pop")
+def bench_push_pop(fixtures):
+    lines = [(game.board(), list(game.mainline_moves())) for game in fixtures.games]
+
+    def run():
+        for board, moves in lines:
+            for move in moves:
+                board.push(move)
+            for _ in moves:
+                board.pop()
+
+    return run
+
+
+@benchmark("generate_legal_moves")
+def bench_generate_legal_moves(fixtures):
+    positions = fixtures.positions
+
+    def run():
+        for board in positions:
+            for _ in board.generate_legal_moves():
+                pass
+
+    return run
+
+
+@benchmark("is_check")
+def bench_is_check(fixtures):
+    positions = fixtures.positions
+
+    def run():
+        for board in positions:
+            board.is_check()
+
+    return run
+
+
+@benchmark("san")
+def bench_san(fixtures):
+    pairs = [(board, move) for board in fixtures.positions[::4] for move in board.legal_moves]
+
+    def run():
+        for board, move in pairs:
+            board.san(move)
+
+    return run
+
+
+@benchmark("parse_san")
+def bench_parse_san(fixtures):
+    pairs = [(board, board.san(move)) for board in fixtures.positions[::4] for move in board.legal_moves]
+
+    def run():
+        for board, san in pairs:
+            board.parse_san(san)
+
+    return run
+
+
+@benchmark("fen")
+def bench_fen(fixtures):
+    positions = fixtures.positions
+
+    def run():
+        for board in positions:
+            board.fen()
+
+    return run
+
+
+@benchmark("set_fen")
+def bench_set_fen(fixtures):
+    fens = [board.fen() for board in fixtures.positions]
+    board = chess.Board()
+
+    def run():
+        for fen in fens:
+            board.set_fen(fen)
+
+    return run
+
+
+@benchmark("copy")
+def bench_copy(fixtures):
+    boards = []
+    for game in fixtures.games:
+        board = game.board()
+        for move in game.mainline_moves():
+            board.push(move)
+        boards.append(board)
+
+    def run():
+        for board in boards:
+            board.copy()
+
+    return run
+
+
+@benchmark("zobrist_hash")
+def bench_zobrist_hash(fixtures):
+    positions = fixtures.positions
+
+    def run():
+        for board in positions:
+            chess.polyglot.zobrist_hash(board)
+
+    return run
+
+
+@benchmark("pgn_read_game")
+def bench_pgn_read_game(fixtures):
+    text = fixtures.pgn_text()
+
+    def run():
+        pgn = io.StringIO(text)
+        while chess.pgn.read_game(pgn):
+            pass
+
+    return run
+
+
+@benchmark("pgn_read_headers")
+def bench_pgn_read_headers(fixtures):
+    text = fixtures.pgn_text()
+
+    def run():
+        pgn = io.StringIO(text)
+        while chess.pgn.read_headers(pgn):
+            pass
+
+    return run
+
+
+@benchmark("pgn_scan_headers")
+def bench_pgn_scan_headers(fixtures):
+    data = fixtures.pgn_text().encode("utf-8")
+
+    def run():
+        for _ in chess.pgn.scan_headers(io.BytesIO(data)):
+            pass
+
+    return run
+
+
+@benchmark("pgn_read_games_where")
+def bench_pgn_read_games_where(fixtures):
+    text = fixtures.pgn_text()
+
+    def run():
+        pgn = io.StringIO(text)
+        for _ in chess.pgn.read_games(pgn, where=lambda headers: headers["Site"] == "06"):
+            pass
+
+    return run
+
+
+@benchmark("pgn_export_games")
+def bench_pgn_export_games(fixtures):
+    games = list(chess.pgn.read_games(io.StringIO(fixtures.pgn_text())))
+
+    def run():
+        chess.pgn.export_games(games, io.StringIO())
+
+    return run
+
+
+@benchmark("pgn_read_binary_game")
+def bench_pgn_read_binary_game(fixtures):
+    data = io.BytesIO()
+    exporter = chess.pgn.BinaryExporter(data)
+    for game in chess.pgn.read_games(io.StringIO(fixtures.pgn_text())):
+        game.accept(exporter)
+    data = data.getvalue()
+
+    def run():
+        handle = io.BytesIO(data)
+        while chess.pgn.read_binary_game(handle):
+            pass
+
+    return run
+
+
+@memory_benchmark("pgn_game_node")
+def memory_pgn_game_node(fixtures):
+    text = fixtures.pgn_text()
+
+    def run():
+        games = list(chess.pgn.read_games(io.StringIO(text)))
+
+        nodes = 0
+        stack = list(games)
+        while stack:
+            node = stack.pop()
+            nodes += 1
+            stack.extend(node.variations)
+
+        return games, nodes
+
+    return run
+
+
+@benchmark("polyglot_find_all")
+def bench_polyglot_find_all(fixtures):
+    path = fixtures.path("polyglot", "performance.bin")
+    if not os.path.exists(path):
+        return None
+
+    reader = chess.polyglot.open_reader(path)
+    positions = fixtures.positions[:200]
+
+    def run():
+        for board in positions:
+            for _ in reader.find_all(board):
+                pass
+
+    return run
+
+
+@benchmark("syzygy_probe_wdl")
+def bench_syzygy_probe_wdl(fixtures):
+    directory = fixtures.path("syzygy", "regular")
+    if not os.path.isdir(directory):
+        return None
+
+    tables = chess.syzygy.open_tablebase(directory)
+    boards = []
+    with open(fixtures.path("endgame.epd")) as epds:
+        for epd in epds:
+            board, _ = chess.Board.from_epd(epd)
+            boards.append(board)
+
+    def run():
+        for board in boards:
+            tables.probe_wdl(board)
+
+    return run
+
+
+def measure(run, *, repeat=5, min_time=0.2):
+    """
+    Returns the best time per call of *run* (in seconds) and the number of
+    calls per repetition.
+    """
+    number = 1
+    while True:
+        elapsed = timeit.timeit(run, number=number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    timings = [elapsed]
+    for _ in range(repeat - 1):
+        timings.append(timeit.timeit(run, number=number))
+
+    return min(timings) / number, number
+
+
+def measure_memory(run):
+    """
+    Returns the number of bytes that are still allocated by *run* per unit,
+    and the number of units.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept, units = run()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del kept
+    return (after - before) / units, units
+
+
+def run_memory_benchmarks(names, *, fixtures=None, log=None):
+    fixtures = fixtures or Fixtures()
+    results = collections.OrderedDict()
+
+    for name in names:
+        run = MEMORY_BENCHMARKS[name](fixtures)
+        if run is None:
+            if log:
+                log("{:<24} skipped (fixtures not available)".format(name))
+            continue
+
+        per_unit, units = measure_memory(run)
+        results[name] = {"bytes": per_unit, "units": units}
+
+        if log:
+            log("{:<24} {:12.1f} bytes".format(name, per_unit))
+
+    return results
+
+
+def run_benchmarks(names, *, repeat=5, min_time=0.2, fixtures=None, log=None):
+    fixtures = fixtures or Fixtures()
+    results = collections.OrderedDict()
+
+    for name in names:
+        run = BENCHMARKS[name](fixtures)
+        if run is None:
+            if log:
+                log("{:<24} skipped (fixtures not available)".format(name))
+            continue
+
+        seconds, number = measure(run, repeat=repeat, min_time=min_time)
+        results[name] = {"seconds": seconds, "number": number, "repeat": repeat}
+
+        if log:
+            log("{:<24} {:12.3f} ms".format(name, seconds * 1000))
+
+    return results
+
+
+def compare(results, baseline, *, threshold=0.1, section="benchmarks", key="seconds"):
+    """
+    Compares results with the benchmarks of a previous run. Returns a list of
+    (name, ratio) tuples for benchmarks that are slower (or use more memory)
+    by more than the given relative *threshold*.
+    """
+    regressions = []
+
+    for name, result in results.items():
+        try:
+            previous = baseline[section][name][key]
+        except KeyError:
+            continue
+
+        ratio = result[key] / previous
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help="Benchmarks to run. Defaults to all: {}".format(", ".join(list(BENCHMARKS) + list(MEMORY_BENCHMARKS))))
+    parser.add_argument("--json", metavar="FILE",
+                        help="Write results as JSON to FILE (- for stdout)")
+    parser.add_argument("--compare", metavar="FILE", type=argparse.FileType("r"),
+                        help="Compare with the JSON results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Maximum allowed relative slowdown when comparing. Defaults to 0.1")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of repetitions. The best is reported. Defaults to 5")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="Minimum duration of each repetition in seconds. Defaults to 0.2")
+    parser.add_argument("--data", default="data",
+                        help="Directory with test fixtures. Defaults to data")
+
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list(BENCHMARKS) + list(MEMORY_BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS and name not in MEMORY_BENCHMARKS:
+            parser.error("unknown benchmark: {}".format(name))
+
+    def log(line):
+        print(line, file=sys.stderr)
+
+    fixtures = Fixtures(args.data)
+    results = run_benchmarks([name for name in names if name in BENCHMARKS],
+                             repeat=args.repeat, min_time=args.min_time, fixtures=fixtures, log=log)
+    memory = run_memory_benchmarks([name for name in names if name in MEMORY_BENCHMARKS], fixtures=fixtures, log=log)
+
+    report = collections.OrderedDict()
+    report["python"] = platform.python_version()
+    report["implementation"] = platform.python_implementation()
+    report["version"] = chess.__version__
+    report["benchmarks"] = results
+    report["memory"] = memory
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        baseline = json.load(args.compare)
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for name, ratio in regressions:
+            log("REGRESSION: {} is {:.1f}% slower".format(name, (ratio - 1) * 100))
+        memory_regressions = compare(memory, baseline, threshold=args.threshold, section="memory", key="bytes")
+        for name, ratio in memory_regressions:
+            log("REGRESSION: {} uses {:.1f}% more memory".format(name, (ratio - 1) * 100))
+        if regressions or memory_regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,6 +34,7 @@ import copy
 import enum
 import re
 import itertools
+import threading
 
 
 COLORS = [WHITE, BLACK] = [True, False]
@@ -248,6 +249,18 @@ def flip_anti_diagonal(bb):
     bb = bb ^ (t ^ (t >> 9))
     return bb
 
+def rotate_clockwise(bb):
+    return flip_vertical(flip_diagonal(bb))
+
+def rotate_counterclockwise(bb):
+    return flip_diagonal(flip_vertical(bb))
+
+def rotate_180(bb):
+    return flip_vertical(flip_horizontal(bb))
+
+def _identity(bb):
+    return bb
+
 
 def shift_down(b):
     return b >> 8
@@ -377,6 +390,134 @@ SAN_REGEX = re.compile(r"^([NBKRQ])?([a-h])?([1-8])?[\-x]?([a-h][1-8])(=?[nbrqkN
 FEN_CASTLING_REGEX = re.compile(r"^(?:-|[KQABCDEFGH]{0,2}[kqabcdefgh]{0,2})\Z")
 
 
+def _fen_rank_templates():
+    # For each occupancy of a rank, a format string with placeholders for
+    # the pieces and the files of the pieces, like ("{}2{}4", (0, 3)).
+    templates = []
+    for occupancy in range(256):
+        template = []
+        files = []
+        empty = 0
+        for file_index in range(8):
+            if occupancy & (1 << file_index):
+                if empty:
+                    template.append(str(empty))
+                    empty = 0
+                template.append("{}")
+                files.append(file_index)
+            else:
+                empty += 1
+        if empty:
+            template.append(str(empty))
+        templates.append(("".join(template), tuple(files)))
+    return templates
+
+_FEN_RANK_TEMPLATES = _fen_rank_templates()
+
+
+def _parse_fen_rank(row):
+    # Parses a row of the position part of a FEN into the masks of the
+    # pawns, knights, bishops, rooks, queens, kings, promoted pieces, white
+    # pieces and black pieces on the first rank. Returns None if the row is
+    # invalid.
+    masks = [BB_EMPTY] * 9
+    file_index = 0
+    previous_was_digit = False
+    previous_was_piece = False
+
+    for c in row:
+        if c in "12345678":
+            if previous_was_digit:
+                return None
+            file_index += int(c)
+            previous_was_digit = True
+            previous_was_piece = False
+        elif c == "~":
+            if not previous_was_piece:
+                return None
+            masks[6] |= 1 << (file_index - 1)
+            previous_was_digit = False
+            previous_was_piece = False
+        elif c.lower() in PIECE_SYMBOLS and file_index < 8:
+            mask = 1 << file_index
+            masks[PIECE_SYMBOLS.index(c.lower()) - 1] |= mask
+            masks[7 if c.isupper() else 8] |= mask
+            file_index += 1
+            previous_was_digit = False
+            previous_was_piece = True
+        else:
+            return None
+
+    if file_index != 8:
+        return None
+
+    return tuple(masks)
+
+
+_fen_rank_cache = {}
+
+_board_fen_cache = collections.OrderedDict()
+_board_fen_cache_size = 1024
+_board_fen_cache_lock = threading.Lock()
+
+
+def set_fen_cache_size(size):
+    """
+    Sets the maximum number of recently parsed board FENs that are
+    remembered, so that setting up the same positions again and again
+    (for example from an external service) is cheap. Defaults to 1024.
+    ``0`` disables the cache.
+    """
+    global _board_fen_cache_size
+    with _board_fen_cache_lock:
+        _board_fen_cache_size = size
+        while len(_board_fen_cache) > max(size, 0):
+            _board_fen_cache.popitem(last=False)
+
+
+def _parse_board_fen(fen):
+    # Parses the position part of a FEN into the bitboards of the pawns,
+    # knights, bishops, rooks, queens, kings, promoted pieces, white pieces
+    # and black pieces. Returns None if the FEN is invalid.
+    with _board_fen_cache_lock:
+        bitboards = _board_fen_cache.get(fen)
+        if bitboards is not None:
+            _board_fen_cache.move_to_end(fen)
+            return bitboards
+
+    rows = fen.split("/")
+    if len(rows) != 8:
+        return None
+
+    bitboards = [BB_EMPTY] * 9
+    shift = 56
+    for row in rows:
+        masks = _fen_rank_cache.get(row)
+        if masks is None:
+            masks = _parse_fen_rank(row)
+            if masks is None:
+                return None
+            if len(_fen_rank_cache) >= 4096:
+                _fen_rank_cache.clear()
+            _fen_rank_cache[row] = masks
+
+        for i, mask in enumerate(masks):
+            if mask:
+                bitboards[i] |= mask << shift
+
+        shift -= 8
+
+    bitboards = tuple(bitboards)
+
+    with _board_fen_cache_lock:
+        if _board_fen_cache_size > 0:
+            _board_fen_cache[fen] = bitboards
+            while len(_board_fen_cache) > _board_fen_cache_size:
+                _board_fen_cache.popitem(last=False)
+
+    return bitboards
+
+
 class Piece:
     """A piece with type and color."""
 
@@ -867,31 +1008,31 @@ class BaseBoard:
         """
         Gets the board FEN.
         """
-        builder = []
-        empty = 0
-
-        for square in SQUARES_180:
-            piece = self.piece_at(square)
-
-            if not piece:
-                empty += 1
-            else:
-                if empty:
-                    builder.append(str(empty))
-                    empty = 0
-                builder.append(piece.symbol())
-                if promoted and BB_SQUARES[square] & self.promoted:
-                    builder.append("~")
+        # Collect the piece symbols by square, then fill them into the
+        # precomputed template for the occupancy of each rank.
+        symbols = {}
+        white = self.occupied_co[WHITE]
+        for bb, upper, lower in [(self.pawns, "P", "p"),
+                                 (self.knights, "N", "n"),
+                                 (self.bishops, "B", "b"),
+                                 (self.rooks, "R", "r"),
+                                 (self.queens, "Q", "q"),
+                                 (self.kings, "K", "k")]:
+            for square in scan_reversed(bb & white):
+                symbols[square] = upper
+            for square in scan_reversed(bb & ~white):
+                symbols[square] = lower
 
-            if BB_SQUARES[square] & BB_FILE_H:
-                if empty:
-                    builder.append(str(empty))
-                    empty = 0
+        if promoted:
+            for square in scan_reversed(self.promoted & self.occupied):
+                symbols[square] += "~"
 
-                if square != H1:
-                    builder.append("/")
+        builder = []
+        for shift in [56, 48, 40, 32, 24, 16, 8, 0]:
+            template, files = _FEN_RANK_TEMPLATES[self.occupied >> shift & 0xff]
+            builder.append(template.format(*[symbols[shift + file_index] for file_index in files]))
 
-        return "".join(builder)
+        return "/".join(builder)
 
     def _set_board_fen(self, fen):
         # Compability with set_fen().
@@ -899,7 +1040,16 @@ class BaseBoard:
         if " " in fen:
             raise ValueError("expected position part of fen, got multiple parts: {!r}".format(fen))
 
-        # Ensure the FEN is valid.
+        bitboards = _parse_board_fen(fen)
+        if bitboards is None:
+            self._validate_board_fen(fen)
+
+        (self.pawns, self.knights, self.bishops, self.rooks, self.queens, self.kings,
+         self.promoted, self.occupied_co[WHITE], self.occupied_co[BLACK]) = bitboards
+        self.occupied = self.occupied_co[WHITE] | self.occupied_co[BLACK]
+
+    def _validate_board_fen(self, fen):
+        # Raise a descriptive error for an invalid board FEN.
         rows = fen.split("/")
         if len(rows) != 8:
             raise ValueError("expected 8 rows in position part of fen: {!r}".format(fen))
@@ -932,20 +1082,7 @@ class BaseBoard:
             if field_sum != 8:
                 raise ValueError("expected 8 columns per row in position part of fen: {!r}".format(fen))
 
-        # Clear the board.
-        self._clear_board()
-
-        # Put pieces on the board.
-        square_index = 0
-        for c in fen:
-            if c in ["1", "2", "3", "4", "5", "6", "7", "8"]:
-                square_index += int(c)
-            elif c.lower() in PIECE_SYMBOLS:
-                piece = Piece.from_symbol(c)
-                self._set_piece_at(SQUARES_180[square_index], piece.piece_type, piece.color)
-                square_index += 1
-            elif c == "~":
-                self.promoted |= BB_SQUARES[SQUARES_180[square_index - 1]]
+        raise ValueError("invalid position part of fen: {!r}".format(fen))
 
     def set_board_fen(self, fen):
         """
@@ -2495,11 +2632,34 @@ class Board(BaseBoard):
             # Null move.
             return "--"
 
-        # Look ahead for check or checkmate.
+        san = self._algebraic_and_push(move, long)
+        self.pop()
+        return san
+
+    def _algebraic_and_push(self, move, long=False):
+        # Gets the SAN (or LAN) of the move and pushes it, which is needed
+        # anyway to look ahead for check or checkmate.
+        san = self._algebraic_without_suffix(move, long)
+
         self.push(move)
+        if not move:
+            return san
+
         is_check = self.is_check()
         is_checkmate = (is_check and self.is_checkmate()) or self.is_variant_loss() or self.is_variant_win()
-        self.pop()
+
+        # Add check or checkmate suffix.
+        if is_checkmate:
+            return san + "#"
+        elif is_check:
+            return san + "+"
+        else:
+            return san
+
+    def _algebraic_without_suffix(self, move, long=False):
+        if not move:
+            # Null move.
+            return "--"
 
         # Drops.
         if move.drop:
@@ -2507,21 +2667,14 @@ class Board(BaseBoard):
             if move.drop != PAWN:
                 san = PIECE_SYMBOLS[move.drop].upper()
             san += "@" + SQUARE_NAMES[move.to_square]
+            return san
 
         # Castling.
         if self.is_castling(move):
             if square_file(move.to_square) < square_file(move.from_square):
-                san = "O-O-O"
+                return "O-O-O"
             else:
-                san = "O-O"
-
-        if move.drop or self.is_castling(move):
-            if is_checkmate:
-                return san + "#"
-            elif is_check:
-                return san + "+"
-            else:
-                return san
+                return "O-O"
 
         piece_type = self.piece_type_at(move.from_square)
         assert piece_type, "san() and lan() expect move to be legal or null, but got {} in {}".format(move, self.fen())
@@ -2577,12 +2730,6 @@ class Board(BaseBoard):
         if move.promotion:
             san += "=" + PIECE_SYMBOLS[move.promotion].upper()
 
-        # Add check or checkmate suffix.
-        if is_checkmate:
-            san += "#"
-        elif is_check:
-            san += "+"
-
         return san
 
     def variation_san(self, variation):
@@ -2603,13 +2750,11 @@ class Board(BaseBoard):
                 raise ValueError("illegal move {} in position {}".format(move, board.fen()))
 
             if board.turn == WHITE:
-                san.append("{}. {}".format(board.fullmove_number, board.san(move)))
+                san.append("{}. {}".format(board.fullmove_number, board._algebraic_and_push(move)))
             elif not san:
-                san.append("{}...{}".format(board.fullmove_number, board.san(move)))
+                san.append("{}...{}".format(board.fullmove_number, board._algebraic_and_push(move)))
             else:
-                san.append(board.san(move))
-
-            board.push(move)
+                san.append(board._algebraic_and_push(move))
 
         return " ".join(san)
 
@@ -3182,6 +3327,116 @@ class Board(BaseBoard):
             self.generate_legal_moves(from_mask, to_mask & self.occupied_co[not self.turn]),
             self.generate_legal_ep(from_mask, to_mask))
 
+    def _gives_check(self, move):
+        if not move.drop and (self.is_castling(move) or self.is_en_passant(move)):
+            self.push(move)
+            gives_check = self.is_check()
+            self.pop()
+            return gives_check
+
+        king = self.king(not self.turn)
+        if king is None:
+            return False
+
+        from_bb = 0 if move.drop else BB_SQUARES[move.from_square]
+        occupied = self.occupied & ~from_bb | BB_SQUARES[move.to_square]
+        piece_type = move.drop or move.promotion or self.piece_type_at(move.from_square)
+
+        # Direct check by the moved piece.
+        if piece_type == PAWN:
+            attacks = BB_PAWN_ATTACKS[self.turn][move.to_square]
+        elif piece_type == KNIGHT:
+            attacks = BB_KNIGHT_ATTACKS[move.to_square]
+        elif piece_type == KING:
+            attacks = 0
+        else:
+            attacks = 0
+            if piece_type != ROOK:
+                attacks |= BB_DIAG_ATTACKS[move.to_square][BB_DIAG_MASKS[move.to_square] & occupied]
+            if piece_type != BISHOP:
+                attacks |= (BB_RANK_ATTACKS[move.to_square][BB_RANK_MASKS[move.to_square] & occupied] |
+                            BB_FILE_ATTACKS[move.to_square][BB_FILE_MASKS[move.to_square] & occupied])
+
+        if attacks & BB_SQUARES[king]:
+            return True
+
+        # Discovered check by a slider.
+        sliders = self.occupied_co[self.turn] & ~from_bb
+        return bool(
+            (BB_RANK_ATTACKS[king][BB_RANK_MASKS[king] & occupied] |
+             BB_FILE_ATTACKS[king][BB_FILE_MASKS[king] & occupied]) & sliders & (self.rooks | self.queens) or
+            BB_DIAG_ATTACKS[king][BB_DIAG_MASKS[king] & occupied] & sliders & (self.bishops | self.queens))
+
+    def generate_legal_checks(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        """
+        Generates legal moves that give check.
+
+        Pieces can only give direct check by moving to a square that attacks
+        the opposing king, so most moves are never generated. Moves that
+        uncover an attack of a slider, promotions, en passant captures and
+        castling moves are verified individually.
+        """
+        king = self.king(not self.turn)
+        if king is None:
+            return
+
+        our_pieces = self.occupied_co[self.turn]
+        rooks_and_queens = self.rooks | self.queens
+        bishops_and_queens = self.bishops | self.queens
+
+        # Pieces that are the only blocker between one of our sliders and the
+        # opposing king.
+        snipers = (((BB_RANK_ATTACKS[king][0] | BB_FILE_ATTACKS[king][0]) & rooks_and_queens) |
+                   (BB_DIAG_ATTACKS[king][0] & bishops_and_queens))
+
+        discoverers = 0
+        for sniper in scan_reversed(snipers & our_pieces):
+            b = BB_BETWEEN[king][sniper] & self.occupied
+            if b and BB_SQUARES[msb(b)] == b:
+                discoverers |= b
+        discoverers &= our_pieces
+
+        # Direct checks.
+        diag_targets = BB_DIAG_ATTACKS[king][BB_DIAG_MASKS[king] & self.occupied]
+        line_targets = (BB_RANK_ATTACKS[king][BB_RANK_MASKS[king] & self.occupied] |
+                        BB_FILE_ATTACKS[king][BB_FILE_MASKS[king] & self.occupied])
+
+        for piece_type, targets in [(KNIGHT, BB_KNIGHT_ATTACKS[king]),
+                                    (BISHOP, diag_targets),
+                                    (ROOK, line_targets),
+                                    (QUEEN, diag_targets | line_targets)]:
+            pieces = self.pieces_mask(piece_type, self.turn) & ~discoverers & from_mask
+            if pieces and targets & to_mask:
+                yield from self.generate_legal_moves(pieces, targets & to_mask)
+
+        pawns = self.pawns & our_pieces & ~discoverers & from_mask
+        if pawns:
+            targets = BB_PAWN_ATTACKS[not self.turn][king] | BB_BACKRANKS
+            if self.ep_square:
+                targets |= BB_SQUARES[self.ep_square]
+
+            for move in self.generate_legal_moves(pawns, targets & to_mask):
+                if move.promotion or move.to_square == self.ep_square:
+                    if self._gives_check(move):
+                        yield move
+                else:
+                    yield move
+
+        # Discovered checks and castling.
+        for move in self.generate_legal_moves((discoverers | self.kings & our_pieces) & from_mask, to_mask):
+            if BB_SQUARES[move.from_square] & discoverers or self.is_castling(move):
+                if self._gives_check(move):
+                    yield move
+
+    def generate_legal_quiets(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        """
+        Generates legal moves that are neither captures nor promotions.
+        Quiet moves may still give check.
+        """
+        for move in self.generate_legal_moves(from_mask, to_mask & ~self.occupied_co[not self.turn]):
+            if not move.promotion and not self.is_en_passant(move):
+                yield move
+
     def _attacked_for_king(self, path, occupied):
         return any(self._attackers_mask(not self.turn, sq, occupied) for sq in scan_reversed(path))
 
@@ -3314,6 +3569,47 @@ class Board(BaseBoard):
         board.turn = not self.turn
         return board
 
+    def _symmetries(self):
+        if self.clean_castling_rights():
+            return [_identity]
+        elif self.pawns:
+            return [_identity, flip_horizontal]
+        else:
+            return [_identity, flip_horizontal, flip_vertical, rotate_180,
+                    flip_diagonal, flip_anti_diagonal,
+                    rotate_clockwise, rotate_counterclockwise]
+
+    def canonical_transform(self):
+        """
+        Finds a canonical representative among the positions that are
+        equivalent to this one by symmetry.
+
+        Positions with castling rights have no symmetries. Positions with
+        pawns can only be mirrored horizontally. Other positions can be
+        flipped and rotated in 8 different ways.
+
+        Returns a tuple of a transform function, which can be passed to
+        :func:`~chess.Board.transform()` to obtain the canonical position, and
+        a hashable key that is the same for all equivalent positions.
+
+        >>> import chess
+        >>>
+        >>> board = chess.Board("8/8/8/8/8/2k5/1q6/K7 w - - 0 1")
+        >>> flipped = board.transform(chess.flip_vertical)
+        >>> board.canonical_transform()[1] == flipped.canonical_transform()[1]
+        True
+        """
+        best_transform = None
+        best_key = None
+
+        for f in self._symmetries():
+            key = self.transform(f)._transposition_key()
+            if best_key is None or key < best_key:
+                best_transform = f
+                best_key = key
+
+        return best_transform, best_key
+
     def copy(self, *, stack=True):
         board = super().copy()
 
@@ -3354,6 +3650,28 @@ class Board(BaseBoard):
         return board
 
 
+def canonical_transforms(boards):
+    """
+    Like :func:`chess.Board.canonical_transform()`, but for an iterable of
+    boards. Repeated positions are only canonicalized once.
+
+    Returns a list of tuples of transform functions and keys, in the same
+    order as the given boards.
+    """
+    cache = {}
+    results = []
+
+    for board in boards:
+        transposition_key = (type(board), board._transposition_key())
+        try:
+            result = cache[transposition_key]
+        except KeyError:
+            result = cache[transposition_key] = board.canonical_transform()
+        results.append(result)
+
+    return results
+
+
 class PseudoLegalMoveGenerator:
 
     def __init__(self, board):
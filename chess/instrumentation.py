@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the python-chess library.
+# Copyright (C) 2012-2019 Niklas Fiekas <niklas.fiekas@backscattering.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import contextlib
+import inspect
+import time
+
+import chess
+
+
+METHODS = [
+    "push",
+    "pop",
+    "generate_legal_moves",
+    "san",
+    "parse_san",
+    "can_claim_threefold_repetition",
+    "is_fivefold_repetition",
+    "copy",
+]
+"""Names of the :class:`~chess.Board` methods that are instrumented."""
+
+
+class Stats(collections.namedtuple("Stats", "calls time")):
+    """
+    Number of *calls* of a method and the total *time* spent in it (in
+    seconds), or ``None`` if timing was not enabled.
+    """
+
+    __slots__ = ()
+
+
+class _Counter:
+
+    __slots__ = ("calls", "time")
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+
+
+_counters = collections.OrderedDict((name, _Counter()) for name in METHODS)
+_patched = []
+_timing = False
+
+
+def _timed_generator(counter, generator, *, _perf_counter=time.perf_counter):
+    while True:
+        start = _perf_counter()
+        try:
+            item = next(generator)
+        except StopIteration:
+            counter.time += _perf_counter() - start
+            return
+        counter.time += _perf_counter() - start
+        yield item
+
+
+def _wrap(name, original, counter, timing):
+    # Calls through super() reach the wrapper of a base class. Only the
+    # wrapper that is actually resolved for type(self) counts, so that
+    # overridden methods in variants are not counted twice.
+    if not timing:
+        def wrapper(self, *args, **kwargs):
+            if getattr(type(self), name) is wrapper:
+                counter.calls += 1
+            return original(self, *args, **kwargs)
+    elif inspect.isgeneratorfunction(original):
+        def wrapper(self, *args, **kwargs):
+            if getattr(type(self), name) is not wrapper:
+                return original(self, *args, **kwargs)
+            counter.calls += 1
+            return _timed_generator(counter, original(self, *args, **kwargs))
+    else:
+        def wrapper(self, *args, _perf_counter=time.perf_counter, **kwargs):
+            if getattr(type(self), name) is not wrapper:
+                return original(self, *args, **kwargs)
+            counter.calls += 1
+            start = _perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                counter.time += _perf_counter() - start
+
+    wrapper.__name__ = original.__name__
+    wrapper.__qualname__ = original.__qualname__
+    wrapper.__doc__ = original.__doc__
+    wrapper.__wrapped__ = original
+    return wrapper
+
+
+def _board_classes():
+    classes = []
+    pending = [chess.Board]
+    while pending:
+        cls = pending.pop()
+        if cls not in classes:
+            classes.append(cls)
+            pending.extend(cls.__subclasses__())
+    return classes
+
+
+def is_enabled():
+    """Checks if instrumentation is currently enabled."""
+    return bool(_patched)
+
+
+def enable(*, timing=False):
+    """
+    Starts counting calls of the instrumented methods of
+    :class:`chess.Board` and all subclasses that exist at this point
+    (so import :mod:`chess.variant` first, if needed).
+
+    With *timing*, also measures the total time spent in the methods. Times
+    are inclusive, i.e., the time spent in :func:`~chess.Board.san()` also
+    contains the time spent in the nested :func:`~chess.Board.push()`. For
+    generators, only time spent producing items is measured.
+
+    The methods are replaced on the classes, so there is no overhead at all
+    while instrumentation is disabled. Counting is not thread-safe.
+    """
+    global _timing
+
+    if is_enabled():
+        disable()
+
+    _timing = timing
+
+    for cls in _board_classes():
+        for name in METHODS:
+            original = cls.__dict__.get(name)
+            if original is not None:
+                _patched.append((cls, name, original))
+                setattr(cls, name, _wrap(name, original, _counters[name], timing))
+
+
+def disable():
+    """
+    Restores the original methods. Counters are kept until
+    :func:`~chess.instrumentation.reset()`.
+    """
+    while _patched:
+        cls, name, original = _patched.pop()
+        setattr(cls, name, original)
+
+
+def reset():
+    """Resets all counters to zero."""
+    for counter in _counters.values():
+        counter.calls = 0
+        counter.time = 0.0
+
+
+def snapshot():
+    """
+    Gets the current counters as a dictionary of
+    :class:`~chess.instrumentation.Stats` by method name.
+
+    >>> import chess
+    >>> import chess.instrumentation
+    >>>
+    >>> with chess.instrumentation.instrumented():
+    ...     board = chess.Board()
+    ...     board.push_san("e4")
+    ...
+    Move.from_uci('e2e4')
+    >>> chess.instrumentation.snapshot()["push"]
+    Stats(calls=1, time=None)
+    """
+    return collections.OrderedDict(
+        (name, Stats(counter.calls, counter.time if _timing else None))
+        for name, counter in _counters.items())
+
+
+@contextlib.contextmanager
+def instrumented(*, timing=False):
+    """
+    Context manager that resets the counters and enables instrumentation
+    for the duration of the block. Use :func:`~chess.instrumentation.snapshot()`
+    to get the results.
+    """
+    reset()
+    enable(timing=timing)
+    try:
+        yield
+    finally:
+        disable()
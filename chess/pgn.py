@@ -16,13 +16,38 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import array
+import asyncio
+import bisect
+import builtins
+import codecs
+import collections
 import collections.abc
+import concurrent.futures
+import gzip
+import heapq
+import io
 import itertools
+import json
 import logging
+import mmap
+import os
 import re
+import struct
+import time
 import weakref
+import zlib
 
 import chess
+import chess.polyglot
+
+
+try:
+    StopAsyncIteration
+except NameError:
+    # Python 3.4
+    class StopAsyncIteration(Exception):
+        pass
 
 
 LOGGER = logging.getLogger(__name__)
@@ -104,23 +129,98 @@ MOVETEXT_REGEX = re.compile(r"""
 
 SKIP_MOVETEXT_REGEX = re.compile(r""";|\{|\}""")
 
+MOVETEXT_BYTES_REGEX = re.compile(br"""
+    (^[ \t\r\f\v]*(?:\n|\Z))
+    |(^%[^\n]*)
+    |\{([^}]*)\}?
+    |(;[^\n]*)
+    |(
+        [NBKRQ]?[a-h]?[1-8]?[\-x]?[a-h][1-8](?:=?[nbrqkNBRQK])?
+        |[PNBRQK]?@[a-h][1-8]
+        |--
+        |Z0
+        |O-O(?:-O)?
+        |0-0(?:-0)?
+    )
+    |(\$[0-9]+)
+    |(\()
+    |(\))
+    |(\*|1-0|0-1|1/2-1/2)
+    |([\?!]{1,2})
+    """, re.MULTILINE | re.VERBOSE)
+
+SKIP_MOVETEXT_BYTES_REGEX = re.compile(br"""
+    (^[ \t\r\f\v]*(?:\n|\Z))
+    |^%[^\n]*
+    |\{[^}]*\}?
+    |;[^\n]*
+    """, re.MULTILINE | re.VERBOSE)
+
+TAG_BYTES_REGEX = re.compile(br"^\[([A-Za-z0-9_]+)\s+\"(.*)\"\]\s*$")
+
+_EMPTY_LINE_BYTES_REGEX = re.compile(br"\n[ \t\r\f\v]*(?:\n|\Z)")
+
+_EMPTY_REST_BYTES_REGEX = re.compile(br"[ \t\r\f\v]*(?:\n|\Z)")
+
+_LEADING_BYTES_REGEX = re.compile(br"(?:[ \t\r\f\v]*\n|[ \t\r\f\v]+\Z|[%;][^\n]*(?:\n|\Z))*")
+
+_TAG_LINE_BYTES_REGEX = re.compile(br"\[([A-Za-z0-9_]+)[ \t\r\f\v]+\"(.*)\"\][ \t\r\f\v]*(?:\n|\Z)")
+
+_ANNOTATION_NAGS = {
+    b"?": NAG_MISTAKE,
+    b"??": NAG_BLUNDER,
+    b"!": NAG_GOOD_MOVE,
+    b"!!": NAG_BRILLIANT_MOVE,
+    b"!?": NAG_SPECULATIVE_MOVE,
+    b"?!": NAG_DUBIOUS_MOVE,
+}
+
 TAG_ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
 
 
 SKIP = object()
 
 
+_VISIT_NODE, _VISIT_VARIATION, _END_VARIATION, _CONTINUE_MAINLINE, _UP = range(5)
+
+_SAN_TOKEN, _COMMENT_TOKEN, _NAG_TOKEN, _OPEN_TOKEN, _CLOSE_TOKEN, _RESULT_TOKEN = range(6)
+
+
 class GameNode:
+    # Ad hoc attributes and weak references are still supported, but the
+    # instance dictionary is only created when first needed.
+    __slots__ = ["parent", "move", "_nags", "starting_comment", "comment", "_variations", "board_cached", "__dict__", "__weakref__"]
+
     def __init__(self):
         self.parent = None
         self.move = None
-        self.nags = set()
+        self._nags = None
         self.starting_comment = ""
         self.comment = ""
-        self.variations = []
+        self._variations = None
 
         self.board_cached = None
 
+    @property
+    def nags(self):
+        if self._nags is None:
+            self._nags = set()
+        return self._nags
+
+    @nags.setter
+    def nags(self, nags):
+        self._nags = nags
+
+    @property
+    def variations(self):
+        if self._variations is None:
+            self._variations = []
+        return self._variations
+
+    @variations.setter
+    def variations(self, variations):
+        self._variations = variations
+
     def board(self, *, _cache=True):
         """
         Gets a board with the position of the node.
@@ -132,8 +232,23 @@ class GameNode:
             if board is not None:
                 return board.copy()
 
-        board = self.parent.board(_cache=False)
-        board.push(self.move)
+        # Walk up to the root or the closest cached position, then replay
+        # the moves from there.
+        moves = []
+        node = self
+        board = None
+        while board is None:
+            moves.append(node.move)
+            node = node.parent
+            if node.parent is None:
+                board = node.board(_cache=False)
+            elif node.board_cached is not None:
+                board = node.board_cached()
+                if board is not None:
+                    board = board.copy()
+
+        for move in reversed(moves):
+            board.push(move)
 
         if _cache:
             self.board_cached = weakref.ref(board)
@@ -172,14 +287,14 @@ class GameNode:
         """Follows the main variation to the end and returns the last node."""
         node = self
 
-        while node.variations:
-            node = node.variations[0]
+        while node._variations:
+            node = node._variations[0]
 
         return node
 
     def is_end(self):
         """Checks if this node is the last node in the current variation."""
-        return not self.variations
+        return not self._variations
 
     def starts_variation(self):
         """
@@ -190,10 +305,10 @@ class GameNode:
         For example, in ``1. e4 e5 (1... c5 2. Nf3) 2. Nf3``, the node holding
         1... c5 starts a variation.
         """
-        if not self.parent or not self.parent.variations:
+        if not self.parent or not self.parent._variations:
             return False
 
-        return self.parent.variations[0] != self
+        return self.parent._variations[0] != self
 
     def is_mainline(self):
         """Checks if the node is in the mainline of the game."""
@@ -202,7 +317,7 @@ class GameNode:
         while node.parent:
             parent = node.parent
 
-            if not parent.variations or parent.variations[0] != node:
+            if not parent._variations or parent._variations[0] != node:
                 return False
 
             node = parent
@@ -217,7 +332,7 @@ class GameNode:
         if not self.parent:
             return True
 
-        return not self.parent.variations or self.parent.variations[0] == self
+        return not self.parent._variations or self.parent._variations[0] == self
 
     def __getitem__(self, move):
         try:
@@ -267,7 +382,8 @@ class GameNode:
         """Creates a child node with the given attributes."""
         node = GameNode()
         node.move = move
-        node.nags = set(nags)
+        if nags:
+            node.nags = set(nags)
         node.parent = self
         node.comment = comment
         node.starting_comment = starting_comment
@@ -310,13 +426,14 @@ class GameNode:
         else:
             node.comment = comment
 
-        node.nags.update(nags)
+        if nags:
+            node.nags.update(nags)
 
         return node
 
     def _accept_node(self, parent_board, visitor):
         if self.starting_comment:
-            visitor.visit_comment(self.starting_comment)
+            visitor.visit_starting_comment(self.starting_comment)
 
         visitor.visit_move(parent_board, self.move)
 
@@ -324,34 +441,77 @@ class GameNode:
         visitor.visit_board(parent_board)
         parent_board.pop()
 
-        for nag in sorted(self.nags):
-            visitor.visit_nag(nag)
+        if self._nags:
+            for nag in sorted(self._nags):
+                visitor.visit_nag(nag)
 
         if self.comment:
             visitor.visit_comment(self.comment)
 
+    def _accept(self, cursor, visitor, *, sidelines=True):
+        # Visits this node and everything after it in PGN order. The cursor
+        # starts at the parent. Uses an explicit stack rather than recursion,
+        # so that long games do not exceed the recursion limit.
+        board = cursor.board
+        stack = [(_VISIT_NODE, self)]
+        while stack:
+            action, arg = stack.pop()
+
+            if action == _UP:
+                for _ in range(arg):
+                    cursor.up()
+                continue
+            elif action == _VISIT_VARIATION:
+                if visitor.begin_variation() is not SKIP:
+                    stack.append((_END_VARIATION, None))
+                    stack.append((_VISIT_NODE, arg))
+                else:
+                    visitor.end_variation()
+                continue
+            elif action == _END_VARIATION:
+                visitor.end_variation()
+                continue
+
+            node = arg
+            ups = 0
+            if action == _CONTINUE_MAINLINE:
+                if not node._variations:
+                    continue
+                cursor._descend(node)
+                ups = 1
+                node = node._variations[0]
+
+            # Follow the mainline until there are sidelines to visit first.
+            while True:
+                # First, visit the move that leads to this node.
+                node._accept_node(board, visitor)
+
+                # Then visit sidelines. The mainline is continued last.
+                siblings = node.parent._variations
+                if len(siblings) > 1 and node is siblings[0] and (sidelines or node is not self):
+                    if ups:
+                        stack.append((_UP, ups))
+                    stack.append((_CONTINUE_MAINLINE, node))
+                    for variation in reversed(siblings[1:]):
+                        stack.append((_VISIT_VARIATION, variation))
+                    break
+
+                if not node._variations:
+                    for _ in range(ups):
+                        cursor.up()
+                    break
+
+                cursor._descend(node)
+                ups += 1
+                node = node._variations[0]
+
     def accept(self, visitor, *, _parent_board=None):
         """
         Traverses game nodes in PGN order using the given *visitor*. Starts with
         the move leading to this node. Returns the *visitor* result.
         """
         board = self.parent.board() if _parent_board is None else _parent_board
-
-        # First, visit the move that leads to this node.
-        self._accept_node(board, visitor)
-
-        # Then visit sidelines.
-        if _parent_board is not None and self == self.parent.variations[0]:
-            for variation in itertools.islice(self.parent.variations, 1, None):
-                if visitor.begin_variation() is not SKIP:
-                    variation.accept(visitor, _parent_board=board)
-                visitor.end_variation()
-
-        # The mainline is continued last.
-        if self.variations:
-            board.push(self.move)
-            self.variations[0].accept(visitor, _parent_board=board)
-            board.pop()
+        self._accept(Cursor(self.parent, board), visitor, sidelines=_parent_board is not None)
 
         # Get the result if not called recursively.
         if _parent_board is None:
@@ -380,8 +540,8 @@ class GameNode:
             if visitor.end_headers() is not SKIP:
                 visitor.visit_board(board)
 
-                if self.variations:
-                    self.variations[0].accept(visitor, _parent_board=board)
+                if self._variations:
+                    self._variations[0]._accept(Cursor(self, board), visitor)
 
                 visitor.visit_result(game.headers.get("Result", "*"))
 
@@ -406,6 +566,8 @@ class Game(GameNode):
     :class:`~chess.pgn.GameNode`.
     """
 
+    __slots__ = ["headers", "errors"]
+
     def __init__(self, headers=None):
         super().__init__()
         self.headers = Headers(headers)
@@ -462,8 +624,8 @@ class Game(GameNode):
                 if self.comment:
                     visitor.visit_comment(self.comment)
 
-                if self.variations:
-                    self.variations[0].accept(visitor, _parent_board=board)
+                if self._variations:
+                    self._variations[0]._accept(Cursor(self, board), visitor)
 
                 visitor.visit_result(self.headers.get("Result", "*"))
 
@@ -490,6 +652,23 @@ class Game(GameNode):
         """Creates an empty game without the default 7 tag roster."""
         return cls(headers={})
 
+    def __reduce__(self):
+        # Pickle the game tree as a flat list of nodes in preorder, so that
+        # long games do not exceed the recursion limit.
+        nodes = []
+        stack = [(-1, self)]
+        while stack:
+            parent_index, node = stack.pop()
+            state = dict(getattr(node, "__dict__", {}))
+            for cls in type(node).__mro__:
+                for name in cls.__dict__.get("__slots__", []):
+                    if name not in ["parent", "_variations", "board_cached", "__dict__", "__weakref__"] and hasattr(node, name):
+                        state[name] = getattr(node, name)
+            nodes.append((parent_index, type(node), state))
+            index = len(nodes) - 1
+            stack.extend((index, child) for child in reversed(node._variations or []))
+        return _unpickle_game, (nodes, )
+
     def __repr__(self):
         return "<Game at {:#x} ({!r} vs. {!r}, {!r})>".format(
             id(self),
@@ -498,6 +677,69 @@ class Game(GameNode):
             self.headers.get("Date", "????.??.??"))
 
 
+class LazyGame(Game):
+    """
+    A :class:`~chess.pgn.Game` that keeps the raw *movetext* and parses it
+    only when the moves, variations, comments, NAGs or errors of the game
+    are first accessed. Created by :class:`~chess.pgn.LazyGameCreator`.
+
+    Until then, the ``Result`` header is as given in the headers, even if
+    the movetext ends with a different result.
+    """
+
+    __slots__ = ["_movetext"]
+
+    def __init__(self, headers=None, movetext=""):
+        super().__init__(headers)
+        del self._variations, self._nags, self.comment, self.errors
+        self._movetext = movetext
+
+    def __getattr__(self, name):
+        if name in ["variations", "_variations", "comment", "nags", "_nags", "errors"] and self._movetext is not None:
+            self._parse()
+            return getattr(self, name)
+        raise AttributeError("{!r} object has no attribute {!r}".format(type(self).__name__, name))
+
+    def _parse(self):
+        movetext, self._movetext = self._movetext, None
+        if not hasattr(self, "_variations"):
+            self._variations = None
+        if not hasattr(self, "_nags"):
+            self._nags = None
+        if not hasattr(self, "comment"):
+            self.comment = ""
+        if not hasattr(self, "errors"):
+            self.errors = []
+        read_game(io.StringIO(movetext, newline=None), Visitor=lambda: _LazyGameParser(self))
+
+    def accept(self, visitor):
+        if self._movetext is not None:
+            self._parse()
+        return super().accept(visitor)
+
+    def __reduce__(self):
+        if self._movetext is not None:
+            return type(self), (self.headers, self._movetext)
+        return super().__reduce__()
+
+
+def _unpickle_game(nodes):
+    built = []
+    for parent_index, cls, state in nodes:
+        node = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(node, name, value)
+        node._variations = None
+        node.board_cached = None
+        if parent_index < 0:
+            node.parent = None
+        else:
+            node.parent = built[parent_index]
+            node.parent.variations.append(node)
+        built.append(node)
+    return built[0]
+
+
 class Headers(collections.abc.MutableMapping):
     def __init__(self, data=None, **kwargs):
         self._tag_roster = {}
@@ -595,12 +837,12 @@ class Mainline:
         self.f = f
 
     def __bool__(self):
-        return bool(self.start.variations)
+        return bool(self.start._variations)
 
     def __iter__(self):
         node = self.start
-        while node.variations:
-            node = node.variations[0]
+        while node._variations:
+            node = node._variations[0]
             yield self.f(node)
 
     def __reversed__(self):
@@ -609,8 +851,8 @@ class Mainline:
     def accept(self, visitor):
         node = self.start
         board = self.start.board()
-        while node.variations:
-            node = node.variations[0]
+        while node._variations:
+            node = node._variations[0]
             node._accept_node(board, visitor)
             board.push(node.move)
         return visitor.result()
@@ -629,8 +871,8 @@ class ReverseMainline:
 
         self.length = 0
         node = stop
-        while node.variations:
-            node = node.variations[0]
+        while node._variations:
+            node = node._variations[0]
             self.length += 1
         self.end = node
 
@@ -650,6 +892,73 @@ class ReverseMainline:
         return "<ReverseMainline at {:#x} ({})>".format(id(self), " ".join(ReverseMainline(self.stop, lambda node: node.move.uci())))
 
 
+class Cursor:
+    """
+    Points to a node of a game tree and carries a :class:`~chess.Board`
+    with the position at that node.
+
+    Moving the cursor to a child or to the parent node is a single push or
+    pop on the board, whereas :func:`GameNode.board() <chess.pgn.GameNode.board()>`
+    replays all moves from the start of the game.
+
+    >>> import chess.pgn
+    >>>
+    >>> game = chess.pgn.read_game(open("data/pgn/kasparov-deep-blue-1997.pgn"))
+    >>> cursor = chess.pgn.Cursor(game)
+    >>> sum(1 for node in cursor.walk() if cursor.board.is_check())
+    3
+
+    *board* defaults to the position at *node*. The cursor takes ownership
+    of the board.
+    """
+
+    def __init__(self, node, board=None):
+        self.node = node
+        self.board = node.board() if board is None else board
+
+    def _descend(self, child):
+        self.board.push(child.move)
+        self.node = child
+
+    def down(self, move=0):
+        """
+        Moves to a child node, given by either the move or the variation
+        index. Defaults to the main variation. Returns the child node.
+        """
+        child = self.node[move]
+        self._descend(child)
+        return child
+
+    def up(self):
+        """Moves to the parent node and returns it."""
+        self.board.pop()
+        self.node = self.node.parent
+        return self.node
+
+    def walk(self):
+        """
+        Moves the cursor to each node after the current node in depth-first
+        order (main variations first) and yields the nodes. Finally, the
+        cursor returns to where it started.
+
+        The board and the game tree must not be modified while walking.
+        """
+        stack = [iter(self.node._variations or [])]
+        while stack:
+            for child in stack[-1]:
+                self._descend(child)
+                yield child
+                stack.append(iter(child._variations or []))
+                break
+            else:
+                stack.pop()
+                if stack:
+                    self.up()
+
+    def __repr__(self):
+        return "<Cursor at {:#x} ({!r})>".format(id(self), self.node)
+
+
 class BaseVisitor:
     """
     Base class for visitors.
@@ -712,6 +1021,15 @@ class BaseVisitor:
         """Called for each comment."""
         pass
 
+    def visit_starting_comment(self, comment):
+        """
+        Called for the starting comment of a move, before the move, when
+        traversing game nodes. Parsers can not tell starting comments apart
+        and call :func:`~chess.pgn.BaseVisitor.visit_comment()` instead,
+        which is also the default implementation.
+        """
+        self.visit_comment(comment)
+
     def visit_nag(self, nag):
         """Called for each NAG."""
         pass
@@ -783,12 +1101,17 @@ class GameCreator(BaseVisitor):
             # Add as a comment for the current node if in the middle of
             # a variation. Add as a comment for the game if the comment
             # starts before any move.
-            new_comment = [self.variation_stack[-1].comment, comment]
-            self.variation_stack[-1].comment = "\n".join(new_comment).strip()
+            node = self.variation_stack[-1]
+            node.comment = "\n".join([node.comment, comment]).strip() if node.comment else comment
         else:
             # Otherwise, it is a starting comment.
-            new_comment = [self.starting_comment, comment]
-            self.starting_comment = "\n".join(new_comment).strip()
+            self.visit_starting_comment(comment)
+
+    def visit_starting_comment(self, comment):
+        if self.starting_comment:
+            self.starting_comment = "\n".join([self.starting_comment, comment]).strip()
+        else:
+            self.starting_comment = comment
 
     def visit_move(self, board, move):
         self.variation_stack[-1] = self.variation_stack[-1].add_variation(move)
@@ -811,6 +1134,122 @@ class GameCreator(BaseVisitor):
         return self.game
 
 
+class _LazyGameParser(GameCreator):
+    # Parses movetext into an existing lazy game.
+
+    def __init__(self, game):
+        self.lazy_game = game
+
+    def begin_game(self):
+        self.game = self.lazy_game
+
+        self.variation_stack = [self.game]
+        self.starting_comment = ""
+        self.in_variation = False
+
+
+class LazyGameCreator(BaseVisitor):
+    """
+    Creates :class:`~chess.pgn.LazyGame` objects. Only the headers are
+    parsed, the movetext is skipped and stored as it is.
+
+    >>> import chess.pgn
+    >>>
+    >>> pgn = open("data/pgn/kasparov-deep-blue-1997.pgn")
+    >>> game = chess.pgn.read_game(pgn, Visitor=chess.pgn.LazyGameCreator)
+    >>> game.headers["Result"]
+    '1-0'
+    >>> game.end().board().fullmove_number  # Parses the movetext
+    45
+    """
+
+    def begin_game(self):
+        self.game = LazyGame()
+
+    def begin_headers(self):
+        return self.game.headers
+
+    def visit_header(self, tagname, tagvalue):
+        self.game.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        return SKIP
+
+    def visit_raw_movetext(self, movetext):
+        """
+        Called by the parsers with the raw movetext of the game, when
+        skipping it after the headers.
+        """
+        self.game._movetext = movetext
+
+    def result(self):
+        return self.game
+
+
+_SQUARE_INDEXES = {name: square for square, name in enumerate(chess.SQUARE_NAMES)}
+
+_PIECE_TYPES = {symbol: piece_type for piece_type, symbol in enumerate(chess.PIECE_SYMBOLS) if symbol}
+_PIECE_TYPES.update((symbol.upper(), piece_type) for symbol, piece_type in list(_PIECE_TYPES.items()))
+
+
+def _parse_trusted_san(board, san):
+    # Resolves the origin of a SAN move that is known to be legal from
+    # the attack tables, without generating legal moves. Castling, drops,
+    # null moves and moves with more than one candidate are left to
+    # Board.parse_san().
+    match = chess.SAN_REGEX.match(san)
+    if not match:
+        return board.parse_san(san)
+
+    to_square = _SQUARE_INDEXES[match.group(4)]
+    ours = board.occupied_co[board.turn]
+
+    if match.group(1):
+        from_mask = board.attackers_mask(board.turn, to_square) & board.pieces_mask(_PIECE_TYPES[match.group(1)], board.turn)
+    elif match.group(2):
+        from_mask = chess.BB_PAWN_ATTACKS[not board.turn][to_square] & board.pawns & ours
+    else:
+        step = -8 if board.turn == chess.WHITE else 8
+        from_square = to_square + step
+        if 0 <= from_square < 64 and not chess.BB_SQUARES[from_square] & board.pawns & ours:
+            from_square += step
+        from_mask = chess.BB_SQUARES[from_square] & board.pawns & ours if 0 <= from_square < 64 else chess.BB_EMPTY
+
+    if match.group(2):
+        from_mask &= chess.BB_FILES[ord(match.group(2)) - ord("a")]
+    if match.group(3):
+        from_mask &= chess.BB_RANKS[int(match.group(3)) - 1]
+
+    if not from_mask or from_mask & (from_mask - 1):
+        return board.parse_san(san)
+
+    promotion = match.group(5)
+    return chess.Move(chess.lsb(from_mask), to_square, _PIECE_TYPES[promotion[-1]] if promotion else None)
+
+
+class TrustedGameCreator(GameCreator):
+    """
+    Creates a game model from input that is known to be valid, such as
+    games written by this library or by an engine.
+
+    Moves are resolved from the attack tables of the current position
+    instead of being validated against all legal moves. Errors are not
+    collected in :data:`Game.errors <chess.pgn.Game.errors>`, but raised.
+    The result is undefined for illegal moves.
+    """
+
+    def parse_san(self, board, san):
+        if san == "0-0":
+            san = "O-O"
+        elif san == "0-0-0":
+            san = "O-O-O"
+
+        return _parse_trusted_san(board, san)
+
+    def handle_error(self, error):
+        raise error
+
+
 class HeaderCreator(BaseVisitor):
     """Collects headers into a dictionary."""
 
@@ -1019,6 +1458,353 @@ class FileExporter(StringExporter):
         return self.__repr__()
 
 
+def export_games(games, handle, *, columns=80, headers=True, comments=True, variations=True, buffer_size=1 << 16):
+    """
+    Writes all *games* into a text file. The output is exactly the same as
+    when accepting each game with the same :class:`~chess.pgn.FileExporter`,
+    but it is produced much faster. The game trees are traversed directly
+    instead of using the visitor protocol, so that computing the SAN of a
+    move and playing it takes a single push. Output is written in batches
+    of roughly *buffer_size* characters.
+
+    >>> import chess.pgn
+    >>>
+    >>> games = chess.pgn.read_games(open("data/pgn/kasparov-deep-blue-1997.pgn"))
+    >>> new_pgn = open("/dev/null", "w", encoding="utf-8")
+    >>> chess.pgn.export_games(games, new_pgn)
+    """
+    out = []
+    pending = 0
+    parts = []
+    length = 0
+    force_movenumber = True
+    found_headers = False
+
+    def flush_current_line():
+        nonlocal length, pending
+        if parts:
+            line = "".join(parts).rstrip()
+            out.append(line)
+            out.append("\n")
+            pending += len(line) + 1
+            parts.clear()
+            length = 0
+
+    def write_token(token):
+        nonlocal length
+        if columns is not None and columns - length < len(token):
+            flush_current_line()
+        parts.append(token)
+        length += len(token)
+
+    def write_line(line=""):
+        nonlocal pending
+        flush_current_line()
+        line = line.rstrip()
+        out.append(line)
+        out.append("\n")
+        pending += len(line) + 1
+
+    def write_comment(comment):
+        nonlocal force_movenumber
+        if comments:
+            write_token("{ " + comment.replace("}", "").strip() + " } ")
+            force_movenumber = True
+
+    for game in games:
+        for tagname, tagvalue in game.headers.items():
+            if headers:
+                found_headers = True
+                write_line("[{} \"{}\"]".format(tagname, tagvalue))
+        if found_headers:
+            write_line()
+
+        board = game.board()
+        if game.comment:
+            write_comment(game.comment)
+
+        # Traverse the game tree in the same order as GameNode.accept().
+        stack = [(_VISIT_NODE, game._variations[0])] if game._variations else []
+        while stack:
+            action, arg = stack.pop()
+
+            if action == _UP:
+                for _ in range(arg):
+                    board.pop()
+                continue
+            elif action == _VISIT_VARIATION:
+                write_token("( ")
+                force_movenumber = True
+                stack.append((_END_VARIATION, None))
+                stack.append((_VISIT_NODE, arg))
+                continue
+            elif action == _END_VARIATION:
+                write_token(") ")
+                force_movenumber = True
+                continue
+
+            node = arg
+            ups = 0
+            if action == _CONTINUE_MAINLINE:
+                if not node._variations:
+                    continue
+                board.push(node.move)
+                ups = 1
+                node = node._variations[0]
+
+            while True:
+                if node.starting_comment:
+                    write_comment(node.starting_comment)
+
+                if board.turn == chess.WHITE:
+                    write_token(str(board.fullmove_number) + ". ")
+                elif force_movenumber:
+                    write_token(str(board.fullmove_number) + "... ")
+                write_token(board._algebraic_and_push(node.move) + " ")
+                force_movenumber = False
+                ups += 1
+
+                if node._nags and comments:
+                    for nag in sorted(node._nags):
+                        write_token("$" + str(nag) + " ")
+
+                if node.comment:
+                    write_comment(node.comment)
+
+                siblings = node.parent._variations
+                if variations and len(siblings) > 1 and node is siblings[0]:
+                    board.pop()
+                    ups -= 1
+                    if ups:
+                        stack.append((_UP, ups))
+                    stack.append((_CONTINUE_MAINLINE, node))
+                    for variation in reversed(siblings[1:]):
+                        stack.append((_VISIT_VARIATION, variation))
+                    break
+
+                if not node._variations:
+                    for _ in range(ups):
+                        board.pop()
+                    break
+
+                node = node._variations[0]
+
+        write_token(game.headers.get("Result", "*") + " ")
+        write_line()
+
+        if pending >= buffer_size:
+            handle.write("".join(out))
+            out.clear()
+            pending = 0
+
+    if out:
+        handle.write("".join(out))
+
+
+def _read_comment(handle, token):
+    # Consumes a comment starting with the given token, until the end of the
+    # comment. Returns the comment and the rest of the last line.
+    line = token[1:]
+    comment_lines = []
+    while line and "}" not in line:
+        comment_lines.append(line.rstrip())
+        line = handle.readline()
+    end_index = line.find("}")
+    comment_lines.append(line[:end_index])
+    if "}" in line:
+        line = line[end_index:]
+    else:
+        line = ""
+
+    return "\n".join(comment_lines).strip(), line
+
+
+def _movetext_tokens(handle, line):
+    # Splits the movetext starting with the given line into tokens, reading
+    # more lines from the handle until the empty line that ends the game.
+    while line:
+        read_next_line = True
+
+        # Ignore comments.
+        if line.startswith("%") or line.startswith(";"):
+            line = handle.readline()
+            continue
+
+        # An empty line means the end of a game.
+        if line.isspace():
+            return
+
+        for match in MOVETEXT_REGEX.finditer(line):
+            kind = match.lastindex
+
+            if kind == 1:
+                yield _SAN_TOKEN, match.group(0)
+            elif kind == 2:
+                comment, line = _read_comment(handle, match.group(0))
+                yield _COMMENT_TOKEN, comment
+
+                # Continue with the current or the next line.
+                if line:
+                    read_next_line = False
+                break
+            elif kind == 3:
+                break
+            elif kind == 4:
+                yield _NAG_TOKEN, int(match.group(0)[1:])
+            elif kind == 5:
+                yield _OPEN_TOKEN, "("
+            elif kind == 6:
+                yield _CLOSE_TOKEN, ")"
+            elif kind == 7:
+                yield _RESULT_TOKEN, match.group(0)
+            else:
+                yield _NAG_TOKEN, _ANNOTATION_NAGS[match.group(0).encode("ascii")]
+
+        if read_next_line:
+            line = handle.readline()
+
+
+def _movetext_tokens_bytes(data, pos, encoding, end):
+    # Like _movetext_tokens(), but tokenizes a bytes-like buffer in a single
+    # pass. Stores the position after the game in end[0].
+    for match in MOVETEXT_BYTES_REGEX.finditer(data, pos):
+        kind = match.lastindex
+
+        if kind == 5:
+            yield _SAN_TOKEN, match.group(0).decode("ascii")
+        elif kind == 1:
+            # An empty line means the end of a game.
+            end[0] = match.end()
+            return
+        elif kind == 3:
+            comment_lines = match.group(3).decode(encoding).split("\n")
+            comment_lines[:-1] = [line.rstrip() for line in comment_lines[:-1]]
+            yield _COMMENT_TOKEN, "\n".join(comment_lines).strip()
+        elif kind == 6:
+            yield _NAG_TOKEN, int(match.group(6)[1:])
+        elif kind == 7:
+            yield _OPEN_TOKEN, "("
+        elif kind == 8:
+            yield _CLOSE_TOKEN, ")"
+        elif kind == 9:
+            yield _RESULT_TOKEN, match.group(9).decode("ascii")
+        elif kind == 10:
+            yield _NAG_TOKEN, _ANNOTATION_NAGS[match.group(10)]
+
+    end[0] = len(data)
+
+
+def _visit_movetext(visitor, headers, tokens):
+    # Visits the movetext tokens of a game whose headers have been visited,
+    # up to and including end_game().
+    visit_san = getattr(visitor, "visit_san", None)
+    if visit_san:
+        _visit_san_tokens(visitor, visit_san, tokens)
+        visitor.end_game()
+        return
+
+    # Chess variant.
+    try:
+        VariantBoard = headers.variant()
+    except ValueError as error:
+        visitor.handle_error(error)
+        VariantBoard = chess.Board
+
+    # Initial position.
+    fen = headers.get("FEN", VariantBoard.starting_fen)
+    try:
+        board_stack = [VariantBoard(fen, chess960=headers.is_chess960())]
+    except ValueError as error:
+        visitor.handle_error(error)
+        board_stack = [VariantBoard(chess960=headers.is_chess960())]
+    visitor.visit_board(board_stack[0])
+
+    skip_variation_depth = 0
+    for kind, token in tokens:
+        if kind == _SAN_TOKEN:
+            if skip_variation_depth:
+                continue
+        elif kind == _COMMENT_TOKEN:
+            if not skip_variation_depth:
+                visitor.visit_comment(token)
+            continue
+        elif kind == _OPEN_TOKEN and board_stack[-1].move_stack:
+            if skip_variation_depth:
+                skip_variation_depth += 1
+            elif visitor.begin_variation() is SKIP:
+                skip_variation_depth = 1
+            else:
+                board = board_stack[-1].copy()
+                board.pop()
+                board_stack.append(board)
+            continue
+        elif kind == _CLOSE_TOKEN and skip_variation_depth:
+            skip_variation_depth -= 1
+            if not skip_variation_depth:
+                visitor.end_variation()
+            continue
+        elif kind == _CLOSE_TOKEN and len(board_stack) > 1:
+            # Always leave at least the root node on the stack.
+            visitor.end_variation()
+            board_stack.pop()
+            continue
+        elif skip_variation_depth:
+            continue
+        elif kind == _NAG_TOKEN:
+            visitor.visit_nag(token)
+            continue
+        elif kind == _RESULT_TOKEN and len(board_stack) == 1:
+            visitor.visit_result(token)
+            continue
+
+        # Parse SAN tokens.
+        try:
+            move = visitor.parse_san(board_stack[-1], token)
+        except ValueError as error:
+            visitor.handle_error(error)
+        else:
+            visitor.visit_move(board_stack[-1], move)
+            board_stack[-1].push(move)
+        visitor.visit_board(board_stack[-1])
+
+    visitor.end_game()
+
+
+def _visit_san_tokens(visitor, visit_san, tokens):
+    # Like _visit_movetext(), but passes SAN tokens to the visitor without
+    # building any boards. Counts the plies of each open variation instead
+    # of keeping a board stack.
+    plies = [0]
+    skip_variation_depth = 0
+    for kind, token in tokens:
+        if kind == _COMMENT_TOKEN:
+            if not skip_variation_depth:
+                visitor.visit_comment(token)
+        elif kind == _OPEN_TOKEN and plies[-1]:
+            if skip_variation_depth:
+                skip_variation_depth += 1
+            elif visitor.begin_variation() is SKIP:
+                skip_variation_depth = 1
+            else:
+                plies.append(plies[-1] - 1)
+        elif kind == _CLOSE_TOKEN and skip_variation_depth:
+            skip_variation_depth -= 1
+            if not skip_variation_depth:
+                visitor.end_variation()
+        elif kind == _CLOSE_TOKEN and len(plies) > 1:
+            visitor.end_variation()
+            plies.pop()
+        elif skip_variation_depth:
+            continue
+        elif kind == _NAG_TOKEN:
+            visitor.visit_nag(token)
+        elif kind == _RESULT_TOKEN and len(plies) == 1:
+            visitor.visit_result(token)
+        elif kind == _SAN_TOKEN:
+            visit_san(token)
+            plies[-1] += 1
+
+
 def read_game(handle, *, Visitor=GameCreator):
     """
     Reads a game from a file opened in text mode.
@@ -1067,10 +1853,26 @@ def read_game(handle, *, Visitor=GameCreator):
     :data:`Game.errors <chess.pgn.Game.errors>`. This behavior can be
     :func:`overriden <chess.pgn.GameCreator.handle_error>`.
 
+    Visitors that only need the moves as SAN tokens can implement
+    ``visit_san(san)``. It is called with each token as it appears in the
+    movetext (without check and mate suffixes), instead of
+    :func:`~chess.pgn.BaseVisitor.parse_san()`,
+    :func:`~chess.pgn.BaseVisitor.visit_move()` and
+    :func:`~chess.pgn.BaseVisitor.visit_board()`. No boards are built at
+    all, so the moves are not validated.
+
     Returns the parsed game or ``None`` if the end of file is reached.
     """
     visitor = Visitor()
+    if not _visit_game(handle, visitor):
+        return None
+    return visitor.result()
 
+
+def _visit_game(handle, visitor):
+    # Visits the next game like read_game(). Returns False if the end of the
+    # file is reached, which can not be told apart from a visitor result of
+    # None otherwise.
     found_game = False
     skipping_game = False
     headers = None
@@ -1113,10 +1915,13 @@ def read_game(handle, *, Visitor=GameCreator):
         line = handle.readline()
 
     if not found_game:
-        return None
+        return False
 
+    visit_raw_movetext = None
     if not skipping_game:
         skipping_game = visitor.end_headers() is SKIP
+        if skipping_game:
+            visit_raw_movetext = getattr(visitor, "visit_raw_movetext", None)
 
     # Ignore single empty line after headers.
     if line.isspace():
@@ -1125,144 +1930,107 @@ def read_game(handle, *, Visitor=GameCreator):
     # Fast path: Skip entire game.
     if skipping_game:
         in_comment = False
+        movetext = [] if visit_raw_movetext else None
 
         while line:
             if not in_comment:
                 if line.isspace():
                     break
                 elif line.startswith("%"):
+                    if movetext is not None:
+                        movetext.append(line)
                     line = handle.readline()
                     continue
 
-            for match in SKIP_MOVETEXT_REGEX.finditer(line):
-                token = match.group(0)
-                if token == "{":
-                    in_comment = True
-                elif not in_comment and token == ";":
-                    break
-                elif token == "}":
-                    in_comment = False
-
+            # Only lines that open or close brace comments need to be
+            # tokenized.
+            if ("}" if in_comment else "{") in line:
+                for match in SKIP_MOVETEXT_REGEX.finditer(line):
+                    token = match.group(0)
+                    if token == "{":
+                        in_comment = True
+                    elif not in_comment and token == ";":
+                        break
+                    elif token == "}":
+                        in_comment = False
+
+            if movetext is not None:
+                movetext.append(line)
             line = handle.readline()
 
+        if visit_raw_movetext:
+            visit_raw_movetext("".join(movetext))
+
         visitor.end_game()
-        return visitor.result()
+        return True
 
-    # Chess variant.
     headers = managed_headers if headers is None else headers
-    try:
-        VariantBoard = headers.variant()
-    except ValueError as error:
-        visitor.handle_error(error)
-        VariantBoard = chess.Board
+    _visit_movetext(visitor, headers, _movetext_tokens(handle, line))
+    return True
 
-    # Initial position.
-    fen = headers.get("FEN", VariantBoard.starting_fen)
-    try:
-        board_stack = [VariantBoard(fen, chess960=headers.is_chess960())]
-    except ValueError as error:
-        visitor.handle_error(error)
-        board_stack = [VariantBoard(chess960=headers.is_chess960())]
-    visitor.visit_board(board_stack[0])
 
-    # Parse movetext.
-    skip_variation_depth = 0
-    while line:
-        read_next_line = True
+class _HeaderFilter:
+    # Wraps a visitor and skips the movetext of games whose headers do not
+    # match the predicate.
 
-        # Ignore comments.
-        if line.startswith("%") or line.startswith(";"):
-            line = handle.readline()
-            continue
+    def __init__(self, visitor, where):
+        self.visitor = visitor
+        self.where = where
+        self.headers = Headers()
+        self.matched = True
 
-        # An empty line means the end of a game.
-        if line.isspace():
-            visitor.end_game()
-            return visitor.result()
+    def __getattr__(self, name):
+        # The raw movetext of games that do not match is not needed.
+        if name == "visit_raw_movetext" and not self.matched:
+            raise AttributeError(name)
+        return getattr(self.visitor, name)
 
-        for match in MOVETEXT_REGEX.finditer(line):
-            token = match.group(0)
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+        self.visitor.visit_header(tagname, tagvalue)
 
-            if token.startswith("{"):
-                # Consume until the end of the comment.
-                line = token[1:]
-                comment_lines = []
-                while line and "}" not in line:
-                    comment_lines.append(line.rstrip())
-                    line = handle.readline()
-                end_index = line.find("}")
-                comment_lines.append(line[:end_index])
-                if "}" in line:
-                    line = line[end_index:]
-                else:
-                    line = ""
+    def end_headers(self):
+        if not self.where(self.headers):
+            self.matched = False
+            return SKIP
+        return self.visitor.end_headers()
 
-                if not skip_variation_depth:
-                    visitor.visit_comment("\n".join(comment_lines).strip())
+    def end_game(self):
+        if self.matched:
+            self.visitor.end_game()
 
-                # Continue with the current or the next line.
-                if line:
-                    read_next_line = False
-                break
-            elif token == "(" and board_stack[-1].move_stack:
-                if skip_variation_depth:
-                    skip_variation_depth += 1
-                elif visitor.begin_variation() is SKIP:
-                    skip_variation_depth = 1
-                else:
-                    board = board_stack[-1].copy()
-                    board.pop()
-                    board_stack.append(board)
-            elif token == ")" and skip_variation_depth:
-                skip_variation_depth -= 1
-                if not skip_variation_depth:
-                    visitor.end_variation()
-            elif token == ")" and len(board_stack) > 1:
-                # Always leave at least the root node on the stack.
-                visitor.end_variation()
-                board_stack.pop()
-            elif skip_variation_depth:
-                continue
-            elif token.startswith(";"):
-                break
-            elif token.startswith("$"):
-                # Found a NAG.
-                try:
-                    nag = int(token[1:])
-                except ValueError as error:
-                    visitor.handle_error(error)
-                else:
-                    visitor.visit_nag(nag)
-            elif token == "?":
-                visitor.visit_nag(NAG_MISTAKE)
-            elif token == "??":
-                visitor.visit_nag(NAG_BLUNDER)
-            elif token == "!":
-                visitor.visit_nag(NAG_GOOD_MOVE)
-            elif token == "!!":
-                visitor.visit_nag(NAG_BRILLIANT_MOVE)
-            elif token == "!?":
-                visitor.visit_nag(NAG_SPECULATIVE_MOVE)
-            elif token == "?!":
-                visitor.visit_nag(NAG_DUBIOUS_MOVE)
-            elif token in ["1-0", "0-1", "1/2-1/2", "*"] and len(board_stack) == 1:
-                visitor.visit_result(token)
-            else:
-                # Parse SAN tokens.
-                try:
-                    move = visitor.parse_san(board_stack[-1], token)
-                except ValueError as error:
-                    visitor.handle_error(error)
-                else:
-                    visitor.visit_move(board_stack[-1], move)
-                    board_stack[-1].push(move)
-                visitor.visit_board(board_stack[-1])
+    def result(self):
+        return self.visitor.result() if self.matched else None
 
-        if read_next_line:
-            line = handle.readline()
 
-    visitor.end_game()
-    return visitor.result()
+def read_games(handle, *, Visitor=GameCreator, where=None):
+    """
+    Reads all remaining games from a PGN file opened in text mode with
+    :func:`~chess.pgn.read_game()`, yielding the results of the given
+    *Visitor*.
+
+    *where* is an optional predicate that is called with the
+    :class:`~chess.pgn.Headers` of each game, right after they are parsed.
+    Like the headers of :class:`~chess.pgn.Game` objects, they default to
+    the standard tag roster.
+    The movetext of games that do not match is skipped without parsing any
+    moves, and the games are not yielded.
+
+    >>> import chess.pgn
+    >>>
+    >>> pgn = open("data/pgn/kasparov-deep-blue-1997.pgn")
+    >>> for game in chess.pgn.read_games(pgn, where=lambda headers: headers["Result"] == "1-0"):
+    ...     print(game.headers["Site"], game.headers["White"])
+    01 Garry Kasparov
+    02 Deep Blue (Computer)
+    06 Deep Blue (Computer)
+    """
+    while True:
+        visitor = Visitor() if where is None else _HeaderFilter(Visitor(), where)
+        if not _visit_game(handle, visitor):
+            break
+        elif where is None or visitor.matched:
+            yield visitor.result()
 
 
 def read_headers(handle):
@@ -1313,5 +2081,1881 @@ def skip_game(handle):
     return read_game(handle, Visitor=SkipVisitor)
 
 
+def _next_line(data, pos):
+    end = data.find(b"\n", pos)
+    end = len(data) if end == -1 else end + 1
+    return data[pos:end], end
+
+
+def _skip_movetext_bytes(data, pos):
+    # Finds the empty line that ends the movetext starting at pos. Returns
+    # the end of the movetext and the position after the empty line.
+    match = _EMPTY_REST_BYTES_REGEX.match(data, pos)
+    if match:
+        return pos, match.end()
+
+    while True:
+        # Jump to the next empty line. It ends the movetext if it is not in
+        # a brace comment, i.e. if the last brace before it is a closing
+        # one. Rest of line comments and escaped lines may contain braces
+        # that do not count, so tokenize in that case. Only a % at the start
+        # of a line escapes it, not commands like [%clk ...] in comments.
+        match = _EMPTY_LINE_BYTES_REGEX.search(data, pos)
+        end, next_end = (match.start() + 1, match.end()) if match else (len(data), len(data))
+
+        if data.find(b";", pos, end) != -1 or data.find(b"\n%", pos, end) != -1 or data[pos:pos + 1] == b"%":
+            break
+
+        if data.rfind(b"{", pos, end) <= data.rfind(b"}", pos, end):
+            return end, next_end
+
+        pos = data.find(b"}", end)
+        if pos == -1:
+            return len(data), len(data)
+
+    for match in SKIP_MOVETEXT_BYTES_REGEX.finditer(data, pos):
+        if match.lastindex == 1:
+            return match.start(), match.end()
+
+    return len(data), len(data)
+
+
+def _read_game_bytes(data, pos, Visitor, encoding):
+    # Like read_game(), but works on a bytes-like buffer. Returns the visitor
+    # result and the position after the game, or None at the end of the
+    # buffer.
+    visitor = Visitor()
+
+    found_game = False
+    skipping_game = False
+    headers = None
+    managed_headers = None
+
+    # Ignore leading empty lines and comments.
+    if data[pos:pos + 3] == b"\xef\xbb\xbf":
+        pos += 3
+    line, next_pos = _next_line(data, pos)
+    while line.isspace() or line.startswith(b"%") or line.startswith(b";"):
+        pos = next_pos
+        line, next_pos = _next_line(data, pos)
+
+    # Parse game headers.
+    while line:
+        # Ignore comments.
+        if line.startswith(b"%") or line.startswith(b";"):
+            pos = next_pos
+            line, next_pos = _next_line(data, pos)
+            continue
+
+        # First token of the game.
+        if not found_game:
+            found_game = True
+            skipping_game = visitor.begin_game() is SKIP
+            if not skipping_game:
+                managed_headers = visitor.begin_headers()
+                if not isinstance(managed_headers, Headers):
+                    managed_headers = None
+                    headers = Headers({})
+
+        if not line.startswith(b"["):
+            break
+
+        if not skipping_game:
+            tag_match = TAG_BYTES_REGEX.match(line)
+            if tag_match:
+                name = tag_match.group(1).decode(encoding)
+                value = tag_match.group(2).decode(encoding)
+                visitor.visit_header(name, value)
+                if headers is not None:
+                    headers[name] = value
+            else:
+                break
+
+        pos = next_pos
+        line, next_pos = _next_line(data, pos)
+
+    if not found_game:
+        return None
+
+    visit_raw_movetext = None
+    if not skipping_game:
+        skipping_game = visitor.end_headers() is SKIP
+        if skipping_game:
+            visit_raw_movetext = getattr(visitor, "visit_raw_movetext", None)
+
+    # Ignore single empty line after headers.
+    if line.isspace():
+        pos = next_pos
+
+    # Fast path: Skip entire game.
+    if skipping_game:
+        end, next_end = _skip_movetext_bytes(data, pos)
+
+        if visit_raw_movetext:
+            visit_raw_movetext(data[pos:end].decode(encoding))
+
+        visitor.end_game()
+        return visitor.result(), next_end
+
+    headers = managed_headers if headers is None else headers
+    end = [len(data)]
+    _visit_movetext(visitor, headers, _movetext_tokens_bytes(data, pos, encoding, end))
+    return visitor.result(), end[0]
+
+
+def _scan_game_bytes(data, pos, encoding):
+    # Like _read_game_bytes() with the HeaderCreator, but matches entire
+    # tag lines in the buffer instead of splitting it into lines. Returns
+    # the headers (or None), the end of the movetext and the position after
+    # the empty line that ends the game.
+    if data[pos:pos + 3] == b"\xef\xbb\xbf":
+        pos += 3
+    pos = _LEADING_BYTES_REGEX.match(data, pos).end()
+    if pos >= len(data):
+        return None, pos, pos
+
+    headers = Headers({})
+    while True:
+        match = _TAG_LINE_BYTES_REGEX.match(data, pos)
+        if match:
+            headers[match.group(1).decode(encoding)] = match.group(2).decode(encoding)
+            pos = match.end()
+        elif data.startswith(b"%", pos) or data.startswith(b";", pos):
+            end = data.find(b"\n", pos)
+            pos = len(data) if end == -1 else end + 1
+        else:
+            break
+
+    # Ignore single empty line after headers.
+    match = _EMPTY_REST_BYTES_REGEX.match(data, pos)
+    if match:
+        pos = match.end()
+
+    end, next_end = _skip_movetext_bytes(data, pos)
+    return headers, end, next_end
+
+
+def read_games_mmap(path, *, Visitor=GameCreator, encoding="utf-8"):
+    """
+    Reads all games from the PGN file at *path*, yielding the results of the
+    given *Visitor*.
+
+    Unlike :func:`~chess.pgn.read_game()`, the file is memory-mapped and
+    the movetext of each game is tokenized in a single pass over the raw
+    bytes. Only the tokens are decoded (with the given *encoding*), and
+    skipped games are never decoded at all. Visitors that implement
+    ``visit_san()`` get the SAN tokens without building any boards, just
+    like with :func:`~chess.pgn.read_game()`. A leading UTF-8 byte order
+    mark is ignored.
+
+    >>> import chess.pgn
+    >>>
+    >>> for game in chess.pgn.read_games_mmap("data/pgn/kasparov-deep-blue-1997.pgn"):
+    ...     print(game.headers["Site"], game.end().board().fullmove_number)
+    01 45
+    02 45
+    03 48
+    04 56
+    05 50
+    06 19
+    """
+    with builtins.open(path, "rb") as handle:
+        if not os.fstat(handle.fileno()).st_size:
+            return
+
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            while True:
+                game = _read_game_bytes(data, pos, Visitor, encoding)
+                if game is None:
+                    break
+                result, pos = game
+                yield result
+
+
+def scan_headers(handle, *, block_size=1 << 20, encoding="utf-8"):
+    """
+    Scans a PGN file opened in binary mode for game headers. Yields tuples
+    of the byte offset of each game (relative to the initial position of
+    the handle) and its :class:`~chess.pgn.Headers`.
+
+    Unlike :func:`~chess.pgn.read_headers()`, the file is read in blocks of
+    *block_size* bytes, and the movetext is not tokenized. Instead the scan
+    jumps from empty line to empty line, keeping track of brace comments.
+    Only movetext with ``;`` comments or ``%`` escaped lines, which may hide
+    braces, is tokenized.
+
+    >>> import chess.pgn
+    >>>
+    >>> with open("data/pgn/kasparov-deep-blue-1997.pgn", "rb") as pgn:
+    ...     for offset, headers in chess.pgn.scan_headers(pgn):
+    ...         print(offset, headers["Site"], headers["Result"])
+    0 01 1-0
+    717 02 1-0
+    1436 03 1/2-1/2
+    2194 04 1/2-1/2
+    3067 05 1/2-1/2
+    3855 06 1-0
+    """
+    data = b""
+    base = 0
+    pos = 0
+    eof = False
+
+    while True:
+        headers, _, end = _scan_game_bytes(data, pos, encoding)
+
+        # A game that reaches the end of the buffer may continue in the next
+        # block, so read on and scan it again.
+        if end >= len(data) and not eof:
+            block = handle.read(block_size)
+            eof = not block
+            base += pos
+            data = data[pos:] + block
+            pos = 0
+            continue
+
+        if headers is None:
+            break
+
+        yield base + pos, headers
+        pos = end
+
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZ2_MAGIC = b"BZh"
+_XZ_MAGIC = b"\xfd7zXZ\x00"
+
+_BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+_BGZF_EXTRA = b"\x06\x00BC\x02\x00"
+_BGZF_BLOCK_SIZE = 0xff00
+_BGZF_EOF = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+
+class _BgzfWriter(io.RawIOBase):
+    # Writes data in independently compressed gzip members of at most
+    # 64 KiB (BGZF, as used by samtools). Each member records its
+    # compressed size in an extra field.
+
+    def __init__(self, path, mode):
+        self._file = builtins.open(path, mode)
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= _BGZF_BLOCK_SIZE:
+            self._write_block(bytes(self._buffer[:_BGZF_BLOCK_SIZE]))
+            del self._buffer[:_BGZF_BLOCK_SIZE]
+        return len(data)
+
+    def _write_block(self, data):
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        self._file.write(_BGZF_MAGIC + b"\x00\x00\x00\x00\x00\xff" + _BGZF_EXTRA)
+        self._file.write(struct.pack("<H", len(compressed) + 25))
+        self._file.write(compressed)
+        self._file.write(struct.pack("<II", zlib.crc32(data) & 0xffffffff, len(data)))
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._buffer:
+                self._write_block(bytes(self._buffer))
+                self._buffer.clear()
+            self._file.write(_BGZF_EOF)
+            super().close()
+        finally:
+            self._file.close()
+
+
+class _BgzfReader(io.RawIOBase):
+    # Reads BGZF files. Seeking to an uncompressed offset only needs to
+    # decompress the block containing it. Block boundaries are discovered
+    # from the headers and trailers, without decompressing.
+
+    def __init__(self, path):
+        self._file = builtins.open(path, "rb")
+
+        # Compressed and uncompressed offsets of the known blocks. The last
+        # entry is the end of the last known block.
+        self._starts = [0]
+        self._offsets = [0]
+        self._complete = False
+
+        self._index = 0
+        self._pos = 0
+        self._data = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _discover(self):
+        if self._complete:
+            return False
+
+        start = self._starts[-1]
+        self._file.seek(start)
+        header = self._file.read(18)
+        if not header:
+            self._complete = True
+            return False
+        if len(header) < 18 or not header.startswith(_BGZF_MAGIC) or header[10:16] != _BGZF_EXTRA:
+            raise ValueError("invalid bgzf block at offset {}".format(start))
+
+        size = struct.unpack_from("<H", header, 16)[0] + 1
+        self._file.seek(start + size - 4)
+        trailer = self._file.read(4)
+        if len(trailer) < 4:
+            raise ValueError("truncated bgzf block at offset {}".format(start))
+
+        self._starts.append(start + size)
+        self._offsets.append(self._offsets[-1] + struct.unpack("<I", trailer)[0])
+        return True
+
+    def _load(self):
+        while self._index >= len(self._starts) - 1:
+            if not self._discover():
+                return False
+
+        start = self._starts[self._index]
+        self._file.seek(start)
+        block = self._file.read(self._starts[self._index + 1] - start)
+        self._data = zlib.decompress(block[18:-8], -15)
+        return True
+
+    def readinto(self, b):
+        while True:
+            if self._data is None and not self._load():
+                return 0
+            if self._pos < len(self._data):
+                break
+            self._index += 1
+            self._pos = 0
+            self._data = None
+
+        n = min(len(b), len(self._data) - self._pos)
+        b[:n] = self._data[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def tell(self):
+        return self._offsets[self._index] + self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            while self._discover():
+                pass
+            offset += self._offsets[-1]
+        elif whence != io.SEEK_SET:
+            raise ValueError("invalid whence ({}, should be 0, 1 or 2)".format(whence))
+
+        if offset < 0:
+            raise ValueError("negative seek position {}".format(offset))
+
+        while self._offsets[-1] <= offset and self._discover():
+            pass
+
+        index = bisect.bisect_right(self._offsets, offset) - 1
+        if index != self._index:
+            self._index = index
+            self._data = None
+        self._pos = offset - self._offsets[index]
+        return offset
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._file.close()
+
+
+def open(path, mode="r", *, encoding="utf-8", errors=None, newline=None, buffer_size=1 << 20):
+    """
+    Opens a PGN file, handling compression transparently.
+
+    When reading, gzip, bzip2 and xz compressed files are recognized by
+    their magic bytes. When writing, the compression is chosen by the file
+    extension (``.gz``, ``.bz2`` or ``.xz``).
+
+    >>> import chess.pgn
+    >>>
+    >>> with chess.pgn.open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+    ...     game = chess.pgn.read_game(pgn)
+
+    Returns a text stream, or a binary stream if *mode* contains ``b``.
+    Data is read and written in chunks of *buffer_size* bytes, which
+    greatly reduces the overhead of decompression.
+
+    Gzip files are written in the BGZF format: a series of gzip members
+    with at most 64 KiB of data each, that are readable by any gzip tool.
+    BGZF files opened with this function are seekable without decompressing
+    everything up to the target position, so they can be indexed with
+    :func:`~chess.pgn.open_index()` and games can be read in random order.
+    """
+    kind = mode.replace("t", "").replace("b", "")
+    if kind not in ["r", "w", "a"] or "t" in mode and "b" in mode:
+        raise ValueError("invalid mode: {!r}".format(mode))
+
+    stream = None
+    if kind == "r":
+        with builtins.open(path, "rb") as handle:
+            magic = handle.read(16)
+
+        if magic.startswith(_BGZF_MAGIC) and magic[10:16] == _BGZF_EXTRA:
+            stream = _BgzfReader(path)
+        elif magic.startswith(_GZIP_MAGIC):
+            stream = gzip.GzipFile(path, "rb")
+        elif magic.startswith(_BZ2_MAGIC):
+            import bz2
+            stream = bz2.BZ2File(path, "rb")
+        elif magic.startswith(_XZ_MAGIC):
+            import lzma
+            stream = lzma.LZMAFile(path, "rb")
+    else:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".gz":
+            stream = _BgzfWriter(path, kind + "b")
+        elif extension == ".bz2":
+            import bz2
+            stream = bz2.BZ2File(path, kind + "b")
+        elif extension == ".xz":
+            import lzma
+            stream = lzma.LZMAFile(path, kind + "b")
+
+    if stream is None:
+        if "b" in mode:
+            return builtins.open(path, kind + "b", buffering=buffer_size)
+        return builtins.open(path, kind, buffering=buffer_size, encoding=encoding, errors=errors, newline=newline)
+
+    if kind == "r":
+        stream = io.BufferedReader(stream, buffer_size)
+    else:
+        stream = io.BufferedWriter(stream, buffer_size)
+
+    if "b" in mode:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline=newline)
+
+
+class IndexEntry(collections.namedtuple("IndexEntry", "offset headers")):
+    """
+    The *offset* of a game in a PGN file and a dictionary with the indexed
+    *headers* that are present.
+
+    The offset is the opaque position returned by
+    :func:`~io.TextIOBase.tell()` on the text handle, not necessarily a
+    byte offset. It is only valid for :func:`~io.TextIOBase.seek()` on a
+    text handle for the same file, opened with the same encoding.
+    """
+
+    __slots__ = ()
+
+
+class GameIndex(collections.abc.Sequence):
+    """
+    A sequence of :class:`~chess.pgn.IndexEntry` objects for all games in a
+    PGN file, allowing random access to games.
+
+    *size* and *mtime_ns* describe the indexed file, so that stale indexes
+    can be detected.
+    """
+
+    VERSION = 1
+
+    def __init__(self, entries, *, tags=TAG_ROSTER, size=None, mtime_ns=None):
+        self.entries = entries
+        self.tags = None if tags is None else list(tags)
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def read_game(self, handle, index, *, Visitor=GameCreator):
+        """
+        Seeks to the game with the given *index* in *handle* and reads it
+        with :func:`~chess.pgn.read_game()`.
+        """
+        handle.seek(self.entries[index].offset)
+        return read_game(handle, Visitor=Visitor)
+
+    def matches(self, path):
+        """
+        Checks if the index matches the size and modification time of the
+        file at *path*.
+        """
+        stat = os.stat(path)
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def save(self, path):
+        """Saves the index as JSON."""
+        with builtins.open(path, "w") as sidecar:
+            json.dump({
+                "version": self.VERSION,
+                "size": self.size,
+                "mtime_ns": self.mtime_ns,
+                "tags": self.tags,
+                "games": [[entry.offset, entry.headers] for entry in self.entries],
+            }, sidecar, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved with :func:`~chess.pgn.GameIndex.save()`.
+
+        :raises: :exc:`ValueError` if the file is not a valid index.
+        """
+        with builtins.open(path) as sidecar:
+            data = json.load(sidecar)
+
+        try:
+            if data["version"] != cls.VERSION:
+                raise ValueError("unsupported index version: {!r}".format(data["version"]))
+            entries = [IndexEntry(offset, headers) for offset, headers in data["games"]]
+            return cls(entries, tags=data["tags"], size=data["size"], mtime_ns=data["mtime_ns"])
+        except (KeyError, TypeError) as error:
+            raise ValueError("invalid index: {}".format(error))
+
+    def __repr__(self):
+        return "<GameIndex at {:#x} ({} games)>".format(id(self), len(self))
+
+
+def index_games(handle, *, tags=TAG_ROSTER):
+    """
+    Scans a PGN file opened in text mode with
+    :func:`~chess.pgn.read_headers()` and records the offset and the given
+    *tags* (or all headers if ``None``) of every game.
+
+    The offsets are positions as returned by
+    :func:`~io.TextIOBase.tell()`. Seek to them only in text handles for
+    the same file, opened with the same encoding (see
+    :class:`~chess.pgn.IndexEntry`).
+
+    Returns a :class:`~chess.pgn.GameIndex`.
+
+    >>> import chess.pgn
+    >>>
+    >>> pgn = open("data/pgn/kasparov-deep-blue-1997.pgn")
+    >>> index = chess.pgn.index_games(pgn)
+    >>> len(index)
+    6
+    >>> index[4].offset
+    3067
+    >>> index[4].headers["Site"]
+    '05'
+    >>>
+    >>> game = index.read_game(pgn, 4)
+    >>> game.headers["White"]
+    'Garry Kasparov'
+    """
+    entries = []
+
+    while True:
+        offset = handle.tell()
+        headers = read_headers(handle)
+        if headers is None:
+            break
+
+        if tags is None:
+            entries.append(IndexEntry(offset, dict(headers)))
+        else:
+            entries.append(IndexEntry(offset, {tag: headers[tag] for tag in tags if tag in headers}))
+
+    return GameIndex(entries, tags=tags)
+
+
+def open_index(path, *, tags=TAG_ROSTER, encoding="utf-8", sidecar=None):
+    """
+    Gets a :class:`~chess.pgn.GameIndex` for the PGN file at *path*.
+
+    The index is persisted to a *sidecar* file (defaults to *path* with
+    ``.idx`` appended). It is reused as long as the size and modification
+    time of the PGN file and the indexed *tags* match, and rebuilt
+    otherwise.
+
+    The file is indexed through :func:`~chess.pgn.open()` with the given
+    *encoding*. Read the indexed games from a handle opened the same way.
+    """
+    if sidecar is None:
+        sidecar = path + ".idx"
+
+    try:
+        index = GameIndex.load(sidecar)
+    except (OSError, ValueError):
+        pass
+    else:
+        if index.tags == (None if tags is None else list(tags)) and index.matches(path):
+            return index
+
+    stat = os.stat(path)
+    with open(path, encoding=encoding) as handle:
+        index = index_games(handle, tags=tags)
+    index.size = stat.st_size
+    index.mtime_ns = stat.st_mtime_ns
+
+    try:
+        index.save(sidecar)
+    except OSError as error:
+        LOGGER.warning("could not save pgn index to %s: %s", sidecar, error)
+
+    return index
+
+
+POSITION_ENTRY_STRUCT = struct.Struct(">QQI")
+
+
+class PositionEntry(collections.namedtuple("PositionEntry", "key offset ply")):
+    """
+    The Zobrist hash *key* of a position that occured in the game at
+    *offset* after *ply* half-moves.
+    """
+
+    __slots__ = ()
+
+
+_ZOBRIST_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+class _IncrementalZobristHasher:
+    # Computes the Polyglot Zobrist hashes of successive positions. The
+    # hash of the piece placement is updated incrementally, by comparing the
+    # bitboards with the previous position.
+
+    def __init__(self):
+        self.masks = None
+        self.piece_hash = 0
+
+    def __call__(self, board):
+        masks = [
+            board.pawns & board.occupied_co[chess.BLACK], board.pawns & board.occupied_co[chess.WHITE],
+            board.knights & board.occupied_co[chess.BLACK], board.knights & board.occupied_co[chess.WHITE],
+            board.bishops & board.occupied_co[chess.BLACK], board.bishops & board.occupied_co[chess.WHITE],
+            board.rooks & board.occupied_co[chess.BLACK], board.rooks & board.occupied_co[chess.WHITE],
+            board.queens & board.occupied_co[chess.BLACK], board.queens & board.occupied_co[chess.WHITE],
+            board.kings & board.occupied_co[chess.BLACK], board.kings & board.occupied_co[chess.WHITE],
+        ]
+        if self.masks is None:
+            self.piece_hash = _ZOBRIST_HASHER.hash_board(board)
+        else:
+            array = _ZOBRIST_HASHER.array
+            for piece_index, (mask, previous) in enumerate(zip(masks, self.masks)):
+                if mask != previous:
+                    for square in chess.scan_reversed(mask ^ previous):
+                        self.piece_hash ^= array[64 * piece_index + square]
+        self.masks = masks
+
+        return (self.piece_hash ^ _ZOBRIST_HASHER.hash_castling(board) ^
+                _ZOBRIST_HASHER.hash_ep_square(board) ^ _ZOBRIST_HASHER.hash_turn(board))
+
+
+class _PositionCollector(BaseVisitor):
+    def __init__(self, offset, entries):
+        self.offset = offset
+        self.entries = entries
+        self.ply = None
+        self.hasher = _IncrementalZobristHasher()
+
+    def begin_variation(self):
+        return SKIP
+
+    def visit_board(self, board):
+        # Called again for the same position after errors.
+        ply = len(board.move_stack)
+        if ply == self.ply:
+            return
+        self.ply = ply
+
+        self.entries.append((self.hasher(board), self.offset, ply))
+
+    def handle_error(self, error):
+        LOGGER.exception("error during pgn parsing")
+
+
+def index_positions(handle, path, *, max_buffered=1 << 20, tmpdir=None):
+    """
+    Reads all games from a PGN file opened in text mode and writes a
+    position index to *path*, recording every position of the mainlines.
+    Returns the number of indexed positions.
+
+    The index is an array of entries (see
+    :data:`~chess.pgn.POSITION_ENTRY_STRUCT`) with the Polyglot
+    Zobrist hash of a position, the offset of the game (as returned by
+    :func:`~io.TextIOBase.tell()`) and the ply, sorted by hash. Use
+    :func:`~chess.pgn.open_position_index()` to search it.
+
+    Like with :class:`~chess.polyglot.BookBuilder`, at most about
+    *max_buffered* entries are kept in memory. Beyond that, they are sorted
+    and spilled into temporary files in *tmpdir*, which are merged into
+    the index.
+    """
+    entries = []
+    count = 0
+
+    with chess.polyglot._SortedRuns(POSITION_ENTRY_STRUCT, tmpdir=tmpdir) as runs:
+        while True:
+            offset = handle.tell()
+            if read_game(handle, Visitor=lambda: _PositionCollector(offset, entries)) is None:
+                break
+
+            if len(entries) >= max_buffered:
+                entries.sort()
+                runs.spill(entries)
+                entries.clear()
+
+        entries.sort()
+
+        with builtins.open(path, "wb") as index:
+            for entry in runs.merge(entries):
+                index.write(POSITION_ENTRY_STRUCT.pack(*entry))
+                count += 1
+
+    return count
+
+
+class PositionIndex(chess.polyglot._MemoryMappedEntries):
+    """
+    Maps a position index created with
+    :func:`~chess.pgn.index_positions()` to memory.
+    """
+
+    _struct = POSITION_ENTRY_STRUCT
+    _entry = PositionEntry
+
+    def find_all(self, board):
+        """
+        Yields all entries for the given position or Zobrist hash, ordered
+        by game offset and ply.
+
+        Distinct positions with the same hash are not told apart.
+        """
+        try:
+            key = int(board)
+        except (TypeError, ValueError):
+            key = chess.polyglot.zobrist_hash(board)
+
+        return self._find_key(key)
+
+    def offsets(self, board):
+        """
+        Gets the sorted offsets of all games that reached the given position
+        (or Zobrist hash) in their mainline.
+
+        >>> import chess
+        >>> import chess.pgn
+        >>> import os.path
+        >>> import tempfile
+        >>>
+        >>> tmpdir = tempfile.TemporaryDirectory()
+        >>> path = os.path.join(tmpdir.name, "kasparov.pos")
+        >>>
+        >>> chess.pgn.index_positions(open("data/pgn/kasparov-deep-blue-1997.pgn"), path)
+        525
+        >>>
+        >>> board = chess.Board()
+        >>> board.push_san("e4")
+        Move.from_uci('e2e4')
+        >>>
+        >>> pgn = open("data/pgn/kasparov-deep-blue-1997.pgn")
+        >>> with chess.pgn.open_position_index(path) as index:
+        ...     for offset in index.offsets(board):
+        ...         _ = pgn.seek(offset)
+        ...         print(chess.pgn.read_game(pgn).headers["Site"])
+        02
+        04
+        06
+        >>>
+        >>> tmpdir.cleanup()
+        """
+        offsets = []
+        for entry in self.find_all(board):
+            if not offsets or offsets[-1] != entry.offset:
+                offsets.append(entry.offset)
+        return offsets
+
+
+def open_position_index(path):
+    """
+    Opens a position index created with
+    :func:`~chess.pgn.index_positions()`.
+    """
+    return PositionIndex(path)
+
+
+def _split_games(path, chunk_size):
+    # Yields (start, end) byte ranges of the file that contain complete
+    # games. Chunks are split before a tag line that follows an empty line.
+    with builtins.open(path, "rb") as handle:
+        size = handle.seek(0, io.SEEK_END)
+        start = 0
+
+        while start < size:
+            handle.seek(start + chunk_size)
+            handle.readline()  # Skip a partial line.
+
+            end = size
+            previous_was_empty = False
+            while True:
+                offset = handle.tell()
+                line = handle.readline()
+                if not line:
+                    break
+                elif previous_was_empty and line.startswith(b"["):
+                    end = offset
+                    break
+                previous_was_empty = line.isspace()
+
+            yield start, end
+            start = end
+
+
+def _read_chunk(path, start, end, Visitor, encoding, function=None):
+    with builtins.open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+
+    pgn = io.StringIO(data.decode(encoding))
+    results = []
+    while True:
+        visitor = Visitor()
+        if not _visit_game(pgn, visitor):
+            break
+        result = visitor.result()
+        results.append(result if function is None else function(result))
+    return results
+
+
+def _process_chunks(path, worker, args, processes, ordered, chunk_size, max_pending):
+    # Calls worker(path, start, end, *args) for chunks of the file in a
+    # process pool. Yields (start, end, result) tuples.
+    chunks = _split_games(path, chunk_size)
+
+    if processes == 1:
+        for start, end in chunks:
+            yield start, end, worker(path, start, end, *args)
+        return
+
+    processes = processes or os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * processes
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        pending = collections.deque()
+
+        def submit():
+            for start, end in chunks:
+                future = executor.submit(worker, path, start, end, *args)
+                pending.append((start, end, future))
+                if len(pending) >= max_pending:
+                    break
+
+        submit()
+        while pending:
+            if ordered:
+                start, end, future = pending.popleft()
+            else:
+                done, _ = concurrent.futures.wait([future for _, _, future in pending], return_when=concurrent.futures.FIRST_COMPLETED)
+                start, end, future = next(item for item in pending if item[2] in done)
+                pending.remove((start, end, future))
+
+            result = future.result()
+            submit()
+            yield start, end, result
+
+
+def read_games_parallel(path, *, Visitor=GameCreator, processes=None, ordered=True,
+                        chunk_size=1 << 20, max_pending=None, encoding="utf-8"):
+    """
+    Reads all games from the PGN file at *path* with a pool of *processes*
+    (defaults to the number of CPUs).
+
+    The file is split into chunks of roughly *chunk_size* bytes at game
+    boundaries (a line starting with ``[`` after an empty line). Each chunk
+    is parsed with :func:`~chess.pgn.read_game()` and the given *Visitor*,
+    which must be picklable, as must be the visitor results.
+
+    Yields the visitor results. With *ordered*, results are in the order of
+    the file, otherwise in the order that chunks are finished. At most
+    *max_pending* chunks (defaults to twice the number of processes) are
+    parsed or waiting to be consumed at any time, which bounds the memory
+    usage. With *processes* set to ``1``, chunks are parsed in the current
+    process.
+
+    >>> import chess.pgn
+    >>>
+    >>> for headers in chess.pgn.read_games_parallel("data/pgn/kasparov-deep-blue-1997.pgn", Visitor=chess.pgn.HeaderCreator):
+    ...     print(headers["Site"], headers["Result"])
+    01 1-0
+    02 1-0
+    03 1/2-1/2
+    04 1/2-1/2
+    05 1/2-1/2
+    06 1-0
+    """
+    for _, _, results in _process_chunks(path, _read_chunk, (Visitor, encoding), processes, ordered, chunk_size, max_pending):
+        yield from results
+
+
+def map_reduce_games(path, function, reducer, initial, *, Visitor=GameCreator, processes=None, ordered=True,
+                     chunk_size=1 << 20, max_pending=None, progress=None, encoding="utf-8"):
+    """
+    Reads all games from the PGN file at *path* like
+    :func:`~chess.pgn.read_games_parallel()`, maps each visitor result with
+    *function* in the worker processes and reduces the mapped values with
+    ``accumulator = reducer(accumulator, value)``, starting with *initial*,
+    in the current process. Returns the final accumulator.
+
+    *function* must be picklable, like a function defined at module level,
+    as must be its return values. Pass ``None`` to reduce the visitor results
+    themselves.
+
+    With *ordered*, values are reduced in the order of the games in the file,
+    so that the result is deterministic even if *reducer* is not commutative.
+    Otherwise chunks are reduced as soon as they are finished.
+
+    If given, *progress* is called with the number of bytes processed so far
+    and the size of the file, after each chunk.
+
+    >>> import collections
+    >>> import operator
+    >>> import chess.pgn
+    >>>
+    >>> def count(counter, result):
+    ...     counter[result] += 1
+    ...     return counter
+    >>>
+    >>> counter = chess.pgn.map_reduce_games("data/pgn/kasparov-deep-blue-1997.pgn", operator.itemgetter("Result"), count, collections.Counter(),
+    ...                                      Visitor=chess.pgn.HeaderCreator)
+    >>> sorted(counter.items())
+    [('1-0', 3), ('1/2-1/2', 3)]
+    """
+    size = os.path.getsize(path)
+    done = 0
+    accumulator = initial
+
+    for start, end, values in _process_chunks(path, _read_chunk, (Visitor, encoding, function), processes, ordered, chunk_size, max_pending):
+        for value in values:
+            accumulator = reducer(accumulator, value)
+
+        done += end - start
+        if progress is not None:
+            progress(done, size)
+
+    return accumulator
+
+
+EXPLORER_ENTRY_STRUCT = struct.Struct(">QHIII")
+
+
+class ExplorerEntry(collections.namedtuple("ExplorerEntry", "key raw_move wins draws losses")):
+    """
+    The number of games in which the side to move played a move in the
+    position with the Zobrist hash *key*, by their result for that side.
+    """
+
+    __slots__ = ()
+
+    def move(self, *, chess960=False):
+        """Gets the move (as a :class:`~chess.Move` object)."""
+        return chess.polyglot.Entry(self.key, self.raw_move, 0, 0).move(chess960=chess960)
+
+    def games(self):
+        """Gets the total number of games."""
+        return self.wins + self.draws + self.losses
+
+
+def _iter_explorer_run(run):
+    keys, raw_moves, counts = run
+    for i, (key, raw_move) in enumerate(zip(keys, raw_moves)):
+        yield key, raw_move, counts[3 * i], counts[3 * i + 1], counts[3 * i + 2]
+
+
+def _merge_explorer_runs(runs):
+    # Merges runs of entries sorted by key and move into a single run,
+    # adding up the counts of the same move in the same position.
+    keys, raw_moves, counts = array.array("Q"), array.array("H"), array.array("I")
+    merged = heapq.merge(*[_iter_explorer_run(run) for run in runs])
+    for (key, raw_move), group in itertools.groupby(merged, key=lambda entry: entry[:2]):
+        wins = draws = losses = 0
+        for entry in group:
+            wins += entry[2]
+            draws += entry[3]
+            losses += entry[4]
+        keys.append(key)
+        raw_moves.append(raw_move)
+        counts.extend((wins, draws, losses))
+    return keys, raw_moves, counts
+
+
+class OpeningStatistics:
+    """
+    Aggregates how often each move was played in a position, and the results
+    of those games from the perspective of the side to move.
+
+    Positions are identified by their Polyglot Zobrist hash. At most
+    *max_buffered* distinct moves are counted in a dictionary. Beyond that,
+    they are sorted into runs of compact :class:`array.array` objects
+    (keys, moves and counts, 22 bytes per move), which are merged with
+    runs of similar size, so that millions of positions fit into memory.
+    Statistics collected separately (for example in different processes,
+    see :func:`~chess.pgn.collect_opening_statistics()`) can be merged with
+    :func:`~chess.pgn.OpeningStatistics.update()`.
+    """
+
+    def __init__(self, *, max_buffered=1 << 16):
+        self.max_buffered = max_buffered
+        self.buffer = {}
+        self.runs = []
+
+    def _add(self, key, raw_move, outcome, count=1):
+        combined = key << 16 | raw_move
+        counts = self.buffer.get(combined)
+        if counts is None:
+            counts = self.buffer[combined] = [0, 0, 0]
+        counts[outcome] += count
+
+        if len(self.buffer) >= self.max_buffered:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+
+        keys, raw_moves, counts = array.array("Q"), array.array("H"), array.array("I")
+        for combined in sorted(self.buffer):
+            keys.append(combined >> 16)
+            raw_moves.append(combined & 0xffff)
+            counts.extend(self.buffer[combined])
+        self.buffer.clear()
+        self._push_run((keys, raw_moves, counts))
+
+    def _push_run(self, run):
+        # Keep runs in decreasing size, so that each entry is merged only
+        # a logarithmic number of times.
+        while self.runs and len(self.runs[-1][0]) <= 2 * len(run[0]):
+            run = _merge_explorer_runs([self.runs.pop(), run])
+        self.runs.append(run)
+
+    def _compact(self):
+        self._flush()
+        if len(self.runs) > 1:
+            self.runs = [_merge_explorer_runs(self.runs)]
+
+    def add(self, board, move, result):
+        """
+        Records that *move* was played in the position *board* in a game
+        with the given *result* (``1-0``, ``0-1`` or ``1/2-1/2``).
+
+        :raises: :exc:`ValueError` if *move* is a drop, which can not be
+            encoded in Polyglot books.
+        """
+        if result == "1/2-1/2":
+            outcome = 1
+        elif result in ["1-0", "0-1"]:
+            outcome = 0 if (result == "1-0") == (board.turn == chess.WHITE) else 2
+        else:
+            raise ValueError("expected decisive or drawn game result, got {!r}".format(result))
+
+        self._add(chess.polyglot.zobrist_hash(board), chess.polyglot._encode_move(board, move), outcome)
+
+    def update(self, other):
+        """Merges the counts of other statistics into these statistics."""
+        other._flush()
+        self._flush()
+        for run in other.runs:
+            self._push_run(run)
+
+    def __len__(self):
+        self._compact()
+        return len(self.runs[0][0]) if self.runs else 0
+
+    def __iter__(self):
+        """Yields :class:`~chess.pgn.ExplorerEntry` objects sorted by key."""
+        self._compact()
+        for run in self.runs:
+            for entry in _iter_explorer_run(run):
+                yield ExplorerEntry._make(entry)
+
+    def save(self, path):
+        """
+        Writes the statistics to *path*, as an array of entries (see
+        :data:`~chess.pgn.EXPLORER_ENTRY_STRUCT`) sorted by key. Use
+        :func:`~chess.pgn.open_opening_explorer()` to query the file.
+        """
+        with builtins.open(path, "wb") as f:
+            for entry in self:
+                f.write(EXPLORER_ENTRY_STRUCT.pack(*entry))
+
+    def write_polyglot(self, path, *, minimum_games=1):
+        """
+        Writes a Polyglot opening book to *path*, with all moves that were
+        played in at least *minimum_games* games.
+
+        The weight of a move is twice the number of wins plus the number of
+        draws. Weights of a position are scaled down proportionally to fit
+        into 16 bits (see :class:`~chess.polyglot.BookBuilder`). Moves that
+        never scored are left out.
+        """
+        with chess.polyglot.BookBuilder() as builder:
+            for entry in self:
+                if entry.games() >= minimum_games:
+                    builder.add_raw(entry.key, entry.raw_move, 2 * entry.wins + entry.draws)
+            builder.write(path)
+
+    def __repr__(self):
+        return "<OpeningStatistics at {:#x} ({} moves)>".format(id(self), len(self))
+
+
+_OUTCOMES = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+
+class _OpeningCollector(BaseVisitor):
+    # Plays the SAN tokens of the mainline on its own board, so that nothing
+    # is parsed after max_ply.
+
+    def __init__(self, statistics, max_ply):
+        self.statistics = statistics
+        self.max_ply = max_ply
+        self.hasher = _IncrementalZobristHasher()
+        self.headers = Headers({})
+        self.board = None
+
+    def begin_headers(self):
+        return self.headers
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        if self.headers.get("Result") not in _OUTCOMES:
+            return SKIP
+
+    def begin_variation(self):
+        return SKIP
+
+    def visit_san(self, san):
+        board = self.board
+        if board is None:
+            if self.max_ply == 0:
+                return
+
+            try:
+                VariantBoard = self.headers.variant()
+                fen = self.headers.get("FEN", VariantBoard.starting_fen)
+                board = self.board = VariantBoard(fen, chess960=self.headers.is_chess960())
+            except ValueError as error:
+                self.handle_error(error)
+                self.max_ply = 0
+                return
+
+        if self.max_ply is not None and len(board.move_stack) >= self.max_ply:
+            return
+
+        try:
+            move = board.parse_san(san)
+        except ValueError as error:
+            self.handle_error(error)
+            self.max_ply = len(board.move_stack)
+            return
+
+        if move.drop:
+            # Drops can not be encoded. Stop collecting this game.
+            self.max_ply = len(board.move_stack)
+            return
+
+        outcome = _OUTCOMES[self.headers["Result"]]
+        if board.turn == chess.BLACK:
+            outcome = 2 - outcome
+        self.statistics._add(self.hasher(board), chess.polyglot._encode_move(board, move), outcome)
+        board.push(move)
+
+    def handle_error(self, error):
+        LOGGER.exception("error during pgn parsing")
+
+
+def _collect_chunk(path, start, end, max_ply, encoding):
+    with builtins.open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+
+    pgn = io.StringIO(data.decode(encoding))
+    statistics = OpeningStatistics()
+    while read_game(pgn, Visitor=lambda: _OpeningCollector(statistics, max_ply)) is not None:
+        pass
+    return statistics
+
+
+def collect_opening_statistics(path, *, max_ply=40, processes=None, chunk_size=1 << 22, encoding="utf-8"):
+    """
+    Collects :class:`~chess.pgn.OpeningStatistics` from the first
+    *max_ply* half-moves of the mainlines of all games in the PGN file at
+    *path*. Games without a decisive or drawn result are skipped. Games
+    with drops are only counted up to the first drop, which can not be
+    encoded in Polyglot books.
+
+    Like :func:`~chess.pgn.read_games_parallel()`, the file is split into
+    chunks of roughly *chunk_size* bytes that are processed with a pool
+    of *processes* (defaults to the number of CPUs). The statistics of the
+    chunks are merged as they are finished.
+
+    >>> import chess
+    >>> import chess.pgn
+    >>> import os.path
+    >>> import tempfile
+    >>>
+    >>> tmpdir = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(tmpdir.name, "kasparov.explorer")
+    >>>
+    >>> statistics = chess.pgn.collect_opening_statistics("data/pgn/kasparov-deep-blue-1997.pgn", max_ply=4, processes=1)
+    >>> statistics.save(path)
+    >>>
+    >>> with chess.pgn.open_opening_explorer(path) as explorer:
+    ...     for entry in explorer.find_all(chess.Board()):
+    ...         print(entry.move(), entry.wins, entry.draws, entry.losses)
+    g1f3 1 1 0
+    d2d3 0 1 0
+    e2e4 2 1 0
+    >>>
+    >>> tmpdir.cleanup()
+    """
+    statistics = OpeningStatistics()
+    for _, _, chunk_statistics in _process_chunks(path, _collect_chunk, (max_ply, encoding), processes, False, chunk_size, None):
+        statistics.update(chunk_statistics)
+    return statistics
+
+
+class OpeningExplorer(chess.polyglot._MemoryMappedEntries):
+    """
+    Maps opening statistics saved with
+    :func:`~chess.pgn.OpeningStatistics.save()` to memory.
+    """
+
+    _struct = EXPLORER_ENTRY_STRUCT
+    _entry = ExplorerEntry
+
+    def find_all(self, board):
+        """
+        Yields the :class:`~chess.pgn.ExplorerEntry` objects of the given
+        position or Zobrist hash. Given a board, only legal moves are yielded.
+        """
+        try:
+            key = int(board)
+            board = None
+        except (TypeError, ValueError):
+            key = chess.polyglot.zobrist_hash(board)
+
+        for entry in self._find_key(key):
+            if board is None or board.is_legal(entry.move(chess960=board.chess960)):
+                yield entry
+
+
+def open_opening_explorer(path):
+    """
+    Opens opening statistics saved with
+    :func:`~chess.pgn.OpeningStatistics.save()`.
+    """
+    return OpeningExplorer(path)
+
+
+_BEFORE_GAME, _IN_HEADERS, _IN_MOVETEXT = range(3)
+
+
+class _GameSplitter:
+    # Splits text that is fed in arbitrary chunks into the text of the
+    # individual games, using the same game boundaries as read_game().
+
+    def __init__(self):
+        self.games = collections.deque()
+        self._partial = ""
+        self._lines = []
+        self._state = _BEFORE_GAME
+        self._in_comment = False
+
+    def feed(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._feed_line(line + "\n")
+
+    def close(self):
+        if self._partial:
+            self._feed_line(self._partial)
+            self._partial = ""
+        self._end_game()
+
+    def _end_game(self):
+        if self._lines:
+            self.games.append("".join(self._lines))
+            self._lines = []
+        self._state = _BEFORE_GAME
+        self._in_comment = False
+
+    def _feed_line(self, line):
+        if self._state == _BEFORE_GAME:
+            # Ignore leading empty lines and comments.
+            line = line.lstrip("\ufeff")
+            if line.isspace() or line.startswith("%") or line.startswith(";"):
+                return
+            self._state = _IN_HEADERS
+
+        if self._state == _IN_HEADERS:
+            if line.startswith("[") or line.startswith("%") or line.startswith(";"):
+                self._lines.append(line)
+                return
+
+            self._state = _IN_MOVETEXT
+
+            # Single empty line after headers.
+            if line.isspace():
+                self._lines.append(line)
+                return
+
+        if not self._in_comment:
+            if line.isspace():
+                self._end_game()
+                return
+            elif line.startswith("%"):
+                self._lines.append(line)
+                return
+
+        for match in SKIP_MOVETEXT_REGEX.finditer(line):
+            token = match.group(0)
+            if token == "{":
+                self._in_comment = True
+            elif not self._in_comment and token == ";":
+                break
+            elif token == "}":
+                self._in_comment = False
+
+        self._lines.append(line)
+
+
+def _read_game_text(text, Visitor):
+    return read_game(io.StringIO(text), Visitor=Visitor)
+
+
+_END_OF_SOURCE = object()
+
+
+class AsyncGameReader:
+    """
+    Asynchronously reads games from *source*, which can be an
+    :class:`asyncio.StreamReader` or any other object with a coroutine
+    ``read(n)`` that returns bytes or text.
+
+    The source is read in chunks of *chunk_size* bytes and split into games
+    without blocking the event loop. Each game is then parsed with
+    :func:`~chess.pgn.read_game()` and the given *Visitor* in a worker thread
+    of *executor* (defaults to the default executor of the event loop).
+
+    >>> import asyncio
+    >>> import chess.pgn
+    >>>
+    >>> @asyncio.coroutine
+    ... def main():
+    ...     reader = asyncio.StreamReader()
+    ...     with open("data/pgn/kasparov-deep-blue-1997.pgn", "rb") as pgn:
+    ...         reader.feed_data(pgn.read())
+    ...     reader.feed_eof()
+    ...
+    ...     games = chess.pgn.AsyncGameReader(reader)
+    ...     while True:
+    ...         game = yield from games.next()
+    ...         if game is None:
+    ...             break
+    ...         print(game.headers["Site"], game.headers["Result"])
+    >>>
+    >>> asyncio.get_event_loop().run_until_complete(main())
+    01 1-0
+    02 1-0
+    03 1/2-1/2
+    04 1/2-1/2
+    05 1/2-1/2
+    06 1-0
+
+    Bytes are decoded with *encoding*, and line endings are normalized like
+    in files opened in text mode.
+    """
+
+    def __init__(self, source, *, Visitor=GameCreator, encoding="utf-8", chunk_size=1 << 16, executor=None):
+        self.source = source
+        self.Visitor = Visitor
+        self.chunk_size = chunk_size
+        self.executor = executor
+
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        self._splitter = _GameSplitter()
+        self._eof = False
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def next(self, default=None):
+        """
+        Reads the next game and returns the visitor result. Returns
+        *default* at the end of the source.
+
+        Call ``game = yield from reader.next()`` until it returns ``None``.
+        If the visitor result can be ``None``, pass a unique object as
+        *default* to tell the end of the source apart.
+        With Python 3.5 and later, ``async for game in reader`` can be used
+        instead.
+        """
+        result = yield from self._next()
+        return default if result is _END_OF_SOURCE else result
+
+    @asyncio.coroutine
+    def __anext__(self):
+        result = yield from self._next()
+        if result is _END_OF_SOURCE:
+            raise StopAsyncIteration
+        return result
+
+    @asyncio.coroutine
+    def _next(self):
+        while not self._splitter.games:
+            if self._eof:
+                return _END_OF_SOURCE
+
+            data = yield from self.source.read(self.chunk_size)
+            self._eof = not data
+            if isinstance(data, bytes):
+                data = self._decoder.decode(data, final=self._eof)
+            self._splitter.feed(data)
+            if self._eof:
+                self._splitter.close()
+
+        text = self._splitter.games.popleft()
+        loop = asyncio.get_event_loop()
+        return (yield from loop.run_in_executor(self.executor, _read_game_text, text, self.Visitor))
+
+    def __repr__(self):
+        return "<AsyncGameReader at {:#x} (source={!r})>".format(id(self), self.source)
+
+
+class GameUpdate(collections.namedtuple("GameUpdate", "offset game finished")):
+    """
+    A new or updated *game* (the visitor result) at byte *offset* of a
+    followed file. *finished* is ``True`` once the game is terminated by an
+    empty line.
+    """
+
+    __slots__ = ()
+
+
+class GameFollower:
+    """
+    Follows a PGN file that is being appended to, like a live broadcast.
+
+    Each :func:`~chess.pgn.GameFollower.poll()` reads the file from the
+    start of the first unfinished game. Games that are finished (terminated
+    by an empty line) are reported once and never read again. The last game
+    is reported whenever complete lines are added to it. Games are parsed
+    with :func:`~chess.pgn.read_game()` and the given *Visitor*.
+
+    If the file shrinks or is replaced, it is followed from the start again.
+
+    >>> import chess.pgn
+    >>> import os.path
+    >>> import tempfile
+    >>>
+    >>> tmpdir = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(tmpdir.name, "broadcast.pgn")
+    >>>
+    >>> with open(path, "w") as pgn:
+    ...     _ = pgn.write("[Event \\"Live\\"]\\n\\n1. e4 e5\\n2. Nf")
+    >>>
+    >>> follower = chess.pgn.GameFollower(path)
+    >>> for update in follower.poll():
+    ...     print(update.offset, update.game.headers["Event"], len(list(update.game.mainline_moves())), update.finished)
+    0 Live 2 False
+    >>>
+    >>> with open(path, "a") as pgn:
+    ...     _ = pgn.write("3 Nc6 *\\n\\n")
+    >>>
+    >>> for update in follower.poll():
+    ...     print(update.offset, update.game.headers["Event"], len(list(update.game.mainline_moves())), update.finished)
+    0 Live 4 True
+    >>>
+    >>> tmpdir.cleanup()
+    """
+
+    def __init__(self, path, *, Visitor=GameCreator, encoding="utf-8"):
+        self.path = path
+        self.Visitor = Visitor
+        self.encoding = encoding
+
+        self.offset = 0
+        self._partial = None
+        self._file_id = None
+
+    def poll(self):
+        """
+        Reads what was appended to the file since the last poll and returns
+        a list of :class:`~chess.pgn.GameUpdate` objects. A file that does
+        not exist (yet) is treated as empty.
+        """
+        try:
+            with builtins.open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self._file_id or stat.st_size < self.offset + len(self._partial or b""):
+                    self._file_id = file_id
+                    self.offset = 0
+                    self._partial = None
+
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        updates = []
+        pos = 0
+        while True:
+            headers, end, next_end = _scan_game_bytes(data, pos, self.encoding)
+            if headers is None:
+                break
+
+            if b"\n" in data[end:next_end]:
+                # Finished game.
+                updates.append(self._update(self.offset + pos, data[pos:next_end], True))
+                self._partial = None
+                pos = next_end
+                continue
+
+            # The last game is still being written. Consider only complete
+            # lines, and report it only if they changed.
+            text = data[pos:data.rfind(b"\n") + 1]
+            if text and text != self._partial:
+                updates.append(self._update(self.offset + pos, text, False))
+                self._partial = text
+            break
+
+        self.offset += pos
+        return updates
+
+    def _update(self, offset, text, finished):
+        game = read_game(io.StringIO(text.decode(self.encoding)), Visitor=self.Visitor)
+        return GameUpdate(offset, game, finished)
+
+    def follow(self, *, interval=1.0):
+        """
+        Polls the file every *interval* seconds and yields
+        :class:`~chess.pgn.GameUpdate` objects. Never returns.
+        """
+        while True:
+            yield from self.poll()
+            time.sleep(interval)
+
+    def __repr__(self):
+        return "<GameFollower at {:#x} (path={!r}, offset={})>".format(id(self), self.path, self.offset)
+
+
+_BINARY_HEADER = 0x80
+_BINARY_DROP = 0x81
+_BINARY_NAG = 0x82
+_BINARY_COMMENT = 0x83
+_BINARY_BEGIN_VARIATION = 0x84
+_BINARY_END_VARIATION = 0x85
+_BINARY_RESULT = 0x86
+_BINARY_STARTING_COMMENT = 0x87
+
+
+def _pack_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append(0x80 | (value & 0x7f))
+        value >>= 7
+    buffer.append(value)
+
+
+def _unpack_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated binary game record at {}".format(pos))
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack_string(buffer, string):
+    encoded = string.encode("utf-8")
+    _pack_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+def _unpack_string(data, pos):
+    length, pos = _unpack_varint(data, pos)
+    if pos + length > len(data):
+        raise ValueError("truncated binary game string at {}".format(pos))
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+
+class BinaryExporter(BaseVisitor):
+    """
+    Writes games in a compact binary format into a file opened in binary
+    mode. Use :func:`~chess.pgn.read_binary_game()` to read them back.
+
+    Headers, comments, starting comments, NAGs, variations and the result
+    are preserved, so that reading a game back yields the same game tree.
+    Each move takes two bytes (origin, target and promotion packed into
+    an integer), so no SAN has to be parsed when reading.
+
+    >>> import chess.pgn
+    >>>
+    >>> pgn = open("data/pgn/kasparov-deep-blue-1997.pgn")
+    >>> game = chess.pgn.read_game(pgn)
+    >>>
+    >>> with open("/dev/null", "wb") as handle:
+    ...     exporter = chess.pgn.BinaryExporter(handle)
+    ...     game.accept(exporter)
+
+    Games are written one at a time, each prefixed with its length, so the
+    same exporter can be used for any number of games.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def begin_game(self):
+        self.buffer = bytearray()
+
+    def visit_header(self, tagname, tagvalue):
+        self.buffer.append(_BINARY_HEADER)
+        _pack_string(self.buffer, tagname)
+        _pack_string(self.buffer, tagvalue)
+
+    def begin_variation(self):
+        self.buffer.append(_BINARY_BEGIN_VARIATION)
+
+    def end_variation(self):
+        self.buffer.append(_BINARY_END_VARIATION)
+
+    def visit_comment(self, comment):
+        self.buffer.append(_BINARY_COMMENT)
+        _pack_string(self.buffer, comment)
+
+    def visit_starting_comment(self, comment):
+        self.buffer.append(_BINARY_STARTING_COMMENT)
+        _pack_string(self.buffer, comment)
+
+    def visit_nag(self, nag):
+        self.buffer.append(_BINARY_NAG)
+        _pack_varint(self.buffer, nag)
+
+    def visit_move(self, board, move):
+        if move.drop:
+            self.buffer.append(_BINARY_DROP)
+            self.buffer.append(move.to_square)
+            self.buffer.append(move.drop)
+        else:
+            packed = move.from_square << 9 | move.to_square << 3 | (move.promotion or 0)
+            self.buffer.append(packed >> 8)
+            self.buffer.append(packed & 0xff)
+
+    def visit_result(self, result):
+        self.buffer.append(_BINARY_RESULT)
+        _pack_string(self.buffer, result)
+
+    def end_game(self):
+        prefix = bytearray()
+        _pack_varint(prefix, len(self.buffer))
+        self.handle.write(prefix)
+        self.handle.write(self.buffer)
+
+    def result(self):
+        return None
+
+    def __repr__(self):
+        return "<BinaryExporter at {:#x}>".format(id(self))
+
+
+def read_binary_game(handle, *, Visitor=GameCreator):
+    """
+    Reads a game written by :class:`~chess.pgn.BinaryExporter` from a file
+    opened in binary mode.
+
+    >>> import chess.pgn
+    >>> import io
+    >>>
+    >>> buffer = io.BytesIO()
+    >>> exporter = chess.pgn.BinaryExporter(buffer)
+    >>> for game in chess.pgn.read_games(open("data/pgn/kasparov-deep-blue-1997.pgn")):
+    ...     game.accept(exporter)
+    >>>
+    >>> _ = buffer.seek(0)
+    >>> while True:
+    ...     game = chess.pgn.read_binary_game(buffer)
+    ...     if game is None:
+    ...         break
+    ...     print(game.headers["Site"], game.end().board().fullmove_number)
+    01 45
+    02 45
+    03 48
+    04 56
+    05 50
+    06 19
+
+    The game is replayed into the given *Visitor*, just like
+    :func:`~chess.pgn.read_game()` does, except that
+    :func:`~chess.pgn.BaseVisitor.parse_san()` is not called. Moves are only
+    checked for legality.
+
+    Returns the visitor result or ``None`` if the end of file is reached.
+    Raises :exc:`ValueError` for truncated or invalid data.
+    """
+    # Read the length prefix.
+    length = 0
+    shift = 0
+    while True:
+        byte = handle.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("truncated binary game length")
+            return None
+        length |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            break
+        shift += 7
+
+    data = handle.read(length)
+    if len(data) < length:
+        raise ValueError("truncated binary game: expected {} bytes, got {}".format(length, len(data)))
+
+    visitor = Visitor()
+    if visitor.begin_game() is SKIP:
+        visitor.end_game()
+        return visitor.result()
+
+    headers = None
+    managed_headers = visitor.begin_headers()
+    if not isinstance(managed_headers, Headers):
+        managed_headers = None
+        headers = Headers({})
+
+    # Headers.
+    pos = 0
+    while pos < length and data[pos] == _BINARY_HEADER:
+        tagname, pos = _unpack_string(data, pos + 1)
+        tagvalue, pos = _unpack_string(data, pos)
+        visitor.visit_header(tagname, tagvalue)
+        if headers is not None:
+            headers[tagname] = tagvalue
+
+    if visitor.end_headers() is SKIP:
+        visitor.end_game()
+        return visitor.result()
+
+    # Chess variant.
+    headers = managed_headers if headers is None else headers
+    try:
+        VariantBoard = headers.variant()
+    except ValueError as error:
+        visitor.handle_error(error)
+        VariantBoard = chess.Board
+
+    # Initial position.
+    fen = headers.get("FEN", VariantBoard.starting_fen)
+    try:
+        board_stack = [VariantBoard(fen, chess960=headers.is_chess960())]
+    except ValueError as error:
+        visitor.handle_error(error)
+        board_stack = [VariantBoard(chess960=headers.is_chess960())]
+    visitor.visit_board(board_stack[0])
+
+    # Movetext.
+    skip_variation_depth = 0
+    while pos < length:
+        byte = data[pos]
+
+        if byte < 0x80 or byte == _BINARY_DROP:
+            if byte < 0x80:
+                if pos + 2 > length:
+                    raise ValueError("truncated binary game move at {}".format(pos))
+                packed = byte << 8 | data[pos + 1]
+                if packed & 7 == 7:
+                    raise ValueError("invalid binary game promotion at {}".format(pos))
+                move = chess.Move(packed >> 9, (packed >> 3) & 63, packed & 7 or None)
+            else:
+                if pos + 3 > length:
+                    raise ValueError("truncated binary game drop at {}".format(pos))
+                if data[pos + 1] >= 64 or data[pos + 2] not in chess.PIECE_TYPES:
+                    raise ValueError("invalid binary game drop at {}".format(pos))
+                move = chess.Move(data[pos + 1], data[pos + 1], drop=data[pos + 2])
+                pos += 1
+            pos += 2
+
+            if not skip_variation_depth:
+                if move and not board_stack[-1].is_legal(move):
+                    raise ValueError("illegal binary game move {} in {}".format(move.uci(), board_stack[-1].fen()))
+                visitor.visit_move(board_stack[-1], move)
+                board_stack[-1].push(move)
+                visitor.visit_board(board_stack[-1])
+        elif byte == _BINARY_NAG:
+            nag, pos = _unpack_varint(data, pos + 1)
+            if not skip_variation_depth:
+                visitor.visit_nag(nag)
+        elif byte == _BINARY_COMMENT:
+            comment, pos = _unpack_string(data, pos + 1)
+            if not skip_variation_depth:
+                visitor.visit_comment(comment)
+        elif byte == _BINARY_STARTING_COMMENT:
+            comment, pos = _unpack_string(data, pos + 1)
+            if not skip_variation_depth:
+                visitor.visit_starting_comment(comment)
+        elif byte == _BINARY_BEGIN_VARIATION:
+            pos += 1
+            if skip_variation_depth:
+                skip_variation_depth += 1
+            elif not board_stack[-1].move_stack:
+                raise ValueError("binary game variation without preceding move at {}".format(pos - 1))
+            elif visitor.begin_variation() is SKIP:
+                skip_variation_depth = 1
+            else:
+                board = board_stack[-1].copy()
+                board.pop()
+                board_stack.append(board)
+        elif byte == _BINARY_END_VARIATION:
+            pos += 1
+            if skip_variation_depth:
+                skip_variation_depth -= 1
+                if not skip_variation_depth:
+                    visitor.end_variation()
+            elif len(board_stack) > 1:
+                visitor.end_variation()
+                board_stack.pop()
+            else:
+                raise ValueError("unmatched binary game variation end at {}".format(pos - 1))
+        elif byte == _BINARY_RESULT:
+            result, pos = _unpack_string(data, pos + 1)
+            visitor.visit_result(result)
+        else:
+            raise ValueError("invalid binary game record: 0x{:02x}".format(byte))
+
+    visitor.end_game()
+    return visitor.result()
+
+
 # TODO: Deprecated
 GameModelCreator = GameCreator
@@ -22,6 +22,9 @@ import struct
 import os
 import mmap
 import random
+import heapq
+import itertools
+import tempfile
 
 
 ENTRY_STRUCT = struct.Struct(">QHHI")
@@ -327,8 +330,13 @@ class Entry(collections.namedtuple("Entry", "key raw_move weight learn")):
             return chess.Move(from_square, to_square, promotion)
 
 
-class MemoryMappedReader:
-    """Maps a Polyglot opening book to memory."""
+class _MemoryMappedEntries:
+    # Base class for memory mapped arrays of fixed size entries, sorted by
+    # a 64 bit key. Subclasses set the struct and the namedtuple type of
+    # the entries.
+
+    _struct = None
+    _entry = None
 
     def __init__(self, filename):
         self.fd = os.open(filename, os.O_RDONLY | os.O_BINARY if hasattr(os, "O_BINARY") else os.O_RDONLY)
@@ -336,7 +344,7 @@ class MemoryMappedReader:
         try:
             self.mmap = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
         except (ValueError, mmap.error):
-            # Can not memory map empty opening books.
+            # Can not memory map empty files.
             self.mmap = None
 
     def __enter__(self):
@@ -349,22 +357,20 @@ class MemoryMappedReader:
         if self.mmap is None:
             return 0
         else:
-            return self.mmap.size() // ENTRY_STRUCT.size
+            return self.mmap.size() // self._struct.size
 
-    def __getitem__(self, key):
+    def __getitem__(self, index):
         if self.mmap is None:
             raise IndexError()
 
-        if key < 0:
-            key = len(self) + key
+        if index < 0:
+            index = len(self) + index
 
         try:
-            key, raw_move, weight, learn = ENTRY_STRUCT.unpack_from(self.mmap, key * ENTRY_STRUCT.size)
+            return self._entry._make(self._struct.unpack_from(self.mmap, index * self._struct.size))
         except struct.error:
             raise IndexError()
 
-        return Entry(key, raw_move, weight, learn)
-
     def __iter__(self):
         i = 0
         size = len(self)
@@ -378,7 +384,7 @@ class MemoryMappedReader:
 
         while lo < hi:
             mid = (lo + hi) // 2
-            mid_key, _, _, _ = ENTRY_STRUCT.unpack_from(self.mmap, mid * ENTRY_STRUCT.size)
+            mid_key = self._struct.unpack_from(self.mmap, mid * self._struct.size)[0]
             if mid_key < key:
                 lo = mid + 1
             else:
@@ -386,6 +392,39 @@ class MemoryMappedReader:
 
         return lo
 
+    def _find_key(self, key):
+        i = self.bisect_key_left(key)
+        size = len(self)
+
+        while i < size:
+            entry = self[i]
+            i += 1
+
+            if entry.key != key:
+                break
+
+            yield entry
+
+    def close(self):
+        """Closes the file."""
+        if self.mmap is not None:
+            self.mmap.close()
+
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+    def __repr__(self):
+        return "<{} at {:#x} ({} entries)>".format(type(self).__name__, id(self), len(self))
+
+
+class MemoryMappedReader(_MemoryMappedEntries):
+    """Maps a Polyglot opening book to memory."""
+
+    _struct = ENTRY_STRUCT
+    _entry = Entry
+
     def __contains__(self, entry):
         return any(current == entry for current in self.find_all(entry.key, minimum_weight=entry.weight))
 
@@ -397,16 +436,7 @@ class MemoryMappedReader:
         except (TypeError, ValueError):
             key = zobrist_hash(board)
 
-        i = self.bisect_key_left(key)
-        size = len(self)
-
-        while i < size:
-            entry = self[i]
-            i += 1
-
-            if entry.key != key:
-                break
-
+        for entry in self._find_key(key):
             if entry.weight < minimum_weight:
                 continue
 
@@ -486,16 +516,6 @@ class MemoryMappedReader:
 
         assert False
 
-    def close(self):
-        """Closes the reader."""
-        if self.mmap is not None:
-            self.mmap.close()
-
-        try:
-            os.close(self.fd)
-        except OSError:
-            pass
-
 
 def open_reader(path):
     """
@@ -517,3 +537,242 @@ def open_reader(path):
     c2c4 1 0
     """
     return MemoryMappedReader(path)
+
+
+def _encode_move(board, move):
+    # Inverse of Entry.move(). Castling moves are encoded as the king
+    # capturing its own rook. There is no encoding for drops.
+    if move.drop:
+        raise ValueError("polyglot books can not encode drops: {!r}".format(move))
+
+    move = board._to_chess960(move)
+    promotion_part = move.promotion - 1 if move.promotion else 0
+    return move.to_square | move.from_square << 6 | promotion_part << 12
+
+
+_RUN_STRUCT = struct.Struct(">QHQ")
+
+
+def _read_run(f, run_struct, block_size=1 << 16):
+    f.seek(0)
+    while True:
+        block = f.read(block_size * run_struct.size)
+        if not block:
+            break
+        yield from run_struct.iter_unpack(block[:len(block) - len(block) % run_struct.size])
+
+
+class _SortedRuns:
+    # Sorted runs of fixed size records, spilled into temporary files in
+    # tmpdir, so that more records than fit into memory can be sorted.
+
+    def __init__(self, run_struct, *, tmpdir=None):
+        self.run_struct = run_struct
+        self.tmpdir = tmpdir
+        self.files = []
+
+    def spill(self, records):
+        # Writes records, which must already be sorted, as a new run.
+        f = tempfile.TemporaryFile(dir=self.tmpdir)
+        self.files.append(f)
+
+        pack = self.run_struct.pack
+        for record in records:
+            f.write(pack(*record))
+
+    def merge(self, *iterables):
+        # Merges all runs and the given sorted iterables of records.
+        runs = [_read_run(f, self.run_struct) for f in self.files]
+        return heapq.merge(*itertools.chain(iterables, runs))
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        self.files.clear()
+
+    def __len__(self):
+        return len(self.files)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.close()
+
+
+class BookBuilder:
+    """
+    Builds a Polyglot opening book.
+
+    Weights of the same move in the same position are added up. At most
+    *max_buffered* distinct entries are kept in memory. Beyond that, they
+    are sorted and spilled into temporary files in *tmpdir*, which are
+    merged when the book is written, so that books larger than the
+    available memory can be built.
+
+    >>> import chess
+    >>> import chess.polyglot
+    >>> import os.path
+    >>> import tempfile
+    >>>
+    >>> tmpdir = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(tmpdir.name, "book.bin")
+    >>>
+    >>> board = chess.Board()
+    >>> with chess.polyglot.BookBuilder() as builder:
+    ...     builder.add(board, chess.Move.from_uci("e2e4"), 3)
+    ...     builder.add(board, chess.Move.from_uci("d2d4"))
+    ...     builder.add(board, chess.Move.from_uci("e2e4"))
+    ...     builder.write(path)
+    2
+    >>>
+    >>> with chess.polyglot.open_reader(path) as reader:
+    ...    for entry in reader.find_all(board):
+    ...        print(entry.move(), entry.weight)
+    e2e4 4
+    d2d4 1
+    >>>
+    >>> tmpdir.cleanup()
+    """
+
+    def __init__(self, *, max_buffered=1 << 20, tmpdir=None):
+        self.max_buffered = max_buffered
+        self.tmpdir = tmpdir
+        self.buffer = {}
+        self.runs = _SortedRuns(_RUN_STRUCT, tmpdir=tmpdir)
+        self.books = []
+
+    def add_raw(self, key, raw_move, weight=1):
+        """
+        Adds *weight* to the entry with the given Zobrist hash *key* and
+        *raw_move* (see :class:`~chess.polyglot.Entry`).
+        """
+        if weight < 0:
+            raise ValueError("expected non-negative weight, got {}".format(weight))
+
+        combined = key << 16 | raw_move
+        self.buffer[combined] = self.buffer.get(combined, 0) + weight
+
+        if len(self.buffer) >= self.max_buffered:
+            self._spill()
+
+    def add(self, board, move, weight=1):
+        """
+        Adds *weight* to the entry for *move* in the position *board*.
+
+        :raises: :exc:`ValueError` if *move* is a drop, which can not be
+            encoded in Polyglot books.
+        """
+        self.add_raw(zobrist_hash(board), _encode_move(board, move), weight)
+
+    def add_game(self, game, *, max_ply=None):
+        """
+        Adds the moves of the mainline of a :class:`~chess.pgn.Game`, up to
+        *max_ply* half-moves.
+
+        Moves of the winning side get weight ``2``, moves of drawn games get
+        weight ``1`` and moves of the losing side count, but get no weight.
+        Games without a decisive or drawn result are ignored. Since drops can
+        not be encoded, the game is only added up to the first drop.
+        """
+        result = game.headers.get("Result")
+        if result == "1-0":
+            weights = {chess.WHITE: 2, chess.BLACK: 0}
+        elif result == "0-1":
+            weights = {chess.WHITE: 0, chess.BLACK: 2}
+        elif result == "1/2-1/2":
+            weights = {chess.WHITE: 1, chess.BLACK: 1}
+        else:
+            return
+
+        board = game.board()
+        for move in game.mainline_moves():
+            if max_ply is not None and len(board.move_stack) >= max_ply:
+                break
+            if move.drop:
+                break
+            self.add(board, move, weights[board.turn])
+            board.push(move)
+
+    def add_book(self, path):
+        """
+        Merges the existing opening book at *path*, which is read when the
+        new book is written. The learn values are discarded.
+        """
+        self.books.append(path)
+
+    def _spill(self):
+        self.runs.spill((combined >> 16, combined & 0xffff, self.buffer[combined]) for combined in sorted(self.buffer))
+        self.buffer.clear()
+
+    def write(self, path):
+        """
+        Writes the book to *path* and returns the number of entries.
+
+        The weights of each position are scaled down proportionally to fit
+        into 16 bits, keeping moves with non-zero weight. Entries with weight
+        ``0`` are left out.
+
+        The book is first written to a temporary file next to *path*, which
+        then replaces *path*. So *path* may also be one of the merged books.
+        """
+        books = []
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                for book in self.books:
+                    books.append(open(book, "rb"))
+
+                buffered = ((combined >> 16, combined & 0xffff, self.buffer[combined]) for combined in sorted(self.buffer))
+                entries = [(fields[:3] for fields in _read_run(book, ENTRY_STRUCT)) for book in books]
+
+                count = 0
+                for key, group in itertools.groupby(self.runs.merge(buffered, *entries), key=lambda entry: entry[0]):
+                    weights = collections.defaultdict(int)
+                    for _, raw_move, weight in group:
+                        weights[raw_move] += weight
+
+                    scale = max(weights.values())
+                    for raw_move, weight in sorted(weights.items(), key=lambda item: (-item[1], item[0])):
+                        if not weight:
+                            break
+                        if scale > 0xffff:
+                            weight = max(1, weight * 0xffff // scale)
+                        f.write(ENTRY_STRUCT.pack(key, raw_move, weight, 0))
+                        count += 1
+
+            for book in books:
+                book.close()
+            os.replace(tmp_path, path)
+            return count
+        finally:
+            for book in books:
+                book.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def close(self):
+        """Deletes the temporary files."""
+        self.runs.close()
+        self.buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self.close()
+
+    def __repr__(self):
+        return "<BookBuilder at {:#x} ({} buffered, {} runs, {} books)>".format(id(self), len(self.buffer), len(self.runs), len(self.books))
+
+
+def merge_books(paths, path, *, max_buffered=1 << 20, tmpdir=None):
+    """
+    Merges the opening books at *paths* into a new book at *path* and
+    returns the number of entries. Weights of the same move in the same
+    position are added up (see :class:`~chess.polyglot.BookBuilder`).
+    """
+    with BookBuilder(max_buffered=max_buffered, tmpdir=tmpdir) as builder:
+        for book in paths:
+            builder.add_book(book)
+        return builder.write(path)
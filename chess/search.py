@@ -0,0 +1,729 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the python-chess library.
+# Copyright (C) 2012-2019 Niklas Fiekas <niklas.fiekas@backscattering.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import functools
+import multiprocessing
+import time
+
+import chess
+
+from chess.engine import PlayResult, PovScore, Cp, Mate
+
+
+MATE_SCORE = 1000000
+MATE_BOUND = MATE_SCORE - 1000
+
+MAX_PLY = 128
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+"""Material values in centi-pawns, indexed by piece type."""
+
+# Piece-square tables from White's point of view, starting at A1.
+PIECE_SQUARE_TABLES = [
+    None,
+    [  # Pawn
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    [  # Knight
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    [  # Bishop
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    [  # Rook
+        0, 0, 0, 5, 5, 0, 0, 0,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    [  # Queen
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    [  # King
+        20, 30, 10, 0, 0, 10, 30, 20,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+    ],
+]
+
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
+
+def evaluate(board):
+    """
+    A simple static evaluation of the position, based on material and
+    piece-square tables. Returns centi-pawns from the point of view of the
+    side to move.
+    """
+    score = 0
+
+    for piece_type in chess.PIECE_TYPES:
+        value = PIECE_VALUES[piece_type]
+        table = PIECE_SQUARE_TABLES[piece_type]
+        bb = board.pieces_mask(piece_type, chess.WHITE)
+        for square in chess.scan_reversed(bb):
+            score += value + table[square]
+        bb = board.pieces_mask(piece_type, chess.BLACK)
+        for square in chess.scan_reversed(bb):
+            score -= value + table[square ^ 0x38]
+
+    return score if board.turn == chess.WHITE else -score
+
+
+class _SearchAborted(Exception):
+    pass
+
+
+class Searcher:
+    """
+    An iterative deepening alpha-beta search with quiescence search, a
+    transposition table, killer moves and the history heuristic.
+
+    It is intended for cheap tactical checks in process, such as validating
+    puzzles or flagging blunders, where spawning a real engine would cost
+    more than the search itself. It is far weaker than a real engine.
+
+    The transposition table and the history heuristic are kept between
+    searches. Use :func:`~chess.search.Searcher.clear()` to reset them.
+
+    *tt_size* is the maximum number of entries in the transposition table.
+    The table is cleared when it is full.
+    """
+
+    def __init__(self, *, tt_size=1000000, evaluate=evaluate):
+        self.tt_size = tt_size
+        self.evaluate = evaluate
+        self.clear()
+
+    def clear(self):
+        """Clears the transposition table and move ordering heuristics."""
+        self.tt = {}
+        self.history = {}
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.pv_table = [[] for _ in range(MAX_PLY + 2)]
+
+    def play(self, board, limit, *, root_moves=None):
+        """
+        Searches the best move in the position. Mirrors
+        :func:`chess.engine.SimpleEngine.play()`.
+
+        Returns a :class:`~chess.engine.PlayResult` with the search
+        information (as returned by :func:`~chess.search.Searcher.analyse()`)
+        in its *info* attribute. The move is ``None`` if the game is over.
+        """
+        info = self.analyse(board, limit, root_moves=root_moves)
+        pv = info.get("pv", [])
+        move = pv[0] if pv else None
+        ponder = pv[1] if len(pv) > 1 else None
+        return PlayResult(move, ponder, info)
+
+    def analyse(self, board, limit, *, root_moves=None):
+        """
+        Analyses the position. Mirrors
+        :func:`chess.engine.SimpleEngine.analyse()`.
+
+        Supports the *depth*, *nodes*, *time* and *mate* conditions of the
+        :class:`~chess.engine.Limit`, as well as the clock conditions.
+
+        Returns a dictionary with the keys ``score`` (a
+        :class:`~chess.engine.PovScore`), ``pv``, ``depth``, ``seldepth``,
+        ``nodes``, ``time`` and ``nps``.
+
+        :raises: :exc:`ValueError` if none of the given *root_moves* is
+            legal in a position that is not game over.
+        """
+        self._start_search(board, limit)
+
+        moves = list(board.generate_legal_moves())
+        if root_moves is not None and moves and not board.is_variant_end():
+            moves = [move for move in moves if move in root_moves]
+            if not moves:
+                raise ValueError("no legal root moves in {}: {}".format(
+                    board.fen(), ", ".join(move.uci() for move in root_moves)))
+
+        if not moves or board.is_variant_end():
+            score = self._terminal_score(board, 0, bool(moves))
+            return {
+                "score": PovScore(self._to_score(score), board.turn),
+                "pv": [],
+                "depth": 0,
+                "seldepth": 0,
+                "nodes": 0,
+                "time": 0.0,
+                "nps": 0,
+            }
+
+        max_depth = limit.depth
+        if limit.mate is not None:
+            max_depth = min(max_depth or MAX_PLY, 2 * limit.mate - 1)
+        max_depth = min(max_depth or MAX_PLY, MAX_PLY)
+
+        board = board.copy()
+        best_score = None
+        best_pv = [moves[0]]
+        completed_depth = 0
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, pv = self._root(board, moves, depth)
+            except _SearchAborted:
+                break
+
+            best_score = score
+            best_pv = pv
+            completed_depth = depth
+
+            # Search the best move first in the next iteration.
+            moves.remove(pv[0])
+            moves.insert(0, pv[0])
+
+            if abs(score) >= MATE_BOUND:
+                mate_moves = (MATE_SCORE - abs(score) + 1) // 2
+                if limit.mate is not None and score > 0 and mate_moves <= limit.mate:
+                    break
+                if MATE_SCORE - abs(score) <= depth:
+                    # Found the shortest mate.
+                    break
+
+            if self.deadline is not None and time.monotonic() > self.soft_deadline:
+                break
+
+        if best_score is None:
+            best_score = self.evaluate(board)
+
+        elapsed = time.monotonic() - self.start_time
+        return {
+            "score": PovScore(self._to_score(best_score), board.turn),
+            "pv": best_pv,
+            "depth": completed_depth,
+            "seldepth": self.seldepth,
+            "nodes": self.nodes,
+            "time": elapsed,
+            "nps": int(self.nodes / elapsed) if elapsed else 0,
+        }
+
+    def _start_search(self, board, limit):
+        self.nodes = 0
+        self.seldepth = 0
+        self.start_time = time.monotonic()
+        self.max_nodes = limit.nodes
+
+        budget = limit.time
+        if budget is None:
+            clock = limit.white_clock if board.turn == chess.WHITE else limit.black_clock
+            inc = limit.white_inc if board.turn == chess.WHITE else limit.black_inc
+            if clock is not None:
+                budget = clock / (limit.remaining_moves or 30) + (inc or 0) * 0.75
+                budget = min(budget, clock * 0.5)
+
+        if budget is None:
+            self.deadline = self.soft_deadline = None
+        else:
+            self.deadline = self.start_time + budget
+            self.soft_deadline = self.start_time + budget * 0.5
+
+        # Positions since the last irreversible move, for repetition
+        # detection.
+        self.path = []
+        replay = board.copy()
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            replay.pop()
+            self.path.append(replay._transposition_key())
+
+    def _check_limits(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise _SearchAborted()
+        if self.deadline is not None and not self.nodes & 1023 and time.monotonic() > self.deadline:
+            raise _SearchAborted()
+
+    def _to_score(self, score):
+        if score >= MATE_BOUND:
+            return Mate((MATE_SCORE - score + 1) // 2)
+        elif score <= -MATE_BOUND:
+            return Mate(-((MATE_SCORE + score) // 2))
+        else:
+            return Cp(score)
+
+    def _terminal_score(self, board, ply, has_moves):
+        if board.is_variant_loss():
+            return -MATE_SCORE + ply
+        elif board.is_variant_win():
+            return MATE_SCORE - ply
+        elif board.is_variant_draw():
+            return 0
+        elif not has_moves and board.is_check():
+            return -MATE_SCORE + ply
+        else:
+            return 0
+
+    def _root(self, board, moves, depth):
+        alpha = -MATE_SCORE - 1
+        beta = MATE_SCORE + 1
+        best_move = moves[0]
+        pv = [best_move]
+        self.path.append(board._transposition_key())
+
+        try:
+            for i, move in enumerate(moves):
+                board.push(move)
+                try:
+                    if i == 0:
+                        score = -self._alpha_beta(board, depth - 1, -beta, -alpha, 1)
+                    else:
+                        score = -self._alpha_beta(board, depth - 1, -alpha - 1, -alpha, 1)
+                        if alpha < score < beta:
+                            score = -self._alpha_beta(board, depth - 1, -beta, -alpha, 1)
+                finally:
+                    board.pop()
+
+                if score > alpha:
+                    alpha = score
+                    best_move = move
+                    pv = [move] + self.pv_table[1]
+        finally:
+            self.path.pop()
+
+        self._store(board._transposition_key(), depth, alpha, TT_EXACT, best_move)
+        return alpha, pv
+
+    def _alpha_beta(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        self._check_limits()
+        self.pv_table[ply] = []
+
+        key = board._transposition_key()
+        if key in self.path:
+            return 0
+
+        if board.is_variant_end():
+            return self._terminal_score(board, ply, True)
+
+        # Checkmate takes precedence over the fifty-move rule.
+        if board.halfmove_clock >= 100 and not board.is_checkmate():
+            return 0
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiescence(board, alpha, beta, ply)
+
+        # Mate distance pruning.
+        alpha = max(alpha, -MATE_SCORE + ply)
+        beta = min(beta, MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+
+        tt_move = None
+        entry = self.tt.get(key)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                tt_score = self._score_from_tt(tt_score, ply)
+                if tt_flag == TT_EXACT:
+                    return tt_score
+                elif tt_flag == TT_LOWER and tt_score >= beta:
+                    return tt_score
+                elif tt_flag == TT_UPPER and tt_score <= alpha:
+                    return tt_score
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE - 1
+        best_move = None
+        searched = 0
+
+        self.path.append(key)
+        try:
+            for move in self._ordered_moves(board, tt_move, ply):
+                capture = board.is_capture(move)
+                board.push(move)
+                try:
+                    if not searched:
+                        score = -self._alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)
+                    else:
+                        score = -self._alpha_beta(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                        if alpha < score < beta:
+                            score = -self._alpha_beta(board, depth - 1, -beta, -alpha, ply + 1)
+                finally:
+                    board.pop()
+                searched += 1
+
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                if alpha >= beta:
+                    if not capture:
+                        self._update_killers(move, ply)
+                        history_key = (move.from_square, move.to_square)
+                        self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                    break
+        finally:
+            self.path.pop()
+
+        if not searched:
+            return self._terminal_score(board, ply, False)
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self._store(key, depth, self._score_to_tt(best_score, ply), flag, best_move)
+
+        return best_score
+
+    def _quiescence(self, board, alpha, beta, ply):
+        self.nodes += 1
+        self._check_limits()
+        self.seldepth = max(self.seldepth, ply)
+
+        if ply >= MAX_PLY:
+            return self.evaluate(board)
+
+        self.pv_table[ply] = []
+
+        if board.is_variant_end():
+            return self._terminal_score(board, ply, True)
+
+        in_check = board.is_check()
+        if in_check:
+            moves = list(board.generate_legal_moves())
+            if not moves:
+                return -MATE_SCORE + ply
+            moves.sort(key=lambda move: self._capture_order(board, move), reverse=True)
+            best_score = -MATE_SCORE + ply
+        else:
+            stand_pat = self.evaluate(board)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best_score = stand_pat
+            moves = [move for move in board.generate_legal_moves() if move.promotion or board.is_capture(move)]
+            moves.sort(key=lambda move: self._capture_order(board, move), reverse=True)
+
+        for move in moves:
+            board.push(move)
+            try:
+                score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                break
+
+        return best_score
+
+    def _capture_order(self, board, move):
+        # Most valuable victim, least valuable attacker.
+        victim = board.piece_type_at(move.to_square)
+        if victim is None and board.is_en_passant(move):
+            victim = chess.PAWN
+        attacker = board.piece_type_at(move.from_square) or chess.PAWN
+        score = PIECE_VALUES[victim or 0] * 10 - PIECE_VALUES[attacker] // 10
+        if move.promotion:
+            score += PIECE_VALUES[move.promotion]
+        return score
+
+    def _ordered_moves(self, board, tt_move, ply):
+        moves = list(board.generate_legal_moves())
+        killers = self.killers[ply]
+
+        def order(move):
+            if move == tt_move:
+                return 100000000
+            elif move.promotion or board.is_capture(move):
+                return 10000000 + self._capture_order(board, move)
+            elif move == killers[0]:
+                return 9000000
+            elif move == killers[1]:
+                return 8000000
+            else:
+                return self.history.get((move.from_square, move.to_square), 0)
+
+        moves.sort(key=order, reverse=True)
+        return moves
+
+    def _update_killers(self, move, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+    def _store(self, key, depth, score, flag, move):
+        if len(self.tt) >= self.tt_size and key not in self.tt:
+            # Start over rather than growing beyond the limit.
+            self.tt.clear()
+        self.tt[key] = (depth, score, flag, move)
+
+    def _score_to_tt(self, score, ply):
+        # Store mate scores relative to the current node.
+        if score >= MATE_BOUND:
+            return score + ply
+        elif score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    def _score_from_tt(self, score, ply):
+        if score >= MATE_BOUND:
+            return score - ply
+        elif score <= -MATE_BOUND:
+            return score + ply
+        return score
+
+
+def play(board, limit, *, root_moves=None):
+    """
+    Searches the best move with a new :class:`~chess.search.Searcher`.
+
+    >>> import chess
+    >>> import chess.engine
+    >>> import chess.search
+    >>>
+    >>> board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    >>> result = chess.search.play(board, chess.engine.Limit(depth=3))
+    >>> result.move
+    Move.from_uci('d1d8')
+    >>> result.info["score"]
+    PovScore(Mate(+1), WHITE)
+    """
+    return Searcher().play(board, limit, root_moves=root_moves)
+
+
+def analyse(board, limit, *, root_moves=None):
+    """Analyses the position with a new :class:`~chess.search.Searcher`."""
+    return Searcher().analyse(board, limit, root_moves=root_moves)
+
+
+class MateSolver:
+    """
+    A depth-first solver for forced mates.
+
+    The attacking side tries checking moves first. With *checks_only*, only
+    checking moves are tried for the attacking side, which is much faster,
+    but misses mates with quiet moves.
+
+    Proven results are kept in a transposition table between calls. Use
+    :func:`~chess.search.MateSolver.clear()` to reset it.
+    """
+
+    def __init__(self, *, checks_only=False):
+        self.checks_only = checks_only
+        self.clear()
+
+    def clear(self):
+        """Clears the transposition table."""
+        # Maps positions with the attacker to move to tuples of the largest
+        # n such that there is provably no mate in n, the smallest n such
+        # that there is a proven mate in n (or None) and the mating move.
+        self.tt = {}
+        self.nodes = 0
+
+    def solve(self, board, n):
+        """
+        Searches a forced mate in at most *n* moves for the side to move.
+
+        Returns the shortest mating line as a list of moves, with the
+        longest defence, or ``None`` if there is no mate in *n*.
+        """
+        board = board.copy()
+        for depth in range(1, n + 1):
+            if self._attack(board, depth):
+                return self._mating_line(board, depth)
+        return None
+
+    def _attacker_moves(self, board, n):
+        checks = list(board.generate_legal_checks())
+        if self.checks_only or (n == 1 and board.uci_variant == "chess"):
+            # In standard chess, only checking moves can mate.
+            return checks
+
+        seen = set(checks)
+        return checks + [move for move in board.generate_legal_moves() if move not in seen]
+
+    def _is_won(self, board):
+        # The side to move has lost.
+        if board.is_variant_end():
+            return board.is_variant_loss()
+        return board.is_checkmate()
+
+    def _attack(self, board, n):
+        key = board._transposition_key()
+        fail_depth, mate_in, best_move = self.tt.get(key, (0, None, None))
+        if mate_in is not None and mate_in <= n:
+            return True
+        if fail_depth >= n or board.is_variant_end():
+            return False
+
+        for move in self._attacker_moves(board, n):
+            self.nodes += 1
+            board.push(move)
+            try:
+                if n == 1:
+                    mates = self._is_won(board)
+                else:
+                    mates = self._defend(board, n)
+            finally:
+                board.pop()
+
+            if mates:
+                self.tt[key] = (fail_depth, n, move)
+                return True
+
+        self.tt[key] = (n, None, None)
+        return False
+
+    def _defend(self, board, n):
+        if board.is_variant_end():
+            return board.is_variant_loss()
+
+        moves = list(board.generate_legal_moves())
+        if not moves:
+            return board.is_check()
+
+        for move in moves:
+            self.nodes += 1
+            board.push(move)
+            try:
+                if not self._attack(board, n - 1):
+                    return False
+            finally:
+                board.pop()
+
+        return True
+
+    def _mating_line(self, board, n):
+        line = []
+
+        while True:
+            # Find the shortest mate from here.
+            for depth in range(1, n + 1):
+                if self._attack(board, depth):
+                    break
+            _, n, move = self.tt[board._transposition_key()]
+            line.append(move)
+            board.push(move)
+
+            if n == 1 or self._is_won(board):
+                return line
+
+            # Play the defence that delays the mate the longest.
+            longest = None
+            for reply in board.generate_legal_moves():
+                board.push(reply)
+                for depth in range(1, n):
+                    if self._attack(board, depth):
+                        break
+                board.pop()
+                if longest is None or depth > longest[0]:
+                    longest = depth, reply
+
+            line.append(longest[1])
+            board.push(longest[1])
+            n = longest[0]
+
+
+def find_mate(board, n, *, checks_only=False):
+    """
+    Searches a forced mate in at most *n* moves for the side to move with a
+    new :class:`~chess.search.MateSolver`.
+
+    >>> import chess
+    >>> import chess.search
+    >>>
+    >>> board = chess.Board("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1")
+    >>> board.variation_san(chess.search.find_mate(board, 2))
+    '1. Nf6+ gxf6 2. Bxf7#'
+    """
+    return MateSolver(checks_only=checks_only).solve(board, n)
+
+
+def find_mates(boards, n, *, checks_only=False, processes=None, chunksize=16):
+    """
+    Searches forced mates in at most *n* moves for many positions, using a
+    pool of *processes* (defaults to the number of CPUs).
+
+    Yields the results of :func:`~chess.search.find_mate()` in the order of
+    the given boards. Boards are pickled to the worker processes, so
+    consider passing copies without move stacks.
+
+    With *processes* set to ``1``, positions are solved in the current
+    process.
+    """
+    solve = functools.partial(find_mate, n=n, checks_only=checks_only)
+
+    if processes == 1:
+        for board in boards:
+            yield solve(board)
+        return
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(solve, boards, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
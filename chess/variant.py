@@ -54,6 +54,9 @@ class SuicideBoard(chess.Board):
     def is_into_check(self, move):
         return False
 
+    def generate_legal_checks(self, from_mask=chess.BB_ALL, to_mask=chess.BB_ALL):
+        return iter([])
+
     def was_into_check(self):
         return False
 
@@ -294,6 +297,18 @@ class AtomicBoard(chess.Board):
         self.pop()
         return was_into_check
 
+    def _gives_check(self, move):
+        self.push(move)
+        gives_check = self.is_check()
+        self.pop()
+        return gives_check
+
+    def generate_legal_checks(self, from_mask=chess.BB_ALL, to_mask=chess.BB_ALL):
+        # Explosions can uncover checks anywhere.
+        for move in self.generate_legal_moves(from_mask, to_mask):
+            if self._gives_check(move):
+                yield move
+
     def is_legal(self, move):
         if self.is_variant_end():
             return False
@@ -372,11 +387,18 @@ class RacingKingsBoard(chess.Board):
     def is_legal(self, move):
         return super().is_legal(move) and not self._gives_check(move)
 
+    def _symmetries(self):
+        # The goal is to reach the 8th rank.
+        return [chess._identity, chess.flip_horizontal]
+
     def generate_legal_moves(self, from_mask=chess.BB_ALL, to_mask=chess.BB_ALL):
         for move in super().generate_legal_moves(from_mask, to_mask):
             if not self._gives_check(move):
                 yield move
 
+    def generate_legal_checks(self, from_mask=chess.BB_ALL, to_mask=chess.BB_ALL):
+        return iter([])
+
     def is_variant_end(self):
         if not self.kings & chess.BB_RANK_8:
             return False
@@ -772,6 +794,11 @@ class CrazyhouseBoard(chess.Board):
             super().generate_legal_moves(from_mask, to_mask),
             self.generate_legal_drops(from_mask & to_mask))
 
+    def generate_legal_checks(self, from_mask=chess.BB_ALL, to_mask=chess.BB_ALL):
+        return itertools.chain(
+            super().generate_legal_checks(from_mask, to_mask),
+            (move for move in self.generate_legal_drops(from_mask & to_mask) if self._gives_check(move)))
+
     def parse_san(self, san):
         if "@" in san:
             uci = san.rstrip("+# ")
@@ -840,6 +867,13 @@ class CrazyhouseBoard(chess.Board):
         board.pockets[chess.BLACK] = self.pockets[chess.WHITE].copy()
         return board
 
+    def _symmetries(self):
+        if self.pockets[chess.WHITE].count(chess.PAWN) or self.pockets[chess.BLACK].count(chess.PAWN):
+            # Pawns can be dropped.
+            return [chess._identity, chess.flip_horizontal]
+        else:
+            return super()._symmetries()
+
     def root(self):
         board = super().root()
         if self._stack:
@@ -21,22 +21,30 @@ import asyncio
 import collections
 import copy
 import contextlib
+import gzip
 import logging
+import operator
 import os
 import os.path
+import pickle
 import platform
 import sys
 import tempfile
 import textwrap
 import threading
 import unittest
+import unittest.mock
+import warnings
+import weakref
 import io
 
 import chess
 import chess.gaviota
+import chess.instrumentation
 import chess.engine
 import chess.pgn
 import chess.polyglot
+import chess.search
 import chess.svg
 import chess.syzygy
 import chess.uci
@@ -259,6 +267,61 @@ class BoardTestCase(unittest.TestCase):
         board = chess.Board(fen)
         self.assertEqual(board.fen(), "1r6/8/8/pP6/8/8/8/1K6 w - - 0 1")
 
+    def test_fen_cache(self):
+        fen = "r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4"
+        try:
+            for size in [0, 1, 1024]:
+                chess.set_fen_cache_size(size)
+                for _ in range(2):
+                    board = chess.Board(fen)
+                    self.assertEqual(board.fen(), fen)
+                    self.assertEqual(board.piece_at(chess.F7), chess.Piece.from_symbol("Q"))
+                    self.assertTrue(board.is_checkmate())
+
+                    # Boards do not share state through the cache.
+                    board.remove_piece_at(chess.F7)
+                    self.assertEqual(chess.Board(fen).piece_at(chess.F7), chess.Piece.from_symbol("Q"))
+
+                with self.assertRaises(ValueError):
+                    chess.Board("r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1N w KQkq - 0 4")
+        finally:
+            chess.set_fen_cache_size(1024)
+
+    def test_fen_cache_threads(self):
+        boards = [chess.Board()]
+        for san in ["e4", "e5", "Nf3", "Nc6", "Bb5"]:
+            boards.append(boards[-1].copy())
+            boards[-1].push_san(san)
+        fens = [board.board_fen() for board in boards]
+        errors = []
+
+        def parse():
+            try:
+                for i in range(2000):
+                    fen = fens[i % len(fens)]
+                    if chess.BaseBoard(fen).board_fen() != fen:
+                        errors.append(fen)
+            except Exception as error:
+                errors.append(error)
+
+        try:
+            chess.set_fen_cache_size(2)
+            threads = [threading.Thread(target=parse) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            chess.set_fen_cache_size(1024)
+
+        self.assertEqual(errors, [])
+
+    def test_board_fen_promoted(self):
+        board = chess.BaseBoard("4k3/8/8/8/8/8/8/Q~3K2R~")
+        self.assertEqual(board.promoted, chess.BB_A1 | chess.BB_H1)
+        self.assertEqual(board.board_fen(), "4k3/8/8/8/8/8/8/Q3K2R")
+        self.assertEqual(board.board_fen(promoted=True), "4k3/8/8/8/8/8/8/Q~3K2R~")
+
     def test_fen_en_passant(self):
         board = chess.Board()
         board.push_san("e4")
@@ -1448,6 +1511,54 @@ class BoardTestCase(unittest.TestCase):
         self.assertIn(chess.Move.from_uci("c2d3"), plc)
         self.assertEqual(len(plc), 5)
 
+    def test_check_generation(self):
+        board = chess.Board("5k2/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+        checks = set(board.generate_legal_checks())
+        self.assertEqual(checks, set(board.parse_san(san) for san in ["O-O", "Ra8", "Rf1", "Rh8"]))
+
+        # Discovered check by en passant.
+        board = chess.Board("8/2P5/8/k2pP2R/8/8/8/4K2B w - d6 0 1")
+        self.assertEqual(list(board.generate_legal_checks()), [board.parse_san("exd6")])
+
+        # Promotions.
+        board = chess.Board("2k5/P7/8/8/8/8/8/4K3 w - - 0 1")
+        checks = set(board.generate_legal_checks())
+        self.assertEqual(checks, set(board.parse_san(san) for san in ["a8=Q", "a8=R"]))
+
+        # Masks and positions in check.
+        board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 2 3")
+        self.assertEqual(set(board.generate_legal_checks(from_mask=chess.BB_C4)), set([board.parse_san("Bxf7+")]))
+        self.assertEqual(set(board.generate_legal_checks(to_mask=chess.BB_F7)), set([board.parse_san("Bxf7+"), board.parse_san("Qxf7#")]))
+        board.push_san("Qxf7#")
+        self.assertEqual(list(board.generate_legal_checks()), [])
+
+        # Compare with playing out all moves.
+        for fen in [chess.STARTING_FEN,
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"]:
+            board = chess.Board(fen)
+            for move in board.legal_moves:
+                board.push(move)
+                checks = set(board.generate_legal_checks())
+                for reply in board.legal_moves:
+                    board.push(reply)
+                    gives_check = board.is_check()
+                    board.pop()
+                    self.assertEqual(reply in checks, gives_check, board.fen())
+                board.pop()
+
+    def test_quiet_generation(self):
+        board = chess.Board("3q1rk1/ppp1p1pp/4b3/3pPp2/3P4/1K1n4/PPQ2PPP/3b1BNR w - f6 0 1")
+        quiets = set(board.generate_legal_quiets())
+        captures = set(board.generate_legal_captures())
+        self.assertFalse(quiets & captures)
+        self.assertEqual(quiets | captures, set(board.legal_moves))
+
+        board = chess.Board("2k5/P7/8/8/8/8/8/4K3 w - - 0 1")
+        self.assertEqual(set(board.generate_legal_quiets()), set(board.generate_legal_moves(chess.BB_E1)))
+
     def test_from_chess960_pos(self):
         board = chess.Board.from_chess960_pos(909)
         self.assertTrue(board.chess960)
@@ -1458,6 +1569,44 @@ class BoardTestCase(unittest.TestCase):
         mirrored = chess.Board("r1b1k2r/pp3pp1/2n5/1B1N2q1/3PpPPp/4n2K/PP2N3/R1BQ1R2 b kq g3 0 15")
         self.assertEqual(board.mirror(), mirrored)
 
+    def test_canonical_transform(self):
+        board = chess.Board("8/8/8/8/8/2k5/1q6/K7 w - - 0 1")
+        keys = set()
+        for f in [chess.flip_vertical, chess.flip_horizontal, chess.flip_diagonal, chess.flip_anti_diagonal,
+                  chess.rotate_clockwise, chess.rotate_counterclockwise, chess.rotate_180]:
+            transformed = board.transform(f)
+            keys.add(transformed.canonical_transform()[1])
+            transform, key = transformed.canonical_transform()
+            self.assertEqual(transformed.transform(transform)._transposition_key(), key)
+        self.assertEqual(keys, set([board.canonical_transform()[1]]))
+
+        # Side to move matters.
+        board.turn = chess.BLACK
+        self.assertNotIn(board.canonical_transform()[1], keys)
+
+        # Pawns only allow mirroring the files.
+        board = chess.Board("8/8/8/8/8/2k5/1p6/K7 w - - 0 1")
+        self.assertEqual(board.canonical_transform()[1], board.transform(chess.flip_horizontal).canonical_transform()[1])
+        self.assertNotEqual(board.canonical_transform()[1], board.transform(chess.flip_vertical).canonical_transform()[1])
+
+        # No symmetries with castling rights.
+        board = chess.Board()
+        self.assertEqual(board.canonical_transform()[1], board._transposition_key())
+
+    def test_canonical_transforms(self):
+        boards = [
+            chess.Board("8/8/8/8/8/2k5/1q6/K7 w - - 0 1"),
+            chess.Board("K7/1q6/2k5/8/8/8/8/8 w - - 0 1"),
+            chess.Board("7K/6q1/5k2/8/8/8/8/8 w - - 0 1"),
+            chess.Board("8/8/8/8/8/2k5/1q6/K7 w - - 0 1"),
+            chess.Board(),
+        ]
+        results = chess.canonical_transforms(boards)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(set(key for _, key in results)), 2)
+        for board, (f, key) in zip(boards, results):
+            self.assertEqual((f, key), board.canonical_transform())
+
     def test_chess960_pos(self):
         board = chess.Board()
 
@@ -1679,6 +1828,16 @@ class SquareSetTestCase(unittest.TestCase):
         self.assertEqual(chess.flip_diagonal(s), 0x000061928c88ff00)
         self.assertEqual(chess.flip_anti_diagonal(s), 0x00ff113149860000)
 
+    def test_rotate(self):
+        self.assertEqual(chess.rotate_clockwise(chess.BB_A8), chess.BB_H8)
+        self.assertEqual(chess.rotate_clockwise(chess.BB_FILE_A), chess.BB_RANK_8)
+        self.assertEqual(chess.rotate_counterclockwise(chess.BB_A8), chess.BB_A1)
+        self.assertEqual(chess.rotate_180(chess.BB_B1), chess.BB_G8)
+
+        s = chess.SquareSet(0x1e2222120e0a1222)  # Letter R
+        self.assertEqual(chess.rotate_counterclockwise(chess.rotate_clockwise(s)), s)
+        self.assertEqual(chess.rotate_clockwise(chess.rotate_clockwise(s)), chess.rotate_180(s))
+
     def test_len_of_complenent(self):
         squares = chess.SquareSet(~chess.BB_ALL)
         self.assertEqual(len(squares), 0)
@@ -1695,6 +1854,75 @@ class SquareSetTestCase(unittest.TestCase):
         self.assertEqual(chess.SquareSet(chess.BB_LIGHT_SQUARES).tolist().count(True), 32)
 
 
+class InstrumentationTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        chess.instrumentation.disable()
+        chess.instrumentation.reset()
+
+    def test_counts(self):
+        original_push = chess.Board.push
+
+        with chess.instrumentation.instrumented():
+            self.assertTrue(chess.instrumentation.is_enabled())
+            self.assertNotEqual(chess.Board.push, original_push)
+
+            board = chess.Board()
+            board.push_san("e4")
+            board.pop()
+            board.copy()
+            self.assertEqual(chess.instrumentation.snapshot()["push"].calls, 1)
+
+            # Tries all legal moves.
+            board.can_claim_threefold_repetition()
+
+        self.assertFalse(chess.instrumentation.is_enabled())
+        self.assertIs(chess.Board.push, original_push)
+
+        stats = chess.instrumentation.snapshot()
+        self.assertEqual(stats["parse_san"], (1, None))
+        self.assertEqual(stats["push"].calls, 21)
+        self.assertEqual(stats["pop"].calls, 21)
+        self.assertEqual(stats["copy"].calls, 1)
+        self.assertEqual(stats["can_claim_threefold_repetition"].calls, 1)
+        self.assertEqual(stats["generate_legal_moves"].calls, 2)
+        self.assertEqual(stats["san"].calls, 0)
+
+        chess.instrumentation.reset()
+        self.assertEqual(chess.instrumentation.snapshot()["push"].calls, 0)
+
+    def test_timing(self):
+        with chess.instrumentation.instrumented(timing=True):
+            board = chess.Board()
+            self.assertEqual(len(list(board.generate_legal_moves())), 20)
+            board.san(chess.Move.from_uci("g1f3"))
+
+        stats = chess.instrumentation.snapshot()
+        self.assertEqual(stats["san"].calls, 1)
+        self.assertEqual(stats["push"].calls, 1)
+        self.assertGreater(stats["san"].time, 0.0)
+        self.assertGreater(stats["generate_legal_moves"].time, 0.0)
+        self.assertEqual(stats["copy"].time, 0.0)
+
+    def test_variant_super_calls(self):
+        with chess.instrumentation.instrumented(timing=True):
+            board = chess.variant.ThreeCheckBoard()
+            board.push_san("e4")
+            board.pop()
+
+            stats = chess.instrumentation.snapshot()
+            self.assertEqual(stats["push"].calls, 1)
+            self.assertEqual(stats["pop"].calls, 1)
+
+            # Tries all moves to exclude checks.
+            board = chess.variant.RacingKingsBoard()
+            self.assertEqual(len(list(board.generate_legal_moves())), 21)
+
+        stats = chess.instrumentation.snapshot()
+        self.assertEqual(stats["generate_legal_moves"].calls, 2)
+        self.assertEqual(stats["push"].calls, stats["pop"].calls)
+
+
 class PolyglotTestCase(unittest.TestCase):
 
     def test_performance_bin(self):
@@ -1822,6 +2050,95 @@ class PolyglotTestCase(unittest.TestCase):
             with self.assertRaises(IndexError):
                 book.find(chess.Board(), minimum_weight=2)
 
+    def test_encode_move(self):
+        for board in [chess.Board(), chess.Board("r3k2r/pP3ppp/8/8/8/8/PPP2PpP/R3K2R w KQkq - 0 1"),
+                      chess.Board("1r2k1r1/8/8/8/8/8/8/1R2K1R1 w GBgb - 0 1", chess960=True)]:
+            for move in board.legal_moves:
+                entry = chess.polyglot.Entry(0, chess.polyglot._encode_move(board, move), 1, 0)
+                self.assertEqual(entry.move(chess960=board.chess960), move)
+
+        # Drops can not be encoded.
+        board = chess.variant.CrazyhouseBoard("4k3/8/8/8/8/8/8/4K3[P] w - - 0 1")
+        with self.assertRaises(ValueError):
+            chess.polyglot._encode_move(board, chess.Move.from_uci("P@e4"))
+        with chess.polyglot.BookBuilder() as builder:
+            with self.assertRaises(ValueError):
+                builder.add(board, chess.Move.from_uci("P@e4"))
+
+            game = chess.pgn.Game.from_board(board)
+            game.headers["Result"] = "1-0"
+            game.add_main_variation(chess.Move.from_uci("e1e2")).add_main_variation(chess.Move.from_uci("e8e7")).add_main_variation(chess.Move.from_uci("P@e4"))
+            builder.add_game(game)
+            self.assertEqual(len(builder.buffer), 2)
+
+    def test_book_builder(self):
+        board = chess.Board()
+        e4, d4 = chess.Move.from_uci("e2e4"), chess.Move.from_uci("d2d4")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "book.bin")
+
+            # Spill every entry to a temporary file.
+            with chess.polyglot.BookBuilder(max_buffered=1, tmpdir=tmpdir) as builder:
+                builder.add(board, e4, 2)
+                builder.add(board, d4, 0)
+                builder.add(board, d4, 3)
+                builder.add(board, e4, 2)
+                builder.add(board, chess.Move.from_uci("c2c4"), 0)
+                self.assertEqual(len(builder.runs), 5)
+                self.assertEqual(builder.write(path), 2)
+
+                with self.assertRaises(ValueError):
+                    builder.add(board, e4, -1)
+
+            with chess.polyglot.open_reader(path) as reader:
+                self.assertEqual([(entry.move(), entry.weight) for entry in reader], [(e4, 4), (d4, 3)])
+
+            # Normalize weights.
+            with chess.polyglot.BookBuilder() as builder:
+                builder.add(board, e4, 0x20000)
+                builder.add(board, d4, 1)
+                builder.write(path)
+
+            with chess.polyglot.open_reader(path) as reader:
+                self.assertEqual([(entry.move(), entry.weight) for entry in reader], [(e4, 0xffff), (d4, 1)])
+
+            # Games.
+            with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+                games = list(chess.pgn.read_games(pgn))
+
+            with chess.polyglot.BookBuilder() as builder:
+                for game in games:
+                    builder.add_game(game, max_ply=2)
+                builder.write(path)
+
+            with chess.polyglot.open_reader(path) as reader:
+                self.assertEqual([(str(entry.move()), entry.weight) for entry in reader.find_all(board)], [("e2e4", 5), ("g1f3", 3), ("d2d3", 1)])
+
+    def test_merge_books(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "merged.bin")
+            with chess.polyglot.open_reader("data/polyglot/performance.bin") as book:
+                entries = len(list(book))
+            self.assertEqual(chess.polyglot.merge_books(["data/polyglot/performance.bin"] * 2, path), entries)
+
+            with chess.polyglot.open_reader("data/polyglot/performance.bin") as book, chess.polyglot.open_reader(path) as merged:
+                self.assertEqual(set(merged), set(entry._replace(weight=2 * entry.weight, learn=0) for entry in book))
+
+            # Merge into one of the merged books.
+            chess.polyglot.merge_books([path, "data/polyglot/performance.bin"], path)
+            with chess.polyglot.open_reader("data/polyglot/performance.bin") as book, chess.polyglot.open_reader(path) as merged:
+                self.assertEqual(set(merged), set(entry._replace(weight=3 * entry.weight, learn=0) for entry in book))
+            self.assertEqual(os.listdir(tmpdir), ["merged.bin"])
+
+            # Missing books.
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(OSError):
+                    chess.polyglot.merge_books([path, os.path.join(tmpdir, "missing.bin")], os.path.join(tmpdir, "out.bin"))
+            self.assertEqual([warning for warning in caught if issubclass(warning.category, ResourceWarning)], [])
+            self.assertEqual(os.listdir(tmpdir), ["merged.bin"])
+
 
 class PgnTestCase(unittest.TestCase):
 
@@ -1881,6 +2198,28 @@ class PgnTestCase(unittest.TestCase):
         game.accept(exporter)
         self.assertEqual(virtual_file.getvalue(), pgn + "\n\n")
 
+    def test_export_games(self):
+        games = []
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            games.extend(chess.pgn.read_games(pgn))
+        with open("data/pgn/saturs-jannlee-zh-lichess.pgn") as pgn:
+            games.extend(chess.pgn.read_games(pgn))
+        game = chess.pgn.Game()
+        game.setup("4k3/8/8/8/8/8/8/R3K3 b Q - 0 1")
+        game.add_line([chess.Move.from_uci("e8d7"), chess.Move.from_uci("e1c1")])
+        game.add_variation(chess.Move.from_uci("e8f7")).starting_comment = "Or"
+        games.append(game)
+
+        for options in [{}, {"columns": None}, {"columns": 30, "headers": False}, {"comments": False}, {"variations": False}]:
+            expected = io.StringIO()
+            exporter = chess.pgn.FileExporter(expected, **options)
+            for game in games:
+                game.accept(exporter)
+
+            exported = io.StringIO()
+            chess.pgn.export_games(games, exported, buffer_size=1000, **options)
+            self.assertEqual(exported.getvalue(), expected.getvalue())
+
     def test_game_without_tag_roster(self):
         game = chess.pgn.Game.without_tag_roster()
         self.assertEqual(str(game), "*")
@@ -2230,6 +2569,911 @@ class PgnTestCase(unittest.TestCase):
             self.assertEqual(first_drawn_game.headers["Site"], "03")
             self.assertEqual(first_drawn_game[0].move, chess.Move.from_uci("d2d3"))
 
+    def test_scan_headers(self):
+        tricky = textwrap.dedent("""\
+            [Event "A"]
+
+            1. a3 ; { ; }
+
+            [Event "B"]
+            1. b3 { ;
+
+            % {
+            1... g6 ; {
+
+            1. c3 { }
+            % {
+            1... f6 ; { } {{{
+
+
+            [Event "C"]
+
+            1. d3 { multi
+
+            line } d6 } { {
+
+
+            1. e3 { unterminated
+
+            """)
+
+        commands = textwrap.dedent("""\
+            [Event "D"]
+
+            1. e4 { [%clk 0:01:00] } e5 { [%eval 0.17] [%clk 0:00:59] { }
+
+            [Event "E"]
+
+            1. d4 { [%clk 0:01:00] } d5 }
+            % {
+            2. c4 { 50% }
+
+            [Event "F"]
+
+            % {
+            1. c4 *
+
+            """)
+
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            kasparov = pgn.read()
+
+        for text in [tricky, commands, kasparov]:
+            pgn = io.StringIO(text)
+            expected = []
+            while True:
+                offset = pgn.tell()
+                headers = chess.pgn.read_headers(pgn)
+                if headers is None:
+                    break
+                expected.append((offset, dict(headers)))
+
+            for block_size in [1, 7, 100, 1 << 20]:
+                scanned = chess.pgn.scan_headers(io.BytesIO(text.encode("utf-8")), block_size=block_size)
+                self.assertEqual([(offset, dict(headers)) for offset, headers in scanned], expected)
+
+        self.assertEqual(list(chess.pgn.scan_headers(io.BytesIO(b""))), [])
+
+    def test_index_games(self):
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            index = chess.pgn.index_games(pgn, tags=["Site", "Result"])
+            self.assertEqual(len(index), 6)
+            self.assertEqual(index[2].headers, {"Site": "03", "Result": "1/2-1/2"})
+
+            game = index.read_game(pgn, 2)
+            self.assertEqual(game.headers["Site"], "03")
+            self.assertEqual(game[0].move, chess.Move.from_uci("d2d3"))
+
+            game = index.read_game(pgn, -1)
+            self.assertEqual(game.headers["Site"], "06")
+
+            headers = index.read_game(pgn, 0, Visitor=chess.pgn.HeaderCreator)
+            self.assertEqual(headers["Site"], "01")
+
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            index = chess.pgn.index_games(pgn, tags=None)
+            self.assertEqual(index[5].headers["Black"], "Garry Kasparov")
+
+    def test_open_index(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "games.pgn")
+            with open(path, "w") as pgn:
+                pgn.write("[Event \"A\"]\n\n1. e4 e5 *\n\n[Event \"B\"]\n\n1. d4 d5 *\n")
+
+            index = chess.pgn.open_index(path, tags=["Event"])
+            self.assertTrue(os.path.exists(path + ".idx"))
+            self.assertEqual([entry.headers["Event"] for entry in index], ["A", "B"])
+            with open(path) as pgn:
+                self.assertEqual(index.read_game(pgn, 1)[0].move, chess.Move.from_uci("d2d4"))
+
+            # Reuse the sidecar.
+            reused = chess.pgn.open_index(path, tags=["Event"])
+            self.assertEqual(list(reused), list(index))
+            self.assertTrue(reused.matches(path))
+
+            # Rebuild for different tags.
+            rebuilt = chess.pgn.open_index(path, tags=["Event", "Result"])
+            self.assertEqual(rebuilt.tags, ["Event", "Result"])
+            self.assertEqual(rebuilt[0].headers, {"Event": "A"})
+
+            # Rebuild when the file changes.
+            with open(path, "a") as pgn:
+                pgn.write("\n[Event \"C\"]\n\n1. c4 *\n")
+            self.assertFalse(rebuilt.matches(path))
+            index = chess.pgn.open_index(path, tags=["Event", "Result"])
+            self.assertEqual([entry.headers["Event"] for entry in index], ["A", "B", "C"])
+
+            # Rebuild corrupt sidecars.
+            with open(path + ".idx", "w") as sidecar:
+                sidecar.write("{\"version\": 1}")
+            with self.assertRaises(ValueError):
+                chess.pgn.GameIndex.load(path + ".idx")
+            self.assertEqual(len(chess.pgn.open_index(path, tags=["Event", "Result"])), 3)
+
+            # Offsets are valid for chess.pgn.open() with the same default
+            # encoding, even with a byte order mark.
+            with open(path, "w", encoding="utf-8-sig") as pgn:
+                pgn.write("[Event \"Café\"]\n\n1. e4 e5 *\n\n[Event \"B\"]\n\n1. d4 d5 *\n")
+            index = chess.pgn.open_index(path)
+            with chess.pgn.open(path) as pgn:
+                self.assertEqual(index.read_game(pgn, 0).headers["Event"], "Café")
+                self.assertEqual(index.read_game(pgn, 1)[0].move, chess.Move.from_uci("d2d4"))
+
+    def test_position_index(self):
+        pgn = io.StringIO(textwrap.dedent("""\
+            [Event "A"]
+
+            1. e4 e5 2. Nf3 Nc6 *
+
+            [Event "B"]
+
+            1. Nf3 (1. e4) 1... Nc6 2. e4 e5 *
+
+            [Event "C"]
+            [FEN "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1"]
+
+            1. e4 *
+
+            """))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "games.pos")
+            self.assertEqual(chess.pgn.index_positions(pgn, path), 5 + 5 + 2)
+
+            with chess.pgn.open_position_index(path) as index:
+                self.assertEqual(len(index), 12)
+                self.assertEqual(index[-1], index[11])
+                keys = [index[i].key for i in range(len(index))]
+                self.assertEqual(keys, sorted(keys))
+
+                offset_a, offset_b = 0, pgn.getvalue().index("[Event \"B\"]")
+                self.assertEqual([(entry.offset, entry.ply) for entry in index.find_all(chess.Board())], [(offset_a, 0), (offset_b, 0)])
+
+                # Transposition.
+                board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+                self.assertEqual([(entry.offset, entry.ply) for entry in index.find_all(board)], [(offset_a, 4), (offset_b, 4)])
+                self.assertEqual(index.offsets(chess.polyglot.zobrist_hash(board)), [offset_a, offset_b])
+                pgn.seek(index.offsets(board)[1])
+                self.assertEqual(chess.pgn.read_game(pgn).headers["Event"], "B")
+
+                # Variations are not indexed.
+                board = chess.Board()
+                board.push_san("e4")
+                self.assertEqual(index.offsets(board), [offset_a])
+
+                self.assertEqual(index.offsets(chess.Board("4k3/8/8/8/4P3/8/8/4K3 b - - 0 1")), [pgn.getvalue().index("[Event \"C\"]")])
+                self.assertEqual(index.offsets(chess.Board(None)), [])
+
+            # Spill sorted runs into temporary files.
+            spilled_path = os.path.join(tmpdir, "spilled.pos")
+            pgn.seek(0)
+            self.assertEqual(chess.pgn.index_positions(pgn, spilled_path, max_buffered=4, tmpdir=tmpdir), 12)
+            with open(path, "rb") as index, open(spilled_path, "rb") as spilled:
+                self.assertEqual(spilled.read(), index.read())
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["games.pos", "spilled.pos"])
+
+            path = os.path.join(tmpdir, "empty.pos")
+            self.assertEqual(chess.pgn.index_positions(io.StringIO(""), path), 0)
+            with chess.pgn.open_position_index(path) as index:
+                self.assertEqual(len(index), 0)
+                self.assertEqual(list(index.find_all(chess.Board())), [])
+
+    def test_opening_statistics(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "games.pgn")
+            with open(path, "w") as f:
+                f.write(textwrap.dedent("""\
+                    [Result "1-0"]
+
+                    1. e4 e5 2. Nf3 Nc6 3. Bc4 Nf6 4. O-O 1-0
+
+                    [Result "0-1"]
+
+                    1. e4 (1. d4) 1... e5 2. Nf3 Nf6 0-1
+
+                    [Result "*"]
+
+                    1. e4 *
+
+                    [Result "1/2-1/2"]
+
+                    1. Nf3 Nc6 2. e4 e5 1/2-1/2
+
+                    """))
+
+            statistics = chess.pgn.collect_opening_statistics(path, processes=1)
+            self.assertEqual(len(statistics), 12)
+            self.assertEqual(len(chess.pgn.collect_opening_statistics(path, max_ply=1, processes=1)), 2)
+
+            # Merged results of multiple processes.
+            merged = chess.pgn.collect_opening_statistics(path, processes=2, chunk_size=1)
+            self.assertEqual(list(merged), list(statistics))
+
+            # Sorted runs of arrays.
+            runs = chess.pgn.OpeningStatistics(max_buffered=2)
+            for entry in statistics:
+                for outcome, count in enumerate([entry.wins, entry.draws, entry.losses]):
+                    if count:
+                        runs._add(entry.key, entry.raw_move, outcome, count)
+            self.assertGreater(len(runs.runs), 1)
+            self.assertEqual(list(runs), list(statistics))
+            runs.update(statistics)
+            self.assertEqual([entry.games() for entry in runs], [2 * entry.games() for entry in statistics])
+
+            # Crazyhouse games are counted up to the first drop.
+            zh_path = os.path.join(tmpdir, "zh.pgn")
+            with open(zh_path, "w") as f:
+                f.write(textwrap.dedent("""\
+                    [Variant "Crazyhouse"]
+                    [Result "1-0"]
+
+                    1. e4 d5 2. exd5 Qxd5 3. P@e4 Qe5 1-0
+
+                    """))
+            self.assertEqual(len(chess.pgn.collect_opening_statistics(zh_path, processes=1)), 4)
+
+            # Add single moves.
+            board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+            statistics.add(board, chess.Move.from_uci("e1g1"), "1/2-1/2")
+            with self.assertRaises(ValueError):
+                statistics.add(board, chess.Move.from_uci("e1g1"), "*")
+
+            path = os.path.join(tmpdir, "games.explorer")
+            statistics.save(path)
+            with chess.pgn.open_opening_explorer(path) as explorer:
+                self.assertEqual(len(explorer), 12)
+                self.assertEqual([(entry.move(), entry.wins, entry.draws, entry.losses) for entry in explorer.find_all(chess.Board())], [
+                    (chess.Move.from_uci("g1f3"), 0, 1, 0),
+                    (chess.Move.from_uci("e2e4"), 1, 0, 1),
+                ])
+
+                # Results from the perspective of black.
+                board = chess.Board()
+                board.push_san("e4")
+                entry, = explorer.find_all(board)
+                self.assertEqual((entry.move(), entry.wins, entry.draws, entry.losses), (chess.Move.from_uci("e7e5"), 1, 0, 1))
+
+                # Transposition.
+                board = chess.Board("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+                self.assertEqual([(str(entry.move()), entry.games()) for entry in explorer.find_all(board)], [("f1c4", 1)])
+
+                # Castling.
+                board = chess.Board("r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4")
+                entry, = explorer.find_all(board)
+                self.assertEqual((entry.raw_move, entry.wins, entry.draws), (chess.H1 | chess.E1 << 6, 1, 1))
+                self.assertEqual(entry.move(), chess.Move.from_uci("e1g1"))
+                self.assertEqual(list(explorer.find_all(chess.Board(None))), [])
+
+            path = os.path.join(tmpdir, "games.bin")
+            statistics.write_polyglot(path)
+            with chess.polyglot.open_reader(path) as reader:
+                self.assertEqual([(entry.move(), entry.weight) for entry in reader.find_all(chess.Board())], [
+                    (chess.Move.from_uci("e2e4"), 2),
+                    (chess.Move.from_uci("g1f3"), 1),
+                ])
+
+                # Moves that never scored are left out.
+                board = chess.Board("rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2")
+                self.assertEqual([entry.move() for entry in reader.find_all(board)], [chess.Move.from_uci("g8f6")])
+
+    def test_opening_statistics_weights(self):
+        statistics = chess.pgn.OpeningStatistics()
+        board = chess.Board()
+        statistics._add(chess.polyglot.zobrist_hash(board), chess.E4 | chess.E2 << 6, 0, 100000)
+        statistics._add(chess.polyglot.zobrist_hash(board), chess.D4 | chess.D2 << 6, 1, 100000)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "book.bin")
+            statistics.write_polyglot(path, minimum_games=2)
+            with chess.polyglot.open_reader(path) as reader:
+                self.assertEqual([(entry.move(), entry.weight) for entry in reader.find_all(board)], [
+                    (chess.Move.from_uci("e2e4"), 0xffff),
+                    (chess.Move.from_uci("d2d4"), 0xffff // 2),
+                ])
+
+    def test_open_compressed(self):
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            text = pgn.read()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ["games.pgn", "games.pgn.gz", "games.pgn.bz2", "games.pgn.xz"]:
+                path = os.path.join(tmpdir, name)
+                with chess.pgn.open(path, "w") as pgn:
+                    for _ in range(20):
+                        pgn.write(text)
+                        pgn.write("\n")
+
+                with chess.pgn.open(path) as pgn:
+                    games = 0
+                    while chess.pgn.read_headers(pgn):
+                        games += 1
+                self.assertEqual(games, 20 * 6, name)
+
+            # BGZF is readable as plain gzip.
+            path = os.path.join(tmpdir, "games.pgn.gz")
+            with gzip.open(path, "rt") as pgn:
+                self.assertEqual(pgn.read(), (text + "\n") * 20)
+
+            # And seekable when indexed.
+            index = chess.pgn.open_index(path)
+            self.assertEqual(len(index), 20 * 6)
+            with chess.pgn.open(path) as pgn:
+                for i in [119, 3, 64, 64, 0]:
+                    headers = index.read_game(pgn, i, Visitor=chess.pgn.HeaderCreator)
+                    self.assertEqual(headers["Site"], "0{}".format(i % 6 + 1))
+
+                pgn.seek(0, os.SEEK_END)
+                self.assertEqual(pgn.tell(), os.path.getsize(os.path.join(tmpdir, "games.pgn")))
+                self.assertEqual(pgn.read(), "")
+
+            # Plain gzip.
+            path = os.path.join(tmpdir, "plain.pgn.gz")
+            with gzip.open(path, "wt") as pgn:
+                pgn.write(text)
+            with chess.pgn.open(path) as pgn:
+                self.assertEqual(chess.pgn.read_game(pgn).headers["Site"], "01")
+
+            with chess.pgn.open(path, "rb") as pgn:
+                self.assertEqual(pgn.read(), text.encode("utf-8"))
+
+        with self.assertRaises(ValueError):
+            chess.pgn.open("data/pgn/kasparov-deep-blue-1997.pgn", "rx")
+
+    def test_async_game_reader(self):
+        pgn = textwrap.dedent("""\
+            % Escaped line
+
+            [Event "A"]
+            [Site "?"]
+
+            1. e4 { A comment
+
+            with an empty line } e5 ; { Not a comment
+            % 1. d4
+            2. Nf3 *
+
+
+            [Event "B"]
+            1. d4 d5 *
+            [Event "C"]
+
+            1. c4 1-0""")
+
+        expected = []
+        handle = io.StringIO(pgn)
+        while True:
+            game = chess.pgn.read_game(handle)
+            if game is None:
+                break
+            expected.append(str(game))
+
+        class ChunkedSource:
+            def __init__(self, data, chunk_size):
+                self.data = data
+                self.chunk_size = chunk_size
+
+            @asyncio.coroutine
+            def read(self, n):
+                data, self.data = self.data[:self.chunk_size], self.data[self.chunk_size:]
+                return data
+
+        @asyncio.coroutine
+        def main():
+            for source in [ChunkedSource(pgn.encode("utf-8"), 7), ChunkedSource(pgn.replace("\n", "\r\n").encode("utf-8"), 1), ChunkedSource(pgn, 100)]:
+                reader = chess.pgn.AsyncGameReader(source)
+                games = []
+                while True:
+                    game = yield from reader.next()
+                    if game is None:
+                        break
+                    games.append(str(game))
+                self.assertEqual(games, expected)
+
+            # From a stream, with a visitor.
+            stream = asyncio.StreamReader()
+            stream.feed_data(pgn.encode("utf-8"))
+            stream.feed_eof()
+            reader = chess.pgn.AsyncGameReader(stream, Visitor=chess.pgn.HeaderCreator)
+            headers = yield from reader.next()
+            self.assertEqual(headers["Event"], "A")
+
+            # Visitor results of None.
+            class NoneVisitor(chess.pgn.BaseVisitor):
+                def result(self):
+                    return None
+
+            reader = chess.pgn.AsyncGameReader(ChunkedSource(pgn, 7), Visitor=NoneVisitor)
+            end = object()
+            results = []
+            while True:
+                result = yield from reader.next(end)
+                if result is end:
+                    break
+                results.append(result)
+            self.assertEqual(results, [None] * 3)
+            self.assertIsNone((yield from reader.next()))
+
+        self.assertEqual(len(expected), 3)
+        with contextlib.closing(asyncio.new_event_loop()) as loop:
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(main())
+            finally:
+                asyncio.set_event_loop(None)
+
+    def test_game_follower(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "live.pgn")
+            follower = chess.pgn.GameFollower(path)
+            self.assertEqual(follower.poll(), [])
+
+            def append(text):
+                with open(path, "a") as f:
+                    f.write(text)
+
+            def poll():
+                return [(update.offset, len(list(update.game.mainline_moves())), update.finished) for update in follower.poll()]
+
+            append("[Event \"A\"]")
+            self.assertEqual(poll(), [])
+            append("\n\n1. e4 { blank\n\n")
+            self.assertEqual(poll(), [(0, 1, False)])
+            self.assertEqual(poll(), [])
+            append("line } e5 2. Nf3")
+            self.assertEqual(poll(), [])
+            append("\n")
+            self.assertEqual(poll(), [(0, 3, False)])
+
+            append("*\n\n[Event \"B\"]\n\n1. d4 *\n\n[Event \"C\"]\n")
+            offset_b = len("[Event \"A\"]\n\n1. e4 { blank\n\nline } e5 2. Nf3\n*\n\n")
+            offset_c = offset_b + len("[Event \"B\"]\n\n1. d4 *\n\n")
+            self.assertEqual(poll(), [(0, 3, True), (offset_b, 1, True), (offset_c, 0, False)])
+            self.assertEqual(follower.offset, offset_c)
+            self.assertEqual(poll(), [])
+
+            # The file is replaced.
+            with open(path, "w") as f:
+                f.write("1. c4 *\n\n")
+            self.assertEqual(poll(), [(0, 1, True)])
+            self.assertEqual(poll(), [])
+
+        follower = chess.pgn.GameFollower("data/pgn/kasparov-deep-blue-1997.pgn", Visitor=chess.pgn.HeaderCreator)
+        updates = follower.poll()
+        self.assertEqual([update.game["Site"] for update in updates], ["01", "02", "03", "04", "05", "06"])
+        self.assertEqual([update.finished for update in updates], [True] * 5 + [False])
+
+    def test_read_games_parallel(self):
+        for name in ["kasparov-deep-blue-1997.pgn", "cutechess-fischerrandom.pgn", "anastasian-lewis.pgn"]:
+            path = os.path.join("data", "pgn", name)
+            with open(path, encoding="utf-8-sig") as pgn:
+                expected = []
+                while True:
+                    game = chess.pgn.read_game(pgn)
+                    if game is None:
+                        break
+                    expected.append(str(game))
+
+            games = chess.pgn.read_games_parallel(path, processes=2, chunk_size=100, max_pending=2)
+            self.assertEqual([str(game) for game in games], expected)
+
+            games = chess.pgn.read_games_parallel(path, processes=2, chunk_size=100, ordered=False)
+            self.assertEqual(sorted(str(game) for game in games), sorted(expected))
+
+            games = chess.pgn.read_games_parallel(path, processes=1)
+            self.assertEqual([str(game) for game in games], expected)
+
+    def test_read_games_parallel_none_results(self):
+        moves = []
+
+        class MoveCounter(chess.pgn.BaseVisitor):
+            def visit_move(self, board, move):
+                moves.append(move)
+
+            def result(self):
+                return None
+
+        path = os.path.join("data", "pgn", "kasparov-deep-blue-1997.pgn")
+        self.assertEqual(list(chess.pgn.read_games_parallel(path, Visitor=MoveCounter, processes=1)), [None] * 6)
+        self.assertEqual(len(moves), 519)
+        self.assertEqual(chess.pgn.map_reduce_games(path, None, lambda count, result: count + 1, 0, Visitor=MoveCounter, processes=1), 6)
+
+    def test_map_reduce_games(self):
+        path = os.path.join("data", "pgn", "kasparov-deep-blue-1997.pgn")
+        expected = [headers["Site"] for headers in chess.pgn.read_games_parallel(path, Visitor=chess.pgn.HeaderCreator, processes=1)]
+        site = operator.itemgetter("Site")
+
+        def append(sites, value):
+            return sites + [value]
+
+        progress = []
+        sites = chess.pgn.map_reduce_games(path, site, append, [], Visitor=chess.pgn.HeaderCreator, processes=2, chunk_size=100,
+                                           progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(sites, expected)
+        self.assertEqual(len(progress), len(expected))
+        self.assertEqual(progress[-1], (os.path.getsize(path), os.path.getsize(path)))
+        self.assertEqual(progress, sorted(progress))
+
+        sites = chess.pgn.map_reduce_games(path, site, append, [], Visitor=chess.pgn.HeaderCreator, processes=2, chunk_size=100, ordered=False)
+        self.assertEqual(sorted(sites), expected)
+
+        plies = chess.pgn.map_reduce_games(path, None, lambda total, game: total + len(list(game.mainline_moves())), 0, processes=1)
+        self.assertEqual(plies, 525 - 6)
+
+    def test_game_node_containers(self):
+        game = chess.pgn.read_game(io.StringIO("1. e4 $1 e5 (1... c5) *"))
+
+        # Containers are only created when needed.
+        end = game.end()
+        self.assertIsNone(end._variations)
+        self.assertIsNone(end._nags)
+        self.assertTrue(end.is_end())
+        self.assertEqual(end.nags, set())
+        self.assertEqual(end.variations, [])
+        self.assertEqual(game.variations[0].nags, set([chess.pgn.NAG_GOOD_MOVE]))
+
+        node = end.add_variation(chess.Move.from_uci("g1f3"), nags=[chess.pgn.NAG_BLUNDER])
+        self.assertEqual(node.nags, set([chess.pgn.NAG_BLUNDER]))
+        self.assertEqual(str(game), "[Event \"?\"]\n[Site \"?\"]\n[Date \"????.??.??\"]\n[Round \"?\"]\n[White \"?\"]\n[Black \"?\"]\n[Result \"*\"]\n\n"
+                                    "1. e4 $1 e5 ( 1... c5 ) 2. Nf3 $4 *")
+
+        # Subclasses can still have additional attributes.
+        class AnnotatedGame(chess.pgn.Game):
+            pass
+
+        game = AnnotatedGame()
+        game.annotator = "Me"
+        game.add_variation(chess.Move.from_uci("e2e4"))
+        copied = copy.deepcopy(game)
+        self.assertEqual(copied.annotator, "Me")
+        self.assertEqual(copied.variations[0].move, chess.Move.from_uci("e2e4"))
+
+        # So can plain games and nodes.
+        game = chess.pgn.Game()
+        game.foo = 1
+        game.add_variation(chess.Move.from_uci("e2e4")).bar = 2
+        self.assertEqual(game.__dict__, {"foo": 1})
+        self.assertIs(weakref.ref(game)(), game)
+        copied = pickle.loads(pickle.dumps(game))
+        self.assertEqual(copied.foo, 1)
+        self.assertEqual(copied.variations[0].bar, 2)
+
+    def test_cursor(self):
+        game = chess.pgn.read_game(io.StringIO("1. e4 (1. d4 d5 (1... Nf6) 2. c4) 1... e5 2. Nf3 *"))
+
+        cursor = chess.pgn.Cursor(game)
+        walked = []
+        for node in cursor.walk():
+            self.assertIs(cursor.node, node)
+            self.assertEqual(cursor.board, node.board())
+            walked.append(node.san())
+        self.assertEqual(walked, ["e4", "e5", "Nf3", "d4", "d5", "c4", "Nf6"])
+        self.assertIs(cursor.node, game)
+        self.assertEqual(cursor.board, chess.Board())
+
+        self.assertEqual(cursor.down(chess.Move.from_uci("d2d4")).san(), "d4")
+        self.assertEqual(cursor.down(1).san(), "Nf6")
+        self.assertEqual(cursor.board.fen(), "rnbqkb1r/pppppppp/5n2/8/3P4/8/PPP1PPPP/RNBQKBNR w KQkq - 1 2")
+        self.assertEqual(cursor.up().san(), "d4")
+        self.assertEqual(cursor.board.fen(), "rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1")
+
+    def test_deep_game(self):
+        game = chess.pgn.Game()
+        node = game
+        for _ in range(1000):
+            for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+                node = node.add_variation(chess.Move.from_uci(uci))
+        node.parent.parent.add_variation(chess.Move.from_uci("e2e4"))
+
+        # Neither exporting nor computing positions is limited by the
+        # recursion limit.
+        self.assertEqual(node.board().fen(), "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4000 2001")
+        self.assertEqual(node.parent.parent.variations[1].board().fen(), "rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 0 2000")
+        self.assertTrue(str(game).endswith(" 2000. Ng1 ( 2000. e4 ) 2000... Ng8 *"))
+
+    def test_binary_game(self):
+        pgn = io.StringIO(textwrap.dedent("""\
+            [Event "Binary"]
+            [FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+
+            { Start } 1. a8=N $1 { Underpromotion } ( { Or } 1. a8=Q+ $18 Kd7 ( 1... Kf7 ) ) 1... Kd8 2. Kd1 $14 *
+
+            [Event "Drops"]
+            [Variant "Crazyhouse"]
+            [FEN "r1bqk2r/pppp1ppp/2n1p3/4P3/1b1Pn3/2NB1N2/PPP2PPP/R1BQK2R[] b KQkq - 0 1"]
+
+            1... Nxc3 2. bxc3 Bxc3+ 3. Bd2 Bxd2+ 4. Qxd2 N@f6 $2 1-0
+
+            """))
+        games = list(chess.pgn.read_games(pgn))
+
+        buffer = io.BytesIO()
+        exporter = chess.pgn.BinaryExporter(buffer)
+        for game in games:
+            game.accept(exporter)
+
+        buffer.seek(0)
+        for game in games:
+            self.assertEqual(str(chess.pgn.read_binary_game(buffer)), str(game))
+        self.assertIsNone(chess.pgn.read_binary_game(buffer))
+
+        # Visitors can skip variations.
+        class MainlineExporter(chess.pgn.StringExporter):
+            def begin_variation(self):
+                return chess.pgn.SKIP
+
+        buffer.seek(0)
+        self.assertEqual(chess.pgn.read_binary_game(buffer, Visitor=MainlineExporter),
+                         chess.pgn.read_game(io.StringIO(str(games[0])), Visitor=MainlineExporter))
+
+        # Comments that PGN can not tell apart.
+        game = chess.pgn.Game()
+        game.comment = "game"
+        e4 = game.add_variation(chess.Move.from_uci("e2e4"), starting_comment="before e4")
+        e5 = e4.add_variation(chess.Move.from_uci("e7e5"), starting_comment="start on mainline")
+        d5 = e4.add_variation(chess.Move.from_uci("d7d5"), starting_comment="start on sideline", comment=" spaced ")
+        nf3 = e5.add_variation(chess.Move.from_uci("g1f3"), comment="after", nags=[chess.pgn.NAG_GOOD_MOVE])
+        nf3.add_variation(chess.Move.from_uci("b8c6"), starting_comment="start after comment")
+        d5.add_variation(chess.Move.from_uci("e4d5"))
+
+        buffer = io.BytesIO()
+        game.accept(chess.pgn.BinaryExporter(buffer))
+        buffer.seek(0)
+        copy = chess.pgn.read_binary_game(buffer)
+
+        stack = [(game, copy)]
+        while stack:
+            node, copied = stack.pop()
+            self.assertEqual(copied.move, node.move)
+            self.assertEqual(copied.comment, node.comment)
+            self.assertEqual(copied.starting_comment, node.starting_comment)
+            self.assertEqual(copied.nags, node.nags)
+            self.assertEqual(len(copied.variations), len(node.variations))
+            stack.extend(zip(node.variations, copied.variations))
+
+        # Invalid data.
+        data = buffer.getvalue()
+        with self.assertRaises(ValueError):
+            chess.pgn.read_binary_game(io.BytesIO(data[:20]))
+        with self.assertRaises(ValueError):
+            chess.pgn.read_binary_game(io.BytesIO(b"\x01\xff"))
+        for data in [bytes([3, 0x85, 0x85, 0x85]), bytes([1, 0x10]), bytes([2, 0x80, 0x05]), bytes([2, 0x82, 0x80]),
+                     bytes([2, 0x81, 0x10]), bytes([3, 0x81, 0x40, 0x01]), bytes([3, 0x81, 0x10, 0x07]),
+                     bytes([2, 0x00, 0x0f]), bytes([1, 0x84]), bytes([3, 0x83, 0x05, 0x41])]:
+            with self.assertRaises(ValueError):
+                chess.pgn.read_binary_game(io.BytesIO(data))
+
+        # Corrupt moves: e2e5, e3e4 and e7e5.
+        self.assertEqual(chess.pgn.read_binary_game(io.BytesIO(bytes([2, 0x18, 0xe0]))).end().move, chess.Move.from_uci("e2e4"))
+        for data in [bytes([2, 0x19, 0x20]), bytes([2, 0x28, 0xe0]), bytes([2, 0x69, 0x20])]:
+            with self.assertRaises(ValueError):
+                chess.pgn.read_binary_game(io.BytesIO(data))
+
+    def test_pickle_game(self):
+        game = chess.pgn.Game()
+        game.headers["Event"] = "Pickle"
+        game.comment = "Start"
+        node = game
+        board = chess.Board()
+        for _ in range(1000):
+            move = next(iter(board.legal_moves))
+            node = node.add_variation(move, nags=[chess.pgn.NAG_GOOD_MOVE])
+            board.push(move)
+        game.variations[0].add_variation(chess.Move.from_uci("e7e5"), comment="Side")
+
+        copied = pickle.loads(pickle.dumps(game))
+        self.assertEqual(copied.headers["Event"], "Pickle")
+        self.assertEqual(copied.comment, "Start")
+        self.assertEqual(list(copied.mainline_moves()), list(game.mainline_moves()))
+        self.assertEqual(copied.end().nags, set([chess.pgn.NAG_GOOD_MOVE]))
+        self.assertEqual(copied.variations[0].variations[1].comment, "Side")
+        self.assertIs(copied.variations[0].parent, copied)
+
+    def test_read_games(self):
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            games = list(chess.pgn.read_games(pgn))
+        self.assertEqual([game.headers["Site"] for game in games], ["01", "02", "03", "04", "05", "06"])
+
+        class TraceVisitor(chess.pgn.GameCreator):
+            def visit_move(self, board, move):
+                self.game.headers["Traced"] = "1"
+                super().visit_move(board, move)
+
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            games = list(chess.pgn.read_games(pgn, Visitor=TraceVisitor, where=lambda headers: headers["Result"] == "1/2-1/2"))
+        self.assertEqual([game.headers["Site"] for game in games], ["03", "04", "05"])
+        self.assertTrue(all(game.headers["Traced"] == "1" for game in games))
+        self.assertEqual(str(games[0].end().board().peek()), "a3a6")
+
+        pgn = io.StringIO("[White \"A\"]\n\n1. e4 *\n\n[White \"B\"]\n\n1. d4 *\n\n")
+        headers = chess.pgn.read_games(pgn, Visitor=chess.pgn.HeaderCreator, where=lambda headers: headers["White"] == "B")
+        self.assertEqual([h["White"] for h in headers], ["B"])
+        self.assertEqual(list(chess.pgn.read_games(io.StringIO(""), where=lambda headers: True)), [])
+
+        # Missing tags default to the standard tag roster.
+        pgn = io.StringIO("[White \"A\"]\n\n1. e4 1-0\n\n[White \"B\"]\n[Result \"1-0\"]\n\n1. d4 1-0\n\n")
+        games = chess.pgn.read_games(pgn, where=lambda headers: headers["Result"] == "*" and headers["Event"] == "?")
+        self.assertEqual([game.headers["White"] for game in games], ["A"])
+
+        # Rejected games are not finished in the inner visitor.
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            boards = list(chess.pgn.read_games(pgn, Visitor=chess.pgn.BoardCreator, where=lambda headers: headers["Site"] == "03"))
+        self.assertEqual([board.fullmove_number for board in boards], [48])
+
+        # Visitor results of None.
+        class NoneVisitor(chess.pgn.BaseVisitor):
+            def result(self):
+                return None
+
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            self.assertEqual(list(chess.pgn.read_games(pgn, Visitor=NoneVisitor)), [None] * 6)
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            self.assertEqual(list(chess.pgn.read_games(pgn, Visitor=NoneVisitor, where=lambda headers: headers["Result"] == "1-0")), [None] * 3)
+
+    def test_read_games_mmap(self):
+        for name in ["kasparov-deep-blue-1997.pgn", "cutechess-fischerrandom.pgn", "stockfish-learning.pgn", "saturs-jannlee-zh-lichess.pgn"]:
+            path = os.path.join("data", "pgn", name)
+            with open(path, encoding="utf-8-sig") as pgn:
+                expected, sites = [], []
+                while True:
+                    game = chess.pgn.read_game(pgn)
+                    if game is None:
+                        break
+                    expected.append(str(game))
+                    sites.append(game.headers["Site"])
+
+            games = chess.pgn.read_games_mmap(path)
+            self.assertEqual([str(game) for game in games], expected)
+
+            headers = chess.pgn.read_games_mmap(path, Visitor=chess.pgn.HeaderCreator)
+            self.assertEqual([header["Site"] for header in headers], sites)
+
+            # Visitor results of None.
+            class NoneVisitor(chess.pgn.BaseVisitor):
+                def result(self):
+                    return None
+
+            self.assertEqual(list(chess.pgn.read_games_mmap(path, Visitor=NoneVisitor)), [None] * len(sites))
+
+    def test_read_games_mmap_edge_cases(self):
+        pgn = ("﻿[Event \"Café\"]\r\n\r\n1. e4 { multi  \r\n\r\n line } e5 ; rest e5\r\n%escaped d4\r\n"
+               "2. Nf3 (2. Nc3 (2. f4) Nf6) $1 !? 1-0\r\n\r\n; between\r\n1. d4 { unterminated\n\n")
+
+        class SkipVariations(chess.pgn.GameCreator):
+            def begin_variation(self):
+                return chess.pgn.SKIP
+
+            def end_variation(self):
+                pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "edge.pgn")
+            with open(path, "wb") as f:
+                f.write(pgn.encode("utf-8"))
+
+            first, second = chess.pgn.read_games_mmap(path)
+            self.assertEqual(first.headers["Event"], "Café")
+            self.assertEqual(first.variations[0].comment, "multi\n\n line")
+            self.assertEqual(str(first.end().board().peek()), "g1f3")
+            self.assertEqual(first.variations[0].variations[0].variations[1].move, chess.Move.from_uci("b1c3"))
+            self.assertEqual(first.end().nags, set([chess.pgn.NAG_GOOD_MOVE, chess.pgn.NAG_SPECULATIVE_MOVE]))
+            self.assertEqual(first.headers["Result"], "1-0")
+            self.assertEqual(second.variations[0].comment, "unterminated")
+
+            first, second = chess.pgn.read_games_mmap(path, Visitor=SkipVariations)
+            self.assertEqual(len(first.variations[0].variations[0].variations), 1)
+            self.assertEqual(list(chess.pgn.read_games_mmap(path, Visitor=chess.pgn.SkipVisitor)), [True, True])
+
+            with open(path, "wb") as f:
+                pass
+            self.assertEqual(list(chess.pgn.read_games_mmap(path)), [])
+
+    def test_lazy_game(self):
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            expected = chess.pgn.read_game(pgn)
+            pgn.seek(0)
+            game = chess.pgn.read_game(pgn, Visitor=chess.pgn.LazyGameCreator)
+
+        self.assertIsInstance(game, chess.pgn.LazyGame)
+        self.assertIsNotNone(game._movetext)
+        self.assertEqual(game.headers["White"], "Garry Kasparov")
+        self.assertEqual(game.board(), expected.board())
+
+        # Parsed on first access.
+        self.assertEqual(list(game.mainline_moves()), list(expected.mainline_moves()))
+        self.assertIsNone(game._movetext)
+        self.assertEqual(str(game), str(expected))
+        self.assertEqual(game.errors, [])
+
+        # Headers, result and comments.
+        pgn = io.StringIO("[Event \"Lazy\"]\n\n{ Start } 1. e4 $1 { Comment\n\non lines } (1. d4) 1-0\n\n1. f4")
+        game = chess.pgn.read_game(pgn, Visitor=chess.pgn.LazyGameCreator)
+        self.assertEqual(game.headers["Result"], "*")
+        copied = pickle.loads(pickle.dumps(game))
+        self.assertEqual(game.comment, "Start")
+        self.assertEqual(game.headers["Result"], "1-0")
+        self.assertEqual(game.variations[0].comment, "Comment\n\non lines")
+        self.assertEqual(game.variations[0].nags, set([chess.pgn.NAG_GOOD_MOVE]))
+        self.assertEqual(game.variations[1].move, chess.Move.from_uci("d2d4"))
+        self.assertEqual(str(copied), str(game))
+        self.assertEqual(str(chess.pgn.read_game(pgn, Visitor=chess.pgn.LazyGameCreator).end().move), "f2f4")
+
+        # Errors.
+        pgn = io.StringIO("1. e4 Ke4 e5")
+        game = chess.pgn.read_game(pgn, Visitor=chess.pgn.LazyGameCreator)
+        logging.disable(logging.ERROR)
+        self.assertEqual(len(game.errors), 1)
+        logging.disable(logging.NOTSET)
+        self.assertEqual(game.end().move, chess.Move.from_uci("e7e5"))
+
+    def test_trusted_game_creator(self):
+        with open("data/pgn/kasparov-deep-blue-1997.pgn") as pgn:
+            expected = [str(game) for game in chess.pgn.read_games(pgn)]
+            pgn.seek(0)
+            games = [str(game) for game in chess.pgn.read_games(pgn, Visitor=chess.pgn.TrustedGameCreator)]
+        self.assertEqual(games, expected)
+
+        # The knight on e2 is pinned, so Nc3 is not ambiguous.
+        pgn = io.StringIO("[FEN \"4k3/4r3/8/8/8/8/4N3/1N2K3 w - - 0 1\"]\n\n1. Nc3 Kd8 *")
+        game = chess.pgn.read_game(pgn, Visitor=chess.pgn.TrustedGameCreator)
+        self.assertEqual(game.variations[0].move, chess.Move.from_uci("b1c3"))
+
+        # Errors are raised instead of collected.
+        pgn = io.StringIO("[FEN \"4k3/4r3/8/8/8/8/4N3/1N2K3 w - - 0 1\"]\n\n1. Nc3 Kd8 2. O-O *")
+        with self.assertRaises(ValueError):
+            chess.pgn.read_game(pgn, Visitor=chess.pgn.TrustedGameCreator)
+
+        # Pawn pushes from beyond the board.
+        for fen, san in [("4k3/4P3/8/8/8/8/8/4K3 w - - 0 1", "e2"), ("4k3/8/8/8/8/8/4p3/4K3 b - - 0 1", "e7"),
+                         ("4k3/8/8/8/8/8/4p3/4K3 b - - 0 1", "e8"), ("4k3/8/8/8/8/8/4p3/4K3 w - - 0 1", "e1")]:
+            pgn = io.StringIO("[FEN \"{}\"]\n\n{} *".format(fen, san))
+            with self.assertRaises(ValueError):
+                chess.pgn.read_game(pgn, Visitor=chess.pgn.TrustedGameCreator)
+
+    def test_visit_san(self):
+        class SanVisitor(chess.pgn.BaseVisitor):
+            def begin_game(self):
+                self.tokens = []
+
+            def begin_variation(self):
+                self.tokens.append("(")
+
+            def end_variation(self):
+                self.tokens.append(")")
+
+            def visit_comment(self, comment):
+                self.tokens.append("{" + comment + "}")
+
+            def visit_nag(self, nag):
+                self.tokens.append("$" + str(nag))
+
+            def visit_result(self, result):
+                self.tokens.append(result)
+
+            def visit_san(self, san):
+                self.tokens.append(san)
+
+            def visit_board(self, board):
+                raise AssertionError("unexpected board")
+
+            def result(self):
+                return self.tokens
+
+        text = "1. e4 { A\n comment } e5?! (1... c5 2. Nf3 (2. Nc3) $4) 2. Nf3+ 1-0\n\n1. Qxx7 Bad Z0 *"
+        expected = [
+            ["e4", "{A\n comment}", "e5", "$6", "(", "c5", "Nf3", "(", "Nc3", ")", "$4", ")", "Nf3", "1-0"],
+            ["Z0", "*"],
+        ]
+
+        pgn = io.StringIO(text)
+        self.assertEqual(chess.pgn.read_game(pgn, Visitor=SanVisitor), expected[0])
+        self.assertEqual(chess.pgn.read_game(pgn, Visitor=SanVisitor), expected[1])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "san.pgn")
+            with open(path, "w") as f:
+                f.write(text)
+            self.assertEqual(list(chess.pgn.read_games_mmap(path, Visitor=SanVisitor)), expected)
+
     def test_visit_board(self):
         class TraceVisitor(chess.pgn.BaseVisitor):
             def __init__(self):
@@ -3626,6 +4870,136 @@ class EngineTestCase(unittest.TestCase):
         self.assertEqual(result, "resolved")
 
 
+class SearchTestCase(unittest.TestCase):
+
+    def test_mate_in_one(self):
+        board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        result = chess.search.play(board, chess.engine.Limit(depth=2))
+        self.assertEqual(result.move, chess.Move.from_uci("d1d8"))
+        self.assertEqual(result.ponder, None)
+        self.assertEqual(result.info["score"], chess.engine.PovScore(chess.engine.Mate(+1), chess.WHITE))
+
+    def test_mate_in_two(self):
+        board = chess.Board("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1")
+        info = chess.search.analyse(board, chess.engine.Limit(mate=2))
+        self.assertEqual(info["score"].relative, chess.engine.Mate(+2))
+        self.assertEqual(board.variation_san(info["pv"]), "1. Nf6+ gxf6 2. Bxf7#")
+
+    def test_mated(self):
+        board = chess.Board("R5k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1")
+        result = chess.search.play(board, chess.engine.Limit(depth=3))
+        self.assertEqual(result.move, None)
+        self.assertEqual(result.info["score"], chess.engine.PovScore(chess.engine.Mate(0), chess.BLACK))
+        self.assertEqual(result.info["score"].white(), chess.engine.MateGiven)
+
+        board = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        info = chess.search.analyse(board, chess.engine.Limit(depth=3))
+        self.assertEqual(info["score"].relative, chess.engine.Cp(0))
+
+    def test_wins_material(self):
+        board = chess.Board("2q1k3/8/8/1N6/8/8/8/4K3 w - - 0 1")
+        result = chess.search.play(board, chess.engine.Limit(depth=4))
+        self.assertEqual(board.san(result.move), "Nd6+")
+
+    def test_limits(self):
+        board = chess.Board()
+        searcher = chess.search.Searcher()
+
+        info = searcher.analyse(board, chess.engine.Limit(nodes=1000))
+        self.assertLessEqual(info["nodes"], 1000)
+        self.assertGreater(info["depth"], 0)
+        self.assertIn(info["pv"][0], board.legal_moves)
+
+        info = searcher.analyse(board, chess.engine.Limit(time=0.1))
+        self.assertLess(info["time"], 1.0)
+        self.assertIn(info["pv"][0], board.legal_moves)
+
+        info = searcher.analyse(board, chess.engine.Limit(depth=2))
+        self.assertEqual(info["depth"], 2)
+
+        searcher = chess.search.Searcher(tt_size=100)
+        info = searcher.analyse(board, chess.engine.Limit(depth=4))
+        self.assertEqual(info["depth"], 4)
+        self.assertLessEqual(len(searcher.tt), 100)
+
+    def test_quiescence_max_ply(self):
+        # Chains of checks and captures stop at the maximum ply.
+        board = chess.Board("4k3/8/8/8/8/8/8/R3K3 b - - 0 1")
+        board.push_san("Kd7")
+        board.push_san("Ra7+")
+        for max_ply in [1, 2, 3]:
+            with unittest.mock.patch.object(chess.search, "MAX_PLY", max_ply):
+                info = chess.search.Searcher().analyse(board, chess.engine.Limit(depth=2))
+            self.assertLessEqual(info["seldepth"], max_ply)
+            self.assertLess(info["score"].relative, chess.engine.Cp(0))
+
+    def test_fifty_moves(self):
+        # Checkmate on the 100th half-move is not a draw.
+        board = chess.Board("6k1/5ppp/8/8/8/8/8/3R2K1 w - - 99 60")
+        result = chess.search.play(board, chess.engine.Limit(depth=2))
+        self.assertEqual(board.san(result.move), "Rd8#")
+        self.assertEqual(result.info["score"].relative, chess.engine.Mate(+1))
+
+        # Other positions are.
+        board = chess.Board("6k1/5ppp/8/8/8/8/8/3R2K1 b - - 99 60")
+        result = chess.search.play(board, chess.engine.Limit(depth=2))
+        self.assertEqual(result.info["score"].relative, chess.engine.Cp(0))
+
+    def test_root_moves(self):
+        board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+        root_moves = [board.parse_san("h3"), board.parse_san("g3")]
+        result = chess.search.play(board, chess.engine.Limit(depth=2), root_moves=root_moves)
+        self.assertIn(result.move, root_moves)
+
+        # No legal root moves left is not mate.
+        board = chess.Board("4k3/8/8/8/8/8/8/r3K3 w - - 0 1")
+        with self.assertRaises(ValueError):
+            chess.search.analyse(board, chess.engine.Limit(depth=2), root_moves=[chess.Move.from_uci("e1f1")])
+
+    def test_repetition(self):
+        # Perpetual check saves the game.
+        board = chess.Board("5rk1/5p1p/8/8/8/8/qr1Q1PPP/6K1 w - - 0 1")
+        result = chess.search.play(board, chess.engine.Limit(depth=5))
+        self.assertEqual(board.san(result.move), "Qg5+")
+        self.assertEqual(result.info["score"].relative, chess.engine.Cp(0))
+
+    def test_variant(self):
+        board = chess.variant.ThreeCheckBoard("rnbqkbnr/ppp1pppp/8/3p4/8/4P3/PPPP1PPP/RNBQKBNR w KQkq - 1+3 0 2")
+        result = chess.search.play(board, chess.engine.Limit(depth=2))
+        self.assertEqual(result.move, chess.Move.from_uci("f1b5"))
+        self.assertEqual(result.info["score"].relative, chess.engine.Mate(+1))
+
+    def test_find_mate(self):
+        board = chess.Board("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1")
+        self.assertEqual(chess.search.find_mate(board, 1), None)
+        self.assertEqual(board.variation_san(chess.search.find_mate(board, 3)), "1. Nf6+ gxf6 2. Bxf7#")
+
+        # Quiet first move.
+        board = chess.Board("kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1")
+        line = chess.search.find_mate(board, 2)
+        self.assertEqual(board.san(line[0]), "Ra6")
+        self.assertEqual(len(line), 3)
+        self.assertEqual(chess.search.find_mate(board, 2, checks_only=True), None)
+
+        # No mate in stalemate.
+        board = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        self.assertEqual(chess.search.find_mate(board, 2), None)
+
+    def test_find_mate_variant(self):
+        board = chess.variant.ThreeCheckBoard("rnbqkbnr/ppp1pppp/8/3p4/8/4P3/PPPP1PPP/RNBQKBNR w KQkq - 2+3 0 2")
+        self.assertEqual(board.variation_san(chess.search.find_mate(board, 2)), "2. Bb5+ Qd7 3. Bxd7#")
+
+    def test_find_mates(self):
+        boards = [
+            chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1"),
+            chess.Board(),
+            chess.Board("kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1"),
+        ]
+        expected = [chess.search.find_mate(board, 2) for board in boards]
+        self.assertEqual(list(chess.search.find_mates(boards, 2, processes=1)), expected)
+        self.assertEqual(list(chess.search.find_mates(boards, 2, processes=2, chunksize=1)), expected)
+
+
 class SyzygyTestCase(unittest.TestCase):
 
     def test_calc_key(self):
@@ -3972,6 +5346,10 @@ class SvgTestCase(unittest.TestCase):
 
 class SuicideTestCase(unittest.TestCase):
 
+    def test_check_generation(self):
+        board = chess.variant.SuicideBoard("4k3/8/8/8/8/8/8/R3K3 w - - 0 1")
+        self.assertEqual(list(board.generate_legal_checks()), [])
+
     def test_parse_san(self):
         board = chess.variant.SuicideBoard()
         board.push_san("e4")
@@ -4035,6 +5413,12 @@ class SuicideTestCase(unittest.TestCase):
 
 class AtomicTestCase(unittest.TestCase):
 
+    def test_check_generation(self):
+        # The explosion uncovers the rook.
+        board = chess.variant.AtomicBoard("4k3/8/8/4n3/2N5/8/8/4RK2 w - - 0 1")
+        checks = set(board.generate_legal_checks())
+        self.assertEqual(checks, set([board.parse_san("Nxe5"), board.parse_san("Nd6")]))
+
     def test_atomic_capture(self):
         fen = "rnbqkb1r/pp2pppp/2p2n2/3p4/2PP4/2N2N2/PP2PPPP/R1BQKB1R b KQkq - 3 4"
         board = chess.variant.AtomicBoard(fen)
@@ -4127,6 +5511,18 @@ class AtomicTestCase(unittest.TestCase):
 
 class RacingKingsTestCase(unittest.TestCase):
 
+    def test_check_generation(self):
+        board = chess.variant.RacingKingsBoard()
+        self.assertEqual(list(board.generate_legal_checks()), [])
+        quiets = set(board.generate_legal_quiets())
+        self.assertEqual(quiets | set(board.generate_legal_captures()), set(board.legal_moves))
+        self.assertNotIn(board.parse_san("Nxc2"), quiets)
+
+    def test_canonical_transform(self):
+        board = chess.variant.RacingKingsBoard("8/8/8/8/8/8/k6K/8 w - - 0 1")
+        self.assertEqual(board.canonical_transform()[1], board.transform(chess.flip_horizontal).canonical_transform()[1])
+        self.assertNotEqual(board.canonical_transform()[1], board.transform(chess.flip_vertical).canonical_transform()[1])
+
     def test_variant_end(self):
         board = chess.variant.RacingKingsBoard()
         board.push_san("Nxc2")
@@ -4308,6 +5704,12 @@ class ThreeCheckTestCase(unittest.TestCase):
 
 class CrazyhouseTestCase(unittest.TestCase):
 
+    def test_check_generation(self):
+        board = chess.variant.CrazyhouseBoard("4k3/8/8/8/8/8/8/4K3[N] w - - 0 1")
+        checks = set(board.generate_legal_checks())
+        self.assertEqual(checks, set(board.parse_san(san) for san in ["N@c7", "N@d6", "N@f6", "N@g7"]))
+        self.assertEqual(len(list(board.generate_legal_quiets())), board.legal_moves.count())
+
     def test_pawn_drop(self):
         board = chess.variant.CrazyhouseBoard("r2q1rk1/ppp2pp1/1bnp3p/3B4/3PP1b1/4PN2/PP4PP/R2Q1RK1[BNPnp] b - - 0 13")
         P_at_e6 = chess.Move.from_uci("P@e6")